@@ -1,17 +1,133 @@
+"""
+Combine multiple HDF5 run files into one, incrementally.
+
+The output is opened in append mode and only runs that are not in it yet are
+added, so re-running after recording a new file only copies the new runs:
+
+- Each input file keeps a stable prefix ("file1", "file2", ...) recorded in
+  the "file_prefixes" attribute of the output, independent of the argument
+  order. For outputs written without these attributes, the prefixes and
+  content hashes are rebuilt from the runs already in the file first.
+- Runs whose content hash (dataset_utils.run_content_hash) is already in the
+  output are skipped as duplicates, even under another file or run name.
+- With --links, runs are added as HDF5 external links to the input files
+  instead of copies, so the output is a small master file and no data is
+  copied at all (the input files must stay at the same relative location).
+
+Usage:
+    python -m dataset.all_data.h5_files.combine_h5 a.h5 b.h5 --output combined.h5 [--links]
+"""
 import h5py
 import argparse
+import json
 import os
+import re
+
+from dataset.dataset_utils import run_content_hash
+
+
+def _load_json_attr(f, name):
+    return json.loads(f.attrs[name]) if name in f.attrs else {}
+
+
+def _rebuild_index(h5fw, out_dir, prefixes, hashes):
+    """
+    Complete the prefix map and content hashes from the runs already in the output.
+
+    Prefixes of existing "fileN_<run>" groups are reserved (mapped to their input
+    file when the run is an external link, so that file keeps its prefix), and
+    runs without a recorded hash are hashed so their content is not added again.
+
+    Returns:
+        set[str]: Prefixes in use.
+    """
+    taken = set(prefixes.values())
+    for name in h5fw.keys():
+        match = re.match(r"(file\d+)_", name)
+        if match is None:
+            continue
+        prefix = match.group(1)
+        link = h5fw.get(name, getlink=True)
+        if isinstance(link, h5py.ExternalLink) and prefix not in taken:
+            prefixes[os.path.normpath(os.path.join(out_dir, link.filename))] = prefix
+        taken.add(prefix)
+        if name not in hashes.values():
+            try:
+                group = h5fw[name]
+            except KeyError:  # dangling external link
+                continue
+            hashes.setdefault(group.attrs.get("content_hash") or run_content_hash(group), name)
+    return taken
+
+
+def combine_h5(inputs, output, links=False):
+    """
+    Add the runs of ``inputs`` that are not in ``output`` yet.
+
+    Args:
+        inputs (list[str]): Paths to input HDF5 files.
+        output (str): Path to the combined HDF5 file (created if missing).
+        links (bool): Add runs as external links instead of copies.
+
+    Returns:
+        dict: Counts of "added", "present" (already in the output) and
+              "duplicates" (same content as a run already in the output).
+    """
+    counts = {"added": 0, "present": 0, "duplicates": 0}
+    out_dir = os.path.dirname(os.path.abspath(output))
+
+    with h5py.File(output, 'a') as h5fw:
+        prefixes = _load_json_attr(h5fw, "file_prefixes")       # input path -> prefix
+        hashes = _load_json_attr(h5fw, "content_hashes")        # content hash -> output run name
+        taken = _rebuild_index(h5fw, out_dir, prefixes, hashes)
+
+        for input_path in inputs:
+            key = os.path.abspath(input_path)
+            if key not in prefixes:
+                n = 1
+                while f"file{n}" in taken:
+                    n += 1
+                prefixes[key] = f"file{n}"
+                taken.add(prefixes[key])
+            prefix = prefixes[key]
+
+            with h5py.File(input_path, 'r') as h5fr:
+                for obj_name in h5fr.keys():
+                    name = f"{prefix}_{obj_name}"
+                    if name in h5fw:
+                        counts["present"] += 1
+                        continue
+
+                    content_hash = run_content_hash(h5fr[obj_name])
+                    if content_hash in hashes:
+                        print(f"Skipping {input_path}:{obj_name}, same content as {hashes[content_hash]}")
+                        counts["duplicates"] += 1
+                        continue
+
+                    if links:
+                        h5fw[name] = h5py.ExternalLink(os.path.relpath(key, out_dir), f"/{obj_name}")
+                    else:
+                        h5fr.copy(obj_name, h5fw, name=name)
+                        h5fw[name].attrs["content_hash"] = content_hash
+                    hashes[content_hash] = name
+                    counts["added"] += 1
+
+            # Saved after each input so an interrupted combine can simply be re-run
+            h5fw.attrs["file_prefixes"] = json.dumps(prefixes)
+            h5fw.attrs["content_hashes"] = json.dumps(hashes)
+
+    return counts
 
-parser = argparse.ArgumentParser(description="Combine multiple HDF5 files into one.")
-parser.add_argument("inputs", nargs="+", help="Paths to input HDF5 files")
-parser.add_argument("--output", required=True, help="Path to output HDF5 file")
-args = parser.parse_args()
 
-with h5py.File(args.output, 'w') as h5fw:
-    for i, input_path in enumerate(args.inputs, start=1):
-        prefix = f"file{i}"
-        with h5py.File(input_path, 'r') as h5fr:
-            for obj_name in h5fr.keys():
-                h5fr.copy(obj_name, h5fw, name=f"{prefix}_{obj_name}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine multiple HDF5 files into one.")
+    parser.add_argument("inputs", nargs="+", help="Paths to input HDF5 files")
+    parser.add_argument("--output", required=True, help="Path to output HDF5 file")
+    parser.add_argument("--links", action="store_true",
+                        help="Add runs as external links to the input files instead of copying them")
+    args = parser.parse_args()
 
-print(f"Combined {len(args.inputs)} files into {args.output}")
\ No newline at end of file
+    counts = combine_h5(args.inputs, args.output, links=args.links)
+    print(f"Combined {len(args.inputs)} files into {args.output}: "
+          f"{counts['added']} runs added, {counts['present']} already present, "
+          f"{counts['duplicates']} duplicates skipped")
@@ -1,130 +1,221 @@
 import h5py
 import numpy as np
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def downsample_h5(input_path, output_path, ratio=10, target_runs=None):
+from dataset.dataset_utils import iter_row_slices, dataset_layout
+from dataset.all_data.h5_files.h5_inspect import inspect_file, compare_files
+
+AGGREGATIONS = ("first", "last", "mean", "min", "max")
+
+# Row of each bucket kept for string datasets (e.g. time_string), matching the
+# sample timestamp_ms is aggregated to: the middle row is the one nearest the
+# mean time of an evenly sampled bucket
+STRING_ROWS = {"first": "first", "min": "first", "last": "last", "max": "last", "mean": "middle"}
+
+CHUNK_ROWS = 100_000
+
+
+def downsample_h5(input_path, output_path, ratio=10, target_runs=None, interval_ms=None,
+                  agg="first", antialias=None, chunk_rows=CHUNK_ROWS, workers=1):
     """
     Downsample HDF5 file containing BMS data.
-    
+
+    Datasets are streamed block by block (at most ``chunk_rows`` input rows in
+    memory per dataset), and output datasets keep the chunking / compression of
+    their source.
+
     Args:
         input_path: Path to input H5 file
         output_path: Path to output H5 file
-        ratio: Downsampling ratio (keep every nth sample)
+        ratio: Downsampling ratio (buckets of n consecutive samples), used when interval_ms is None
         target_runs: List of run names to downsample (None = all runs)
+        interval_ms: Resample on timestamp_ms into buckets of this many milliseconds
+        agg: Aggregation per bucket: "first" (keep every nth), "last", "mean", "min" or "max"
+        antialias: Datasets ("group/name") averaged instead of decimated when agg is "first" / "last",
+                   e.g. ("bms/current",) so fast load changes are not aliased (default: none)
+        chunk_rows: Maximum number of input rows read at once
+        workers: Number of worker processes (runs are processed in parallel when > 1)
     """
-    
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{agg}', expected one of {AGGREGATIONS}")
+
+    with h5py.File(input_path, 'r') as f_in:
+        run_names = list(f_in.keys())
+
+    options = dict(ratio=ratio, interval_ms=interval_ms, agg=agg,
+                   antialias=tuple(antialias or ()), chunk_rows=chunk_rows)
+    jobs = [(run_name, (target_runs is None) or (run_name in target_runs)) for run_name in run_names]
+
+    if workers <= 1:
+        with h5py.File(input_path, 'r') as f_in, h5py.File(output_path, 'w') as f_out:
+            for run_name, should_downsample in jobs:
+                _downsample_run(f_in[run_name], f_out, should_downsample, options)
+    else:
+        # Each worker writes its run to a temporary file, merged in input order afterwards
+        tmp_paths = [f"{output_path}.{i}.tmp" for i in range(len(jobs))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_downsample_run_to_file, input_path, tmp_path, run_name, should_downsample, options)
+                for (run_name, should_downsample), tmp_path in zip(jobs, tmp_paths)
+            ]
+            for future in futures:
+                future.result()
+        with h5py.File(output_path, 'w') as f_out:
+            for (run_name, _), tmp_path in zip(jobs, tmp_paths):
+                with h5py.File(tmp_path, 'r') as f_tmp:
+                    f_tmp.copy(f_tmp[run_name], f_out, name=run_name)
+                os.remove(tmp_path)
+
+    print(f"\nDownsampled H5 file saved to: {output_path}")
+
+
+def _downsample_run_to_file(input_path, output_path, run_name, should_downsample, options):
     with h5py.File(input_path, 'r') as f_in, h5py.File(output_path, 'w') as f_out:
-        
-        for run_name in f_in.keys():
-            run_group_in = f_in[run_name]
-            run_group_out = f_out.create_group(run_name)
-            
-            # Check if this run should be downsampled
-            should_downsample = (target_runs is None) or (run_name in target_runs)
-            
-            # Copy attributes (metadata)
-            for attr_name, attr_value in run_group_in.attrs.items():
-                run_group_out.attrs[attr_name] = attr_value
-            
-            # Get original length from timestamp
-            original_length = len(run_group_in['timestamp_ms'][:])
-            
-            if should_downsample:
-                # Create downsampling indices
-                indices = np.arange(0, original_length, ratio)
-                new_length = len(indices)
-                print(f"Downsampling {run_name}: {original_length} -> {new_length} samples")
+        _downsample_run(f_in[run_name], f_out, should_downsample, options)
+
+
+def _downsample_run(run_group_in, f_out, should_downsample, options):
+    run_name = run_group_in.name.lstrip("/")
+
+    # Length from shape metadata, no data read
+    original_length = run_group_in['timestamp_ms'].shape[0]
+
+    if not should_downsample:
+        run_group_in.file.copy(run_group_in, f_out, name=run_name)
+        print(f"Keeping {run_name}: {original_length} samples (no downsampling)")
+        return
+
+    starts = _bucket_starts(run_group_in['timestamp_ms'], options)
+    run_group_out = f_out.create_group(run_name)
+    # Copy attributes (metadata)
+    for attr_name, attr_value in run_group_in.attrs.items():
+        run_group_out.attrs[attr_name] = attr_value
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Group):
+            group_out = run_group_out.require_group(name)
+            for attr_name, attr_value in obj.attrs.items():
+                group_out.attrs[attr_name] = attr_value
+        elif obj.ndim == 0 or obj.shape[0] != original_length:
+            # Not a per-sample column (e.g. diagnostics): copy unchanged
+            run_group_in.copy(obj, run_group_out, name=name)
+        else:
+            agg = options["agg"]
+            if agg in ("first", "last") and name in options["antialias"]:
+                agg = "mean"
+            _downsample_dataset(obj, run_group_out, name, starts, agg, options["chunk_rows"])
+
+    run_group_in.visititems(visit)
+    print(f"Downsampling {run_name}: {original_length} -> {len(starts)} samples")
+
+
+def _bucket_starts(timestamps, options):
+    """Index of the first sample of each output bucket."""
+    n = timestamps.shape[0]
+    if options["interval_ms"] is None:
+        return np.arange(0, n, options["ratio"], dtype=np.int64)
+
+    interval = float(options["interval_ms"])
+    starts = []
+    t0 = None
+    prev_bucket = None
+    for rows in iter_row_slices(n, options["chunk_rows"]):
+        t = timestamps[rows]
+        if t0 is None and len(t):
+            t0 = t[0]
+        bucket = np.floor((t - t0) / interval).astype(np.int64)
+        change = np.empty(len(bucket), dtype=bool)
+        change[0] = prev_bucket is None or bucket[0] != prev_bucket
+        np.not_equal(bucket[1:], bucket[:-1], out=change[1:])
+        starts.append(np.flatnonzero(change) + rows.start)
+        prev_bucket = bucket[-1]
+    return np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+
+def _downsample_dataset(ds_in, group_out, name, starts, agg, chunk_rows):
+    """Aggregate ``ds_in`` over the buckets beginning at ``starts``, one block of buckets at a time."""
+    n = ds_in.shape[0]
+    ds_out = group_out.create_dataset(name, shape=(len(starts),) + ds_in.shape[1:],
+                                      dtype=ds_in.dtype, **dataset_layout(ds_in))
+    if h5py.check_string_dtype(ds_in.dtype) is not None:
+        agg = STRING_ROWS[agg]  # e.g. time_string
+
+    ends = np.append(starts[1:], n)
+    b0 = 0
+    while b0 < len(starts):
+        # Largest block of whole buckets within chunk_rows input rows (at least one bucket)
+        b1 = max(int(np.searchsorted(ends, starts[b0] + chunk_rows, side="right")), b0 + 1)
+        row0, row1 = starts[b0], ends[b1 - 1]
+        offsets = starts[b0:b1] - row0
+
+        if agg == "first":
+            out = ds_in[row0:row1][offsets]
+        elif agg == "last":
+            out = ds_in[row0:row1][ends[b0:b1] - row0 - 1]
+        elif agg == "middle":
+            out = ds_in[row0:row1][offsets + (ends[b0:b1] - starts[b0:b1] - 1) // 2]
+        else:
+            block = ds_in[row0:row1]
+            if agg == "min":
+                out = np.minimum.reduceat(block, offsets, axis=0)
+            elif agg == "max":
+                out = np.maximum.reduceat(block, offsets, axis=0)
             else:
-                indices = np.arange(original_length)
-                new_length = original_length
-                print(f"Keeping {run_name}: {original_length} samples (no downsampling)")
-            
-            # Process top-level datasets (like timestamp_ms)
-            for dataset_name in run_group_in.keys():
-                if isinstance(run_group_in[dataset_name], h5py.Dataset):
-                    # It's a dataset at run level
-                    data = run_group_in[dataset_name][:]
-                    downsampled_data = data[indices]
-                    run_group_out.create_dataset(dataset_name, data=downsampled_data)
-                    
-                elif isinstance(run_group_in[dataset_name], h5py.Group):
-                    # It's a group (like 'bms')
-                    subgroup_in = run_group_in[dataset_name]
-                    subgroup_out = run_group_out.create_group(dataset_name)
-                    
-                    # Copy subgroup attributes
-                    for attr_name, attr_value in subgroup_in.attrs.items():
-                        subgroup_out.attrs[attr_name] = attr_value
-                    
-                    # Process datasets within the subgroup
-                    for sub_dataset_name in subgroup_in.keys():
-                        if isinstance(subgroup_in[sub_dataset_name], h5py.Dataset):
-                            data = subgroup_in[sub_dataset_name][:]
-                            downsampled_data = data[indices]
-                            subgroup_out.create_dataset(sub_dataset_name, data=downsampled_data)
-    
-    print(f"\nDownsampled H5 file saved to: {output_path}")
+                counts = (ends[b0:b1] - starts[b0:b1]).reshape((-1,) + (1,) * (block.ndim - 1))
+                out = np.add.reduceat(block.astype(np.float64), offsets, axis=0) / counts
+                if not np.issubdtype(ds_in.dtype, np.floating):
+                    out = np.rint(out)
 
+        ds_out[b0:b1] = out.astype(ds_in.dtype, copy=False)
+        b0 = b1
 
-def analyze_sampling_rate(input_path):
+
+def analyze_sampling_rate(input_path, workers=None):
     """Analyze sampling rates across runs to help decide downsampling ratio."""
     
     print("=" * 60)
     print("SAMPLING RATE ANALYSIS")
     print("=" * 60)
     
-    with h5py.File(input_path, 'r') as f:
-        for run_name in f.keys():
-            run_group = f[run_name]
-            timestamps = run_group['timestamp_ms'][:]
-            
-            # Calculate time differences
-            time_diffs = np.diff(timestamps)
-            
-            # Statistics
-            num_samples = len(timestamps)
-            duration_sec = (timestamps[-1] - timestamps[0]) / 1000.0
-            avg_sample_rate = num_samples / duration_sec if duration_sec > 0 else 0
-            avg_interval_ms = np.mean(time_diffs)
-            min_interval_ms = np.min(time_diffs)
-            max_interval_ms = np.max(time_diffs)
-            
-            print(f"\n{run_name}:")
-            print(f"  Samples: {num_samples}")
-            print(f"  Duration: {duration_sec:.1f} sec ({duration_sec/60:.1f} min)")
-            print(f"  Avg sample rate: {avg_sample_rate:.1f} Hz")
-            print(f"  Avg interval: {avg_interval_ms:.1f} ms")
-            print(f"  Min interval: {min_interval_ms:.1f} ms")
-            print(f"  Max interval: {max_interval_ms:.1f} ms")
-
-
-def verify_downsampled_file(original_path, downsampled_path):
-    """Verify the downsampled file structure and data."""
+    # One streaming pass over timestamp_ms per run, runs in parallel
+    for info in inspect_file(input_path, workers=workers):
+        if "duration_s" not in info:
+            print(f"\n{info['run']}: no samples")
+            continue
+        duration_sec = info["duration_s"]
+        print(f"\n{info['run']}:")
+        print(f"  Samples: {info['n_samples']}")
+        print(f"  Duration: {duration_sec:.1f} sec ({duration_sec/60:.1f} min)")
+        print(f"  Avg sample rate: {info['rate_hz']:.1f} Hz")
+        print(f"  Avg interval: {info['interval_mean_ms']:.1f} ms")
+        print(f"  Min interval: {info['interval_min_ms']:.1f} ms")
+        print(f"  Max interval: {info['interval_max_ms']:.1f} ms")
+        print(f"  Interval std: {info['interval_std_ms']:.1f} ms")
+
+
+def verify_downsampled_file(original_path, downsampled_path, workers=None):
+    """Verify the downsampled file structure (shape metadata only, no data read)."""
     
     print("\n" + "=" * 60)
     print("VERIFICATION")
     print("=" * 60)
     
     with h5py.File(original_path, 'r') as f_orig, h5py.File(downsampled_path, 'r') as f_down:
-        
         print(f"\nOriginal runs: {list(f_orig.keys())}")
         print(f"Downsampled runs: {list(f_down.keys())}")
         
-        for run_name in f_down.keys():
-            orig_len = len(f_orig[run_name]['timestamp_ms'][:])
-            down_len = len(f_down[run_name]['timestamp_ms'][:])
-            ratio = orig_len / down_len if down_len > 0 else 0
-            
-            print(f"\n{run_name}:")
-            print(f"  Original: {orig_len} samples")
-            print(f"  Downsampled: {down_len} samples")
-            print(f"  Actual ratio: {ratio:.1f}x")
-            
-            # Verify BMS data exists
-            if 'bms' in f_down[run_name]:
-                bms_datasets = list(f_down[run_name]['bms'].keys())
-                print(f"  BMS datasets: {bms_datasets}")
+    for r in compare_files(original_path, downsampled_path, workers=workers):
+        print(f"\n{r['run']}:")
+        print(f"  Original: {r['original']} samples")
+        print(f"  Downsampled: {r['derived']} samples")
+        print(f"  Actual ratio: {r['ratio']:.1f}x")
+        for name in r["missing_columns"]:
+            print(f"  Missing dataset: {name}")
+        for name, length in r["mismatched"].items():
+            print(f"  Length mismatch: {name} has {length} rows, timestamp_ms has {r['derived']}")
 
 
 if __name__ == "__main__":
@@ -132,6 +223,16 @@ if __name__ == "__main__":
     parser.add_argument("input", help="Path to input H5 file")
     parser.add_argument("output", help="Path to output H5 file")
     parser.add_argument("--ratio", type=int, default=10, help="Downsampling ratio (default: 10)")
+    parser.add_argument("--interval-ms", type=float, default=None,
+                        help="Resample on timestamp_ms into buckets of this many ms (overrides --ratio)")
+    parser.add_argument("--agg", choices=AGGREGATIONS, default="first",
+                        help="Aggregation per bucket (default: first = keep every nth sample)")
+    parser.add_argument("--antialias", nargs='*', default=None,
+                        help="Datasets averaged instead of decimated with first/last, e.g. bms/current (default: none)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Maximum input rows read at once (default: {CHUNK_ROWS})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of runs processed in parallel (default: 1)")
     parser.add_argument("--runs", nargs='+', default=None, 
                         help="Specific runs to downsample (default: all runs)")
     parser.add_argument("--analyze", action="store_true", 
@@ -143,7 +244,7 @@ if __name__ == "__main__":
     
     # Analyze first if requested
     if args.analyze:
-        analyze_sampling_rate(args.input)
+        analyze_sampling_rate(args.input, workers=args.workers)
         print("\n")
     
     # Perform downsampling
@@ -151,11 +252,16 @@ if __name__ == "__main__":
         input_path=args.input,
         output_path=args.output,
         ratio=args.ratio,
-        target_runs=args.runs
+        target_runs=args.runs,
+        interval_ms=args.interval_ms,
+        agg=args.agg,
+        antialias=args.antialias,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers
     )
     
     # Verify if requested
     if args.verify:
-        verify_downsampled_file(args.input, args.output)
+        verify_downsampled_file(args.input, args.output, workers=args.workers)
     
     print("\nDownsampling complete!")
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Bulk export of HDF5 runs to CSV / Parquet / Feather (and, optionally, Excel).
+
+Each run is streamed in chunks of rows: the columns of a chunk are read
+straight from the datasets into an Arrow table and appended with a streaming
+Arrow writer, so memory stays at one chunk and no per-row Python work is done.
+Runs are exported in parallel worker processes, one output file per run.
+
+Column names follow the previous exporters: top-level datasets keep their name
+("timestamp_ms", "time_string"), group datasets are "group/name", and 2-D
+datasets are split into "group/name_0", "group/name_1", ...
+
+Excel is only meant for quick looks at short runs: runs longer than
+``excel_max_rows`` are refused (an .xlsx sheet holds at most 1,048,576 rows,
+and openpyxl takes minutes for long runs).
+
+Usage:
+    python -m dataset.all_data.h5_files.h5_export dataset.h5 out_dir --format parquet --workers 8
+"""
+import argparse
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as pa_feather
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from dataset.dataset_utils import iter_row_slices
+
+FORMATS = ("csv", "parquet", "feather", "xlsx")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "xlsx": ".xlsx"}
+
+CHUNK_ROWS = 200_000
+EXCEL_MAX_ROWS = 1_048_575  # sheet limit minus the header row
+
+# Columns written first, in this order
+PRIORITY_COLUMNS = ("timestamp_ms", "time_string")
+
+
+def column_layout(run_group):
+    """
+    List the exported columns of a run.
+
+    Only per-sample datasets (same length as timestamp_ms) are exported, so
+    diagnostics and other side data are left out.
+
+    Args:
+        run_group (h5py.Group): Run group.
+
+    Returns:
+        list[tuple]: (column name, dataset path, column index or None), top-level
+                     datasets first, then group datasets in file order.
+    """
+    n = run_group["timestamp_ms"].shape[0] if "timestamp_ms" in run_group else None
+    top, grouped = [], []
+
+    def visit(name, obj):
+        if not isinstance(obj, h5py.Dataset) or obj.ndim == 0 or name.startswith("diagnostics/"):
+            return
+        if n is not None and obj.shape[0] != n:
+            return
+        target = grouped if "/" in name else top
+        if obj.ndim == 1:
+            target.append((name, name, None))
+        else:
+            for i in range(int(np.prod(obj.shape[1:]))):
+                target.append((f"{name}_{i}", name, i))
+
+    run_group.visititems(visit)
+    top.sort(key=lambda c: (c[0] not in PRIORITY_COLUMNS,
+                            PRIORITY_COLUMNS.index(c[0]) if c[0] in PRIORITY_COLUMNS else 0))
+    return top + grouped
+
+
+def iter_run_tables(run_group, chunk_rows=CHUNK_ROWS, columns=None):
+    """
+    Yield a run as Arrow tables of at most ``chunk_rows`` rows.
+
+    Args:
+        run_group (h5py.Group): Run group.
+        chunk_rows (int): Rows per table.
+        columns (list[str] | None): Only these column names (default: all, see column_layout).
+    """
+    layout = column_layout(run_group)
+    if columns is not None:
+        layout = [c for c in layout if c[0] in columns]
+    if not layout:
+        return
+    datasets = {path: run_group[path] for _, path, _ in layout}
+    n_rows = run_group[layout[0][1]].shape[0]
+
+    for rows in iter_row_slices(n_rows, chunk_rows):
+        blocks = {}
+        for path, ds in datasets.items():
+            if h5py.check_string_dtype(ds.dtype) is not None:
+                blocks[path] = ds.asstr()[rows]
+            else:
+                block = ds[rows]
+                blocks[path] = block.reshape(block.shape[0], -1) if block.ndim > 1 else block
+        arrays = [pa.array(blocks[path] if i is None else np.ascontiguousarray(blocks[path][:, i]))
+                  for _, path, i in layout]
+        yield pa.Table.from_arrays(arrays, names=[name for name, _, _ in layout])
+
+
+def export_run(h5_path, run_name, output_path, fmt="parquet", chunk_rows=CHUNK_ROWS,
+               excel_max_rows=EXCEL_MAX_ROWS):
+    """
+    Export one run to ``output_path``.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        run_name (str): Run group name.
+        output_path (str): Output file path.
+        fmt (str): "csv", "parquet", "feather" or "xlsx".
+        chunk_rows (int): Rows read and written at once.
+        excel_max_rows (int): Longest run exported to xlsx.
+
+    Returns:
+        tuple: (run_name, output_path or None if skipped, number of rows, number of columns)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+
+    with h5py.File(h5_path, "r") as f:
+        run_group = f[run_name]
+        layout = column_layout(run_group)
+        n_rows = run_group[layout[0][1]].shape[0] if layout else 0
+
+        if fmt == "xlsx":
+            if n_rows > excel_max_rows:
+                print(f"Skipping {run_name}: {n_rows:,} rows exceed the Excel limit of {excel_max_rows:,}")
+                return run_name, None, n_rows, len(layout)
+            _write_excel(run_group, output_path, chunk_rows)
+            return run_name, output_path, n_rows, len(layout)
+
+        writer = None
+        try:
+            for table in iter_run_tables(run_group, chunk_rows):
+                if writer is None:
+                    writer = _open_writer(fmt, output_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:  # empty run: header / schema only
+            empty = pa.table({name: pa.array([], type=pa.float64()) for name, _, _ in layout})
+            if fmt == "csv":
+                pa_csv.write_csv(empty, output_path)
+            elif fmt == "parquet":
+                pq.write_table(empty, output_path)
+            else:
+                pa_feather.write_feather(empty, output_path)
+    return run_name, output_path, n_rows, len(layout)
+
+
+def _open_writer(fmt, output_path, schema):
+    if fmt == "csv":
+        return pa_csv.CSVWriter(output_path, schema)
+    if fmt == "parquet":
+        return pq.ParquetWriter(output_path, schema, compression="zstd")
+    # Feather v2 is the Arrow IPC file format
+    return pa_ipc.new_file(output_path, schema)
+
+
+def _write_excel(run_group, output_path, chunk_rows):
+    import pandas as pd
+
+    # xlsxwriter is much faster than openpyxl when it is installed
+    engine = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") else "openpyxl"
+    with pd.ExcelWriter(output_path, engine=engine) as writer:
+        start_row = 0
+        for table in iter_run_tables(run_group, chunk_rows):
+            table.to_pandas().to_excel(writer, index=False, header=start_row == 0,
+                                       startrow=start_row + (start_row > 0))
+            start_row += table.num_rows
+
+
+def export_h5(h5_path, output_dir, fmt="parquet", runs=None, workers=None, chunk_rows=CHUNK_ROWS,
+              excel_max_rows=EXCEL_MAX_ROWS):
+    """
+    Export runs of an HDF5 file, one file per run, in parallel.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        output_dir (str): Output directory (created if missing).
+        fmt (str): "csv", "parquet", "feather" or "xlsx".
+        runs (list[str] | None): Run names, None = all runs.
+        workers (int | None): Worker processes (None = CPU count, 1 = in-process).
+        chunk_rows (int): Rows read and written at once.
+        excel_max_rows (int): Longest run exported to xlsx.
+
+    Returns:
+        list[tuple]: export_run() results, in run order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with h5py.File(h5_path, "r") as f:
+        run_names = [name for name in f.keys() if isinstance(f.get(name), h5py.Group)]
+    if runs is not None:
+        missing = [r for r in runs if r not in run_names]
+        if missing:
+            raise KeyError(f"Runs not found in {h5_path}: {missing}")
+        run_names = list(runs)
+
+    outputs = [os.path.join(output_dir, run_name + EXTENSIONS[fmt]) for run_name in run_names]
+    args = [(h5_path, name, out, fmt, chunk_rows, excel_max_rows) for name, out in zip(run_names, outputs)]
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers <= 1 or len(args) <= 1:
+        for a in args:
+            results.append(export_run(*a))
+            _print_result(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+            for result in pool.map(export_run, *zip(*args)):
+                results.append(result)
+                _print_result(result)
+    return results
+
+
+def _print_result(result):
+    run_name, out_path, n_rows, n_cols = result
+    if out_path is not None:
+        print(f"{run_name}: saved -> {out_path}  ({n_rows:,} rows x {n_cols} cols)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export HDF5 runs to CSV / Parquet / Feather / Excel.")
+    parser.add_argument("input", help="Path to H5 file")
+    parser.add_argument("output_dir", help="Output directory (one file per run)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="Output format (default: parquet)")
+    parser.add_argument("--runs", nargs='+', default=None, help="Runs to export (default: all runs)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Rows read and written at once (default: {CHUNK_ROWS})")
+    parser.add_argument("--excel-max-rows", type=int, default=EXCEL_MAX_ROWS,
+                        help="Longest run exported to xlsx")
+    args = parser.parse_args()
+
+    export_h5(args.input, args.output_dir, fmt=args.format, runs=args.runs, workers=args.workers,
+              chunk_rows=args.chunk_rows, excel_max_rows=args.excel_max_rows)
+    print("Done.")
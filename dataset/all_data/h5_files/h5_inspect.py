@@ -0,0 +1,229 @@
+"""
+Fast inspection / verification of run HDF5 files.
+
+Sample counts come from dataset shape metadata (no data read), per-column
+lengths are checked against timestamp_ms, and sampling statistics are computed
+in one streaming pass over timestamp_ms only. Runs are inspected in parallel
+worker processes.
+
+Usage:
+    python -m dataset.all_data.h5_files.h5_inspect dataset.h5
+    python -m dataset.all_data.h5_files.h5_inspect original.h5 --compare downsampled.h5 --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+
+from dataset.dataset_utils import iter_row_slices
+
+CHUNK_ROWS = 1_000_000
+
+
+def run_columns(run_group):
+    """
+    Return the per-sample columns of a run and their lengths, from shape metadata.
+
+    Args:
+        run_group (h5py.Group): Run group.
+
+    Returns:
+        dict: "group/name" -> number of rows, for every dataset outside diagnostics/.
+    """
+    columns = {}
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset) and not name.startswith("diagnostics/") and obj.ndim > 0:
+            columns[name] = obj.shape[0]
+
+    run_group.visititems(visit)
+    return columns
+
+
+def interval_stats(timestamps, chunk_rows=CHUNK_ROWS):
+    """
+    Streaming statistics of the intervals between consecutive timestamps.
+
+    Chunk moments are combined with Chan's parallel update, so memory stays at
+    one chunk whatever the run length.
+
+    Args:
+        timestamps (h5py.Dataset | np.ndarray): 1-D timestamps in milliseconds.
+        chunk_rows (int): Number of timestamps read at once.
+
+    Returns:
+        dict: first / last timestamp, interval count, mean, std, min, max (ms)
+              and the number of non-increasing steps.
+    """
+    n_total = 0
+    mean = m2 = 0.0
+    lo, hi = np.inf, -np.inf
+    non_increasing = 0
+    first = last = None
+
+    for rows in iter_row_slices(timestamps.shape[0], chunk_rows):
+        t = np.asarray(timestamps[rows], dtype=np.float64)
+        if first is None:
+            first = t[0]
+        diffs = np.diff(t) if last is None else np.diff(t, prepend=last)
+        last = t[-1]
+        if len(diffs) == 0:
+            continue
+
+        n = len(diffs)
+        chunk_mean = diffs.mean()
+        chunk_m2 = ((diffs - chunk_mean) ** 2).sum()
+        delta = chunk_mean - mean
+        total = n_total + n
+        mean += delta * n / total
+        m2 += chunk_m2 + delta * delta * n_total * n / total
+        n_total = total
+
+        lo = min(lo, diffs.min())
+        hi = max(hi, diffs.max())
+        non_increasing += int(np.count_nonzero(diffs <= 0))
+
+    return {
+        "first_ms": first,
+        "last_ms": last,
+        "intervals": n_total,
+        "interval_mean_ms": mean if n_total else np.nan,
+        "interval_std_ms": np.sqrt(m2 / n_total) if n_total else np.nan,
+        "interval_min_ms": lo if n_total else np.nan,
+        "interval_max_ms": hi if n_total else np.nan,
+        "non_increasing": non_increasing,
+    }
+
+
+def inspect_run(path, run_name, sampling=True, chunk_rows=CHUNK_ROWS):
+    """
+    Inspect one run.
+
+    Args:
+        path (str): HDF5 file path.
+        run_name (str): Run group name.
+        sampling (bool): Also compute sampling statistics (one pass over timestamp_ms).
+        chunk_rows (int): Number of timestamps read at once.
+
+    Returns:
+        dict: run, n_samples, columns, mismatched (columns whose length differs
+              from timestamp_ms), attrs and, if sampling, the interval_stats() fields
+              plus duration_s and rate_hz.
+    """
+    with h5py.File(path, "r") as f:
+        g = f[run_name]
+        columns = run_columns(g)
+        n = columns.get("timestamp_ms", 0)
+        info = {
+            "run": run_name,
+            "n_samples": n,
+            "columns": columns,
+            "mismatched": {name: length for name, length in columns.items() if length != n},
+            "attrs": {k: (v.item() if hasattr(v, "item") else v) for k, v in g.attrs.items()},
+        }
+        if sampling and "timestamp_ms" in g and n > 0:
+            info.update(interval_stats(g["timestamp_ms"], chunk_rows))
+            duration_s = (info["last_ms"] - info["first_ms"]) / 1000.0
+            info["duration_s"] = duration_s
+            info["rate_hz"] = n / duration_s if duration_s > 0 else 0.0
+    return info
+
+
+def inspect_file(path, runs=None, sampling=True, workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Inspect every run of a file (or only ``runs``), in parallel.
+
+    Args:
+        path (str): HDF5 file path.
+        runs (list[str] | None): Run names, None = all runs.
+        sampling (bool): Also compute sampling statistics.
+        workers (int | None): Worker processes (None = CPU count, 1 = in-process).
+        chunk_rows (int): Number of timestamps read at once.
+
+    Returns:
+        list[dict]: One inspect_run() dict per run, in file order.
+    """
+    with h5py.File(path, "r") as f:
+        run_names = [name for name in f.keys() if isinstance(f[name], h5py.Group)]
+    if runs is not None:
+        run_names = [name for name in run_names if name in runs]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(run_names) <= 1:
+        return [inspect_run(path, name, sampling, chunk_rows) for name in run_names]
+    with ProcessPoolExecutor(max_workers=min(workers, len(run_names))) as pool:
+        return list(pool.map(inspect_run, [path] * len(run_names), run_names,
+                             [sampling] * len(run_names), [chunk_rows] * len(run_names)))
+
+
+def compare_files(original_path, derived_path, workers=None):
+    """
+    Compare a derived file (e.g. downsampled) against its original using shape metadata only.
+
+    Args:
+        original_path (str): Original HDF5 file.
+        derived_path (str): Derived HDF5 file.
+        workers (int | None): Worker processes.
+
+    Returns:
+        list[dict]: Per run of the derived file: run, original / derived sample
+                    counts, ratio, missing_in_original, missing_columns (columns of
+                    the original absent from the derived run) and mismatched columns.
+    """
+    original = {info["run"]: info for info in inspect_file(original_path, sampling=False, workers=workers)}
+    derived = inspect_file(derived_path, sampling=False, workers=workers)
+
+    results = []
+    for info in derived:
+        orig = original.get(info["run"])
+        orig_len = orig["n_samples"] if orig else 0
+        results.append({
+            "run": info["run"],
+            "original": orig_len,
+            "derived": info["n_samples"],
+            "ratio": orig_len / info["n_samples"] if info["n_samples"] > 0 else 0,
+            "missing_in_original": orig is None,
+            "missing_columns": sorted(set(orig["columns"]) - set(info["columns"])) if orig else [],
+            "mismatched": info["mismatched"],
+        })
+    return results
+
+
+def print_report(infos):
+    """Print inspect_file() results as a table, then any column length mismatches."""
+    print(f"{'run':<40}{'samples':>10}{'duration min':>14}{'rate Hz':>9}"
+          f"{'dt mean ms':>12}{'dt std':>9}{'dt min':>9}{'dt max':>10}{'non-incr':>9}")
+    for info in infos:
+        if "duration_s" in info:
+            print(f"{info['run']:<40}{info['n_samples']:>10}{info['duration_s'] / 60:>14.1f}"
+                  f"{info['rate_hz']:>9.2f}{info['interval_mean_ms']:>12.1f}{info['interval_std_ms']:>9.1f}"
+                  f"{info['interval_min_ms']:>9.1f}{info['interval_max_ms']:>10.1f}{info['non_increasing']:>9}")
+        else:
+            print(f"{info['run']:<40}{info['n_samples']:>10}")
+    for info in infos:
+        for name, length in info["mismatched"].items():
+            print(f"  {info['run']}: column '{name}' has {length} rows, timestamp_ms has {info['n_samples']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect / verify run HDF5 files.")
+    parser.add_argument("input", help="Path to H5 file")
+    parser.add_argument("--compare", default=None, help="Derived H5 file to verify against the input")
+    parser.add_argument("--runs", nargs='+', default=None, help="Only inspect these runs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--no-sampling", action="store_true", help="Skip sampling statistics (metadata only)")
+    args = parser.parse_args()
+
+    if args.compare:
+        for r in compare_files(args.input, args.compare, workers=args.workers):
+            status = "OK" if not (r["missing_in_original"] or r["missing_columns"] or r["mismatched"]) else "CHECK"
+            print(f"{r['run']:<40}{r['original']:>10} -> {r['derived']:<10} ratio {r['ratio']:.1f}x  {status}")
+            for name in r["missing_columns"]:
+                print(f"  missing column '{name}'")
+            for name, length in r["mismatched"].items():
+                print(f"  column '{name}' has {length} rows, timestamp_ms has {r['derived']}")
+    else:
+        print_report(inspect_file(args.input, runs=args.runs, sampling=not args.no_sampling,
+                                  workers=args.workers))
@@ -0,0 +1,234 @@
+"""
+Cell-level analytics on bms/cell_voltages, streamed chunk-wise over the HDF5 runs.
+
+Per run, in one pass over (timestamp_ms, bms/current, bms/cell_voltages):
+
+    imbalance       spread (max - min cell voltage) per sample: mean, p50 / p95, max, at the end
+    weakest cell    how often each cell is the lowest one, mean offset of each cell from the pack mean
+    resistance      per-cell internal resistance dV/dI over load steps (current changes of at
+                    least step_A between consecutive samples), median over the steps
+
+The per-run results form one table, and linear trends across runs (in file
+order) show cells drifting apart or ageing faster than the rest.
+
+Usage:
+    python -m dataset.data_analysis.cell_analytics dataset/hoverboard_bms_dataset.h5 --output cell_analytics.csv
+    python -m dataset.data_analysis.cell_analytics dataset/hoverboard_bms_dataset.h5 --type discharge --name "%80pct%"
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from dataset.dataset_utils import iter_row_slices
+from dataset.run_catalog import DEFAULT_CATALOG, select_runs
+from dataset.stats_engine import QuantileSketch
+
+CHUNK_ROWS = 200_000
+STEP_A = 2.0            # minimum current change of a load step
+MAX_STEP_S = 2.0        # maximum time between the two samples of a load step
+
+
+class CellStats:
+    """Streaming cell statistics of one run; update() with consecutive chunks."""
+
+    def __init__(self, n_cells, step_A=STEP_A, max_step_s=MAX_STEP_S):
+        self.n_cells = n_cells
+        self.step_A = step_A
+        self.max_step_s = max_step_s
+        self.n = 0
+        self.spread_sum = 0.0
+        self.spread_max = 0.0
+        self.spread_last = np.nan
+        self.spread_sketch = QuantileSketch()
+        self.weakest_counts = np.zeros(n_cells, dtype=np.int64)
+        self.offset_sum = np.zeros(n_cells)
+        self.min_cell_V = np.inf
+        self.steps = []         # (n_steps_in_chunk, n_cells + 1): per-cell and pack dV/dI
+        self._last = None       # (t, I, cells) of the last valid sample of the previous chunk
+
+    def update(self, t_s, current_A, cells_V):
+        """
+        Add a chunk of samples.
+
+        Args:
+            t_s (np.ndarray): Sample times in seconds, shape (m,).
+            current_A (np.ndarray): Pack current, shape (m,).
+            cells_V (np.ndarray): Cell voltages, shape (m, >= n_cells).
+        """
+        cells = np.asarray(cells_V, dtype=np.float64)[:, :self.n_cells]
+        valid = cells.min(axis=1) > 0  # placeholder samples before the first BMS reading are all zero
+        t, I, cells = t_s[valid], current_A[valid], cells[valid]
+        if len(t) == 0:
+            return
+
+        spread = cells.max(axis=1) - cells.min(axis=1)
+        self.n += len(spread)
+        self.spread_sum += float(spread.sum())
+        self.spread_max = max(self.spread_max, float(spread.max()))
+        self.spread_last = float(spread[-1])
+        self.spread_sketch.update(spread)
+        self.weakest_counts += np.bincount(cells.argmin(axis=1), minlength=self.n_cells)
+        self.offset_sum += (cells - cells.mean(axis=1, keepdims=True)).sum(axis=0)
+        self.min_cell_V = min(self.min_cell_V, float(cells.min()))
+
+        # Load steps between consecutive samples, including the one across the chunk boundary
+        if self._last is not None:
+            t = np.concatenate([[self._last[0]], t])
+            I = np.concatenate([[self._last[1]], I])
+            cells = np.vstack([self._last[2], cells])
+        dI = np.diff(I)
+        step = (np.abs(dI) >= self.step_A) & (np.diff(t) <= self.max_step_s)
+        if step.any():
+            dV = np.diff(cells, axis=0)[step]
+            dV = np.column_stack([dV, dV.sum(axis=1)])
+            self.steps.append(dV / dI[step, None])  # V = OCV + R * I  ->  R = dV / dI
+        self._last = (t[-1], I[-1], cells[-1])
+
+    def result(self):
+        """
+        Returns:
+            dict: n_samples, spread_mean_mV / p50 / p95 / max / end, min_cell_V,
+                  weakest_cell and weakest_share, n_steps, r_pack_mohm, and per
+                  cell r_cell_<i>_mohm, weakest_share_<i>, offset_cell_<i>_mV.
+        """
+        n = max(self.n, 1)
+        p50, p95 = self.spread_sketch.quantiles([0.5, 0.95])
+        steps = np.vstack(self.steps) if self.steps else np.empty((0, self.n_cells + 1))
+        r = np.median(steps, axis=0) if len(steps) else np.full(self.n_cells + 1, np.nan)
+        share = self.weakest_counts / n
+        result = {
+            "n_samples": self.n,
+            "spread_mean_mV": self.spread_sum / n * 1000.0,
+            "spread_p50_mV": p50 * 1000.0,
+            "spread_p95_mV": p95 * 1000.0,
+            "spread_max_mV": self.spread_max * 1000.0,
+            "spread_end_mV": self.spread_last * 1000.0,
+            "min_cell_V": self.min_cell_V if self.n else np.nan,
+            "weakest_cell": int(np.argmax(self.weakest_counts)),
+            "weakest_share": float(share.max()),
+            "n_steps": len(steps),
+            "r_pack_mohm": r[-1] * 1000.0,
+        }
+        for i in range(self.n_cells):
+            result[f"r_cell_{i}_mohm"] = r[i] * 1000.0
+        for i in range(self.n_cells):
+            result[f"weakest_share_{i}"] = float(share[i])
+        for i in range(self.n_cells):
+            result[f"offset_cell_{i}_mV"] = self.offset_sum[i] / n * 1000.0
+        return result
+
+
+def analyse_run(h5_path, run_name, chunk_rows=CHUNK_ROWS, step_A=STEP_A, max_step_s=MAX_STEP_S):
+    """
+    Cell statistics of one run, in one chunked pass.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        run_name (str): Run group name.
+        chunk_rows (int): Rows read at once.
+        step_A (float): Minimum current change of a load step.
+        max_step_s (float): Maximum time between the samples of a load step.
+
+    Returns:
+        dict: CellStats.result() plus "run" (None if the run has no cell voltages).
+    """
+    with h5py.File(h5_path, "r") as f:
+        g = f[run_name]
+        if "bms" not in g or "cell_voltages" not in g["bms"]:
+            return None
+        ds_cells = g["bms/cell_voltages"]
+        n_cells = ds_cells.shape[1]
+        if "cell_count" in g["bms"] and g["bms/cell_count"].shape[0]:
+            n_cells = int(g["bms/cell_count"][-1]) or n_cells
+        stats = CellStats(n_cells, step_A, max_step_s)
+        for rows in iter_row_slices(ds_cells.shape[0], chunk_rows):
+            stats.update(g["timestamp_ms"][rows] / 1000.0, g["bms/current"][rows], ds_cells[rows])
+    return {"run": run_name, **stats.result()}
+
+
+def analyse_runs(h5_path, runs=None, workers=None, **kwargs):
+    """
+    Cell statistics of several runs, in parallel worker processes.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        runs (list[str] | None): Runs to analyse (default: all).
+        workers (int | None): Worker processes (default: CPU count; 1 = in process).
+        **kwargs: Passed to analyse_run().
+
+    Returns:
+        pd.DataFrame: One row per run with cell voltages, in file order (empty if none has them).
+    """
+    if runs is None:
+        with h5py.File(h5_path, "r") as f:
+            runs = list(f.keys())
+    if workers == 1:
+        results = [analyse_run(h5_path, run, **kwargs) for run in runs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyse_run, h5_path, run, **kwargs) for run in runs]
+            results = [fut.result() for fut in futures]
+    results = [r for r in results if r is not None]
+    if not results:
+        return pd.DataFrame(columns=["run"]).set_index("run")
+    return pd.DataFrame(results).set_index("run")
+
+
+def trends(table, columns=None):
+    """
+    Linear trend of each column across runs (in table order).
+
+    Args:
+        table (pd.DataFrame): analyse_runs() output.
+        columns (list[str] | None): Columns (default: spread and resistance columns).
+
+    Returns:
+        pd.Series: Slope per run of each column (NaN values ignored).
+    """
+    if columns is None:
+        columns = [c for c in table.columns if c.startswith(("spread_", "r_"))]
+    x = np.arange(len(table), dtype=np.float64)
+    slopes = {}
+    for col in columns:
+        y = table[col].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(y)
+        slopes[col] = np.polyfit(x[ok], y[ok], 1)[0] if ok.sum() >= 2 else np.nan
+    return pd.Series(slopes, name="slope_per_run")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cell imbalance, weakest cell and internal resistance per run.")
+    parser.add_argument("input", help="Path to H5 file")
+    parser.add_argument("--runs", nargs="+", default=None, help="Runs to analyse (default: all)")
+    parser.add_argument("--type", dest="run_type", choices=("charge", "discharge", "idle"),
+                        help="Only runs of this type (from the run catalog)")
+    parser.add_argument("--name", help="Only runs matching this SQL LIKE pattern (from the run catalog)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help=f"Run catalog (default: {DEFAULT_CATALOG})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--step", type=float, default=STEP_A, help=f"Load step threshold in A (default: {STEP_A})")
+    parser.add_argument("--output", default=None, help="CSV file for the per-run table")
+    args = parser.parse_args()
+
+    runs = args.runs
+    if args.run_type or args.name:
+        selected = select_runs(args.input, args.catalog, run_type=args.run_type, name=args.name)
+        runs = [r for r in runs if r in selected] if runs else selected
+    table = analyse_runs(args.input, runs=runs, workers=args.workers, step_A=args.step)
+    if table.empty:
+        raise SystemExit("No runs with cell voltages.")
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", None)
+    summary = ["n_samples", "spread_mean_mV", "spread_p95_mV", "spread_end_mV", "weakest_cell",
+               "weakest_share", "n_steps", "r_pack_mohm"]
+    print(table[summary].round(3))
+    print("\nPer-cell resistance [mOhm]:")
+    print(table[[c for c in table.columns if c.startswith("r_cell_")]].round(2))
+    if len(table) >= 2:
+        print("\nTrend across runs (slope per run):")
+        print(trends(table).round(4))
+    if args.output:
+        table.to_csv(args.output)
+        print(f"Saved cell analytics to {args.output}")
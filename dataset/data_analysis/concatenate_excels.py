@@ -1,126 +1,159 @@
 import pandas as pd
 import numpy as np
-import glob
-import os
-from datetime import datetime, timedelta
+
+from dataset.feature_store import FeatureStore
 
 # ===================== SETTINGS =====================
 
-DATA_FOLDER = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\new_runs_excel"   # folder containing Excel files
+STORE_ROOT = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\feature_store"   # feature store with the runs
 RUN_KEYWORD = "80pct_speed_25kg_load_discharge"
 
 TIME_COLUMN = "time_string"
-OUTPUT_FILE = "merged_80pct_speed_25kg_load_discharge.xlsx"
+OUTPUT_RUN = "merged_80pct_speed_25kg_load_discharge"   # stored in the feature store
 
 SAMPLE_PERIOD_SEC = 1  # fixed sampling rate
+GAP_FILL = "nan"       # gaps on the time grid: "nan", "ffill" or "interpolate"
 
 # =========================================================
 
+DAY_SEC = 24 * 3600
+
 
 def parse_time_string(t):
     """
+    Vectorized conversion of time strings to seconds since midnight.
+
     Handles:
     - b'10:50:33.28017' (bytes)
     - "b'10:50:33.28017'" (string from Excel)
     - "10:50:33.28017"
-    """
-
-    if pd.isna(t):
-        return np.nan
-
-    # Convert bytes -> string
-    if isinstance(t, bytes):
-        t = t.decode()
-
-    # Remove leading b' and trailing '
-    t = str(t).strip()
-
-    if t.startswith("b'") and t.endswith("'"):
-        t = t[2:-1]
 
-    # Parse time
-    dt = datetime.strptime(t, "%H:%M:%S.%f")
+    Args:
+        t (pd.Series): Time strings.
 
-    return dt.hour * 3600 + dt.minute * 60 + dt.second
+    Returns:
+        np.ndarray: Seconds since midnight (float, NaN where missing).
+    """
+    t = pd.Series(t)
+    t = t.map(lambda v: v.decode() if isinstance(v, bytes) else v).astype("string")
+    t = t.str.strip().str.replace(r"^b'(.*)'$", r"\1", regex=True)
+    return pd.to_timedelta(t, errors="coerce").dt.total_seconds().to_numpy()
 
 
 def seconds_to_time_string(sec):
     """
-    Converts seconds since midnight -> HH:MM:SS.000000
+    Vectorized conversion of seconds since midnight -> HH:MM:SS.ffffff
+
+    Args:
+        sec (np.ndarray): Seconds (values past midnight wrap to the next day).
+
+    Returns:
+        np.ndarray: Time strings.
     """
-    sec = int(sec)
-    t = timedelta(seconds=sec)
-    total_seconds = int(t.total_seconds())
+    us = np.rint(np.asarray(sec, dtype=np.float64) % DAY_SEC * 1e6).astype(np.int64)
+    return pd.to_datetime(us, unit="us").strftime("%H:%M:%S.%f").to_numpy()
 
-    h = total_seconds // 3600
-    m = (total_seconds % 3600) // 60
-    s = total_seconds % 60
 
-    return f"{h:02d}:{m:02d}:{s:02d}.000000"
+def unwrap_midnight(sec):
+    """Add a day each time the time of day jumps back by more than 12 h (run crossing midnight)."""
+    sec = np.asarray(sec, dtype=np.float64)
+    jumps = np.diff(sec, prepend=sec[:1]) < -DAY_SEC / 2
+    return sec + DAY_SEC * np.cumsum(jumps)
 
 
-def load_and_prepare(filepath):
-    df = pd.read_excel(filepath)
+def load_and_prepare(store, run_name):
+    """
+    Load a run of ``store`` (FeatureStore) with a continuous "_time_sec" column.
 
-    # Convert time_string to seconds
-    df["_time_sec"] = df[TIME_COLUMN].apply(parse_time_string)
+    Uses timestamp_ms (epoch, unaffected by midnight) when present, otherwise
+    the time strings unwrapped across midnight. "_tod_sec" keeps the time of day
+    of the first sample so time strings can be regenerated.
+    """
+    df = store.read(run_name)
+    tod = parse_time_string(df[TIME_COLUMN])
+    if "timestamp_ms" in df.columns:
+        df["_time_sec"] = df["timestamp_ms"].to_numpy(dtype=np.float64) / 1000.0
+    else:
+        df["_time_sec"] = unwrap_midnight(tod)
+    df.attrs["tod0"] = tod[0] - df["_time_sec"].iloc[0]  # time of day = _time_sec + tod0
 
     # Sort by time
-    df = df.sort_values("_time_sec").reset_index(drop=True)
+    df = df.sort_values("_time_sec", kind="stable").reset_index(drop=True)
     return df
 
 
-# Find all matching files
-files = sorted(glob.glob(os.path.join(DATA_FOLDER, f"*{RUN_KEYWORD}*.xlsx")))
-
-if len(files) < 2:
-    raise ValueError("Need at least two files to concatenate.")
-
-print("Files found:")
-for f in files:
-    print(" -", os.path.basename(f))
-
-# Load first file
-merged_df = load_and_prepare(files[0])
-
-# Process remaining files
-for file in files[1:]:
-    df_next = load_and_prepare(file)
-
-    last_time = merged_df["_time_sec"].iloc[-1]
-    next_start = df_next["_time_sec"].iloc[0]
-
-    gap_seconds = next_start - last_time - SAMPLE_PERIOD_SEC
-
-    if gap_seconds > 0:
-        print(f"Filling gap of {gap_seconds} seconds before {os.path.basename(file)}")
-
-        gap_times = np.arange(
-            last_time + SAMPLE_PERIOD_SEC,
-            next_start,
-            SAMPLE_PERIOD_SEC
-        )
-
-        gap_df = pd.DataFrame({"_time_sec": gap_times})
-
-        # Fill all other columns with zeros
-        for col in merged_df.columns:
-            if col not in [TIME_COLUMN, "_time_sec"]:
-                gap_df[col] = 0
-
-        merged_df = pd.concat([merged_df, gap_df], ignore_index=True)
-
-    # Append actual data
-    merged_df = pd.concat([merged_df, df_next], ignore_index=True)
-
-# Convert seconds back to time_string
-merged_df[TIME_COLUMN] = merged_df["_time_sec"].apply(seconds_to_time_string)
-
-# Final cleanup
-merged_df = merged_df.sort_values("_time_sec").reset_index(drop=True)
-merged_df = merged_df.drop(columns=["_time_sec"])
-
-# Save
-merged_df.to_excel(OUTPUT_FILE, index=False)
-
-print(f"\nMerged file saved as: {OUTPUT_FILE}")
+def to_grid(merged_df, period, fill, max_gap=1.5):
+    """
+    Fill gaps in the sample times: where consecutive samples are more than
+    ``max_gap`` periods apart, filler rows are inserted one period apart and
+    filled according to ``fill``. Every real sample is kept with its own time.
+    """
+    t = merged_df["_time_sec"].to_numpy(dtype=np.float64)
+    dt = np.diff(t)
+    gap_idx = np.flatnonzero(dt > max_gap * period)
+    n_fill = np.rint(dt[gap_idx] / period).astype(np.int64) - 1
+    fill_times = np.concatenate(
+        [t[i] + period * np.arange(1, n + 1) for i, n in zip(gap_idx, n_fill)] or [np.empty(0)]
+    )
+
+    merged_df = merged_df.assign(is_gap=False)
+    gaps = pd.DataFrame({"_time_sec": fill_times, "is_gap": True})
+    grid = pd.concat([merged_df, gaps], ignore_index=True)
+    grid = grid.sort_values("_time_sec", kind="stable").reset_index(drop=True)
+
+    numeric = [c for c in grid.select_dtypes(include="number").columns if c != "_time_sec"]
+    if fill == "ffill":
+        grid = grid.ffill()
+    elif fill == "interpolate":
+        grid[numeric] = (grid.set_index("_time_sec")[numeric]
+                         .interpolate(method="index", limit_area="inside").to_numpy())
+        grid = grid.ffill()  # non-numeric columns
+    elif fill != "nan":
+        raise ValueError(f"Unknown GAP_FILL '{fill}', expected 'nan', 'ffill' or 'interpolate'")
+    return grid.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # Find all matching runs
+    store = FeatureStore(STORE_ROOT)
+    files = store.runs(f"*{RUN_KEYWORD}*")
+
+    if len(files) < 2:
+        raise ValueError("Need at least two runs to concatenate.")
+
+    print("Runs found:")
+    for f in files:
+        print(" -", f)
+
+    # Collect all pieces, then concatenate once
+    pieces = []
+    for file in files:
+        df_next = load_and_prepare(store, file)
+        if pieces:
+            last_time = pieces[-1]["_time_sec"].iloc[-1]
+            # Time strings only: a run starting "earlier" than the previous one ended is on the next day
+            while "timestamp_ms" not in df_next.columns and df_next["_time_sec"].iloc[0] < last_time:
+                df_next["_time_sec"] += DAY_SEC
+            gap_seconds = df_next["_time_sec"].iloc[0] - last_time - SAMPLE_PERIOD_SEC
+            if gap_seconds > 0:
+                print(f"Gap of {gap_seconds:.0f} seconds before {file} ({GAP_FILL})")
+        pieces.append(df_next)
+
+    tod0 = pieces[0].attrs["tod0"]
+    merged_df = pd.concat(pieces, ignore_index=True)
+    merged_df = merged_df.sort_values("_time_sec", kind="stable").reset_index(drop=True)
+    merged_df = to_grid(merged_df, SAMPLE_PERIOD_SEC, GAP_FILL)
+
+    # Regenerate time strings and timestamps (also for the filler rows)
+    merged_df[TIME_COLUMN] = seconds_to_time_string(merged_df["_time_sec"].to_numpy() + tod0)
+    if "timestamp_ms" in merged_df.columns:
+        merged_df["timestamp_ms"] = merged_df["_time_sec"] * 1000.0
+
+    # Final cleanup
+    merged_df = merged_df.drop(columns=["_time_sec"])
+
+    # Save
+    store.write(OUTPUT_RUN, merged_df)
+
+    print(f"\nMerged run saved as: {store.path(OUTPUT_RUN)} "
+          f"({len(merged_df)} rows, {int(merged_df['is_gap'].sum())} gap rows)")
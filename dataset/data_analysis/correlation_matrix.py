@@ -1,8 +1,16 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
-excel_file_name = "run_001_40pct_speed_15kg_load_discharge"
+from dataset.feature_store import FeatureStore
+from dataset.run_catalog import select_runs
+from dataset.stats_engine import dataset_stats
+
+run_name = "run_001_40pct_speed_15kg_load_discharge"
+# Set run_name = None for the correlation pooled over the runs of H5_FILE matching
+# RUN_FILTER in the run catalog (streamed, cached per run)
+H5_FILE = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\all_data\h5_files\hoverboard_bms_dataset_combined2.h5"
+CATALOG = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\run_catalog.sqlite"
+RUN_FILTER = {}  # RunCatalog.query() filters, e.g. {"run_type": "discharge"}; {} = every run
 
 # cols to drop
 cols_to_drop = [
@@ -30,25 +38,35 @@ cols_to_drop = [
     # "hoverboard/hb_speedR_meas"
 ]
 
-# Load data
-df = pd.read_excel(fr"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\new_runs_excel\{excel_file_name}.xlsx")
-# Print columns available
-print("Columns in dataset:")
-print(df.columns.tolist())
-# Keep only numeric columns
-df_numeric = df.select_dtypes(include="number")
-# Drop unwanted columns if they exist
-df_filtered = df_numeric.drop(columns=cols_to_drop, errors="ignore")
+if run_name is None:
+    # Pooled over the selected runs: one streaming pass per run, merged without re-reading
+    runs = select_runs(H5_FILE, CATALOG, **RUN_FILTER)
+    print(f"Pooling {len(runs)} runs matching {RUN_FILTER}")
+    per_run, pooled = dataset_stats(H5_FILE, runs=runs)
+    run_name = "_".join(["all", *map(str, RUN_FILTER.values()), "runs"])
+    print("Columns in dataset:")
+    print(pooled.columns)
+    keep = [c for c in pooled.columns if c not in cols_to_drop]
+    corr_matrix = pooled.corr().loc[keep, keep]
+else:
+    # Load data, reading only the columns used (schema first, then the selected columns)
+    store = FeatureStore(r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\feature_store")
+    print("Columns in dataset:")
+    print(store.columns(run_name))
+    df = store.read(run_name, columns=[c for c in store.columns(run_name) if c not in cols_to_drop])
+    # Keep only numeric columns
+    df_filtered = df.select_dtypes(include="number")
+    # Correlation matrix
+    corr_matrix = df_filtered.corr(method="pearson")
 # Clean column names
-df_filtered.columns = df_filtered.columns.str.replace(r"^hoverboard/", "", regex=True)
-# Correlation matrix
-corr_matrix = df_filtered.corr(method="pearson")
+corr_matrix.index = corr_matrix.index.str.replace(r"^hoverboard/", "", regex=True)
+corr_matrix.columns = corr_matrix.columns.str.replace(r"^hoverboard/", "", regex=True)
 # Print correlation matrix in console
-print("Pearson Correlation Matrix for: ", excel_file_name)
+print("Pearson Correlation Matrix for: ", run_name)
 print(corr_matrix)
 # create a text file to save the correlation matrix
 # print the matrix to a text file
-with open(fr"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\data_analysis\correlation_matrices\{excel_file_name}_correlation_matrix.txt", "w") as f:
+with open(fr"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\data_analysis\correlation_matrices\{run_name}_correlation_matrix.txt", "w") as f:
     f.write(corr_matrix.to_string())
 
 
@@ -74,7 +92,7 @@ ax.set_yticklabels(corr_matrix.columns, fontsize=9)
 
 # Title
 ax.set_title(
-    f"Pearson Correlation Matrix ({excel_file_name})",
+    f"Pearson Correlation Matrix ({run_name})",
     fontsize=14,
     pad=20
 )
@@ -1,57 +1,29 @@
-import h5py
-import pandas as pd
 import numpy as np
-import os
 
-def read_group(group, prefix=""):
-    data = {}
-    for key in group.keys():
-        item = group[key]
-        name = prefix + key
-
-        if isinstance(item, h5py.Dataset):
-            arr = item[()]
-
-            if arr.ndim == 1:
-                data[name] = arr
-
-            elif arr.ndim == 2:
-                rows, cols = arr.shape
-                for c in range(cols):
-                    data[f"{name}_{c}"] = arr[:, c]
-
-            else:
-                flat = arr.reshape(arr.shape[0], -1)
-                rows, cols = flat.shape
-                for c in range(cols):
-                    data[f"{name}_{c}"] = flat[:, c]
+from dataset.all_data.h5_files.h5_export import export_h5, iter_run_tables, EXCEL_MAX_ROWS
 
-        elif isinstance(item, h5py.Group):
-            data.update(read_group(item, name + "/"))
 
-    return data
-
-
-def h5_to_excel(h5_path, output_folder):
-    os.makedirs(output_folder, exist_ok=True)
-
-    with h5py.File(h5_path, "r") as f:
-        for run_name in f.keys():  # each top-level group is a run
-            run_group = f[run_name]
-
-            print(f"Processing run: {run_name}")
+def read_group(group, prefix=""):
+    """Return the per-sample columns of a run group as a dict of arrays."""
+    data = {}
+    for table in iter_run_tables(group):
+        for name, column in zip(table.column_names, table.columns):
+            data.setdefault(prefix + name, []).append(column.to_numpy(zero_copy_only=False))
+    return {name: np.concatenate(parts) for name, parts in data.items()}
 
-            data = read_group(run_group)
-            df = pd.DataFrame(data)
 
-            out_path = os.path.join(output_folder, f"{run_name}.xlsx")
-            df.to_excel(out_path, index=False)
+def h5_to_excel(h5_path, output_folder, fmt="xlsx", workers=None, excel_max_rows=EXCEL_MAX_ROWS):
+    """
+    Export every run of ``h5_path`` to ``output_folder``, one file per run.
 
-            print(f"Saved: {out_path}")
+    Excel is slow and limited to ~1M rows per sheet; runs longer than
+    ``excel_max_rows`` are skipped. Use fmt="parquet" or "csv" for long runs.
+    """
+    return export_h5(h5_path, output_folder, fmt=fmt, workers=workers, excel_max_rows=excel_max_rows)
 
 
 if __name__ == "__main__":
     h5_to_excel(
         r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\all_data\h5_files\hoverboard_bms_dataset_combined2.h5",
         r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\all_data\excel_files",
-    )
\ No newline at end of file
+    )
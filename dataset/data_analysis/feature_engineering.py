@@ -1,35 +1,23 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+from dataset.feature_store import FeatureStore
+from soc_estimation.features import FeaturePipeline
 
-excel_file_name = "run_004_80pct_speed_15kg_load_discharge"
+run_name = "run_004_80pct_speed_15kg_load_discharge"
 
-# Load data
-df = pd.read_excel(fr"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\new_runs_excel\{excel_file_name}.xlsx")
+# Load data (feature store: one Parquet file per run, see dataset/feature_store.py)
+store = FeatureStore(r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\feature_store")
+df = store.read(run_name)
 # Print columns available
 print("Columns in dataset:")
 print(df.columns.tolist())
 
-# Extract cell voltage columns
-cell_voltage_cols = [
-    col for col in df.columns
-    if "cell" in col.lower() and "voltage" in col.lower()
-]
-print("Detected cell voltage columns:")
-print(cell_voltage_cols)
+# Compute the engineered features with the same definitions the live predictor uses
+# (soc_estimation/features.py, cell voltages come from the bms/cell_voltages_<i> columns)
+new_features = ["V_cell_mean", "V_cell_min", "V_cell_max", "V_cell_std",
+                "time_s", "dV_pack_dt", "dI_pack_dt", "dSOC_dt"]
+pipeline = FeaturePipeline.from_names(new_features)
+features_df = pipeline.transform(df)
+print(features_df.describe())
 
-# create new features based on cell voltages
-df["V_cell_mean"]  = df[cell_voltage_cols].mean(axis=1) # average cell voltage
-df["V_cell_min"]   = df[cell_voltage_cols].min(axis=1)  # minimum cell voltage
-df["V_cell_max"]   = df[cell_voltage_cols].max(axis=1)  # maximum cell voltage
-df["V_cell_std"]   = df[cell_voltage_cols].std(axis=1)  # standard deviation of cell voltages
-
-# create time-based features
-df["time_s"] = df["timestamp_ms"] / 1000.0
-df["dV_pack_dt"] = df["bms/voltage"].diff() / df["time_s"].diff() # rate of change of pack voltage
-df["dI_pack_dt"] = df["bms/current"].diff() / df["time_s"].diff() # rate of change of pack current
-df["dSOC_dt"] = df["bms/battery_level"].diff() / df["time_s"].diff() # rate of change of SOC
-
-# Save the new dataframe with features
-df.to_excel(fr"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\new_runs_excel\{excel_file_name}_new_features.xlsx", index=False)
-print(f"Saved new features to {excel_file_name}_new_features.xlsx")
\ No newline at end of file
+# Save the new features as columns of the run
+store.update(run_name, features_df)
+print(f"Saved new features to {store.path(run_name)}")
\ No newline at end of file
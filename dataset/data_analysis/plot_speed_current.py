@@ -1,22 +1,24 @@
+import re
+
+import h5py
 import pandas as pd
 import matplotlib.pyplot as plt
-import glob
-import os
 
-# Folder containing Excel files
-data_folder = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\test_excels"
-excel_files = glob.glob(os.path.join(data_folder, "*.xlsx"))
-print("Found Excel files:", excel_files)
+from dataset.run_catalog import select_runs
 
-plt.figure(figsize=(10, 6))
+# Discharge runs of the combined dataset, selected from the run catalog
+H5_FILE = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\all_data\h5_files\hoverboard_bms_dataset_combined2.h5"
+CATALOG = r"C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\run_catalog.sqlite"
+runs = select_runs(H5_FILE, CATALOG, run_type="discharge", name="%pct_speed%")
+print("Found runs:", runs)
 
-for file in excel_files:
-    # Read Excel file
-    df = pd.read_excel(file)
+plt.figure(figsize=(10, 6))
 
+for run_name in runs:
     # ---- SELECT COLUMNS ----
-    time_ms = df["timestamp_ms"]
-    current = -df["bms/current"]
+    with h5py.File(H5_FILE, "r") as f:
+        time_ms = pd.Series(f[run_name]["timestamp_ms"][:])
+        current = -pd.Series(f[run_name]["bms/current"][:])
 
     # ---- CONVERT ms TIMESTAMP ----
     # Convert to datetime
@@ -27,22 +29,18 @@ for file in excel_files:
     print(time_s)
     print(current)
 
-    # ---- LEGEND LABEL FROM FILENAME ----
-    filename = os.path.basename(file).lower()
+    # ---- LEGEND LABEL FROM RUN NAME ----
+    # e.g. file2_run_010_80pct_speed_25kg_load_discharge
+    name = run_name.lower()
 
-    if "80pct" in filename:
-        speed = "80% Speed"
-    elif "50pct" in filename:
-        speed = "50% Speed"
-    else:
-        speed = "Unknown Speed"
+    match = re.search(r"(\d+)pct_speed", name)
+    speed = f"{match.group(1)}% Speed" if match else "Unknown Speed"
 
-    if "noload" in filename:
+    match = re.search(r"(\d+)kg_load", name)
+    if match:
+        load = f"{match.group(1)} kg Load"
+    elif "noload" in name:
         load = "No Load"
-    elif "rollers_weights" in filename:
-        load = "Rollers + Weights"
-    elif "rollers" in filename:
-        load = "Rollers Only"
     else:
         load = "Unknown Load"
 
@@ -1,9 +1,12 @@
 import h5py
+import hashlib
 import os
 import numpy as np
 from datetime import datetime
 import time
 
+from dataset.instrumentation import span
+
 def init_run(hdf5_file: str, run_name: str, metadata: dict):
     """
     Initialize a new run in the HDF5 dataset, creating the file if it doesn't exist.
@@ -80,23 +83,10 @@ def init_run_dynamic(hdf5_file: str, run_name: str, metadata: dict,
     
         
         # Hoverboard datasets
-        g_hover = g_run.create_group("hoverboard")
-        for key, val in hoverboard_sample.items():
-            dtype = np.float32 if isinstance(val, float) else np.int32
-            if isinstance(val, list):
-                # Determine shape from list length
-                g_hover.create_dataset(key, shape=(0, len(val)), maxshape=(None, len(val)), dtype=np.float32)
-            else:
-                g_hover.create_dataset(key, shape=(0,), maxshape=(None,), dtype=dtype)
+        _create_sample_datasets(g_run.create_group("hoverboard"), hoverboard_sample)
         
         # BMS datasets
-        g_bms = g_run.create_group("bms")
-        for key, val in bms_sample.items():
-            dtype = np.float32 if isinstance(val, float) else np.int32
-            if isinstance(val, list):
-                g_bms.create_dataset(key, shape=(0, len(val)), maxshape=(None, len(val)), dtype=np.float32)
-            else:
-                g_bms.create_dataset(key, shape=(0,), maxshape=(None,), dtype=dtype)
+        _create_sample_datasets(g_run.create_group("bms"), bms_sample)
         
         # Metadata
         # g_meta = g_run.create_group("metadata")
@@ -108,6 +98,37 @@ def init_run_dynamic(hdf5_file: str, run_name: str, metadata: dict,
     else:
         print(f"New HDF5 file {hdf5_file} created and run {run_name} initialized")
 
+def _create_sample_datasets(group, sample: dict):
+    """Create one empty, resizable dataset per key of ``sample`` (lists become 2-D datasets)."""
+    for key, val in sample.items():
+        dtype = np.float32 if isinstance(val, float) else np.int32
+        if isinstance(val, list):
+            # Determine shape from list length
+            group.create_dataset(key, shape=(0, len(val)), maxshape=(None, len(val)), dtype=np.float32)
+        else:
+            group.create_dataset(key, shape=(0,), maxshape=(None,), dtype=dtype)
+
+def add_run_group(hdf5_file: str, run_name: str, group_name: str, sample: dict, attrs: dict = None):
+    """
+    Add a group of per-sample datasets to an existing, still empty run, e.g.
+    "prediction" with {"mlp/soc": 0.0, "mlp/inference_us": 0.0}. Rows then carry
+    a dict under ``group_name`` that append_rows writes like "hoverboard" / "bms".
+
+    Args:
+        hdf5_file (str): Path to HDF5 file
+        run_name (str): Run name, e.g., 'run_001'
+        group_name (str): Group name
+        sample (dict): Example dict for dataset names and types ("a/b" keys create sub-groups)
+        attrs (dict): Optional group attributes
+    """
+    with h5py.File(hdf5_file, "a") as f:
+        if run_name not in f:
+            raise ValueError(f"Run '{run_name}' does not exist in {hdf5_file}")
+        g = f[run_name].require_group(group_name)
+        _create_sample_datasets(g, sample)
+        for k, v in (attrs or {}).items():
+            g.attrs[k] = v
+
 def append_row(hdf5_file: str, run_name: str, timestamp_ms: float, time_string: str,
                hoverboard_data: dict, bms_data: dict):
     """
@@ -121,52 +142,145 @@ def append_row(hdf5_file: str, run_name: str, timestamp_ms: float, time_string:
         hoverboard_data (dict): Dict with hoverboard measurements.
         bms_data (dict): Dict with BMS measurements.
     """
-    with h5py.File(hdf5_file, "a") as f:
+    row = {
+        "timestamp_ms": timestamp_ms,
+        "time_string": time_string,
+        "hoverboard": hoverboard_data,
+        "bms": bms_data,
+    }
+    append_rows(hdf5_file, run_name, [row])
+
+def append_rows(hdf5_file: str, run_name: str, rows: list):
+    """
+    Append a batch of rows to the HDF5 datasets of a run, opening the file and
+    resizing each dataset only once per batch.
+
+    Args:
+        hdf5_file (str): Path to the HDF5 file.
+        run_name (str): Name of the run (e.g., "run_001").
+        rows (list[dict]): Rows shaped like
+            {"timestamp_ms": float, "time_string": str,
+             "hoverboard": {...}, "bms": {...}}.
+            Top-level dict values are written to the sub-group of the same name,
+            other values to the top-level dataset of the same name.
+    """
+    if not rows:
+        return
+
+    with span("hdf5.append_rows"), h5py.File(hdf5_file, "a") as f:
         if run_name not in f:
             raise ValueError(f"Run {run_name} does not exist in {hdf5_file}")
 
         g_run = f[run_name]
 
-        # Append timestamps
-        for ts_name, ts_val in [("timestamp_ms", timestamp_ms), ("time_string", time_string)]:
-            ts_dataset = g_run[ts_name]
-            ts_dataset.resize((ts_dataset.shape[0] + 1,))
-            ts_dataset[-1] = ts_val
-
-        # Append hoverboard data
-        g_hover = g_run["hoverboard"]
-        for key, value in hoverboard_data.items():
-            if key not in g_hover:
-                raise KeyError(f"Hoverboard dataset '{key}' not found in run '{run_name}'")
-            ds = g_hover[key]
-
-
-            # Handle 2D arrays
-            if len(ds.shape) == 2:
-                value = np.array(value).reshape(1, ds.shape[1])
-                ds.resize((ds.shape[0] + 1, ds.shape[1]))
-                ds[-1, :] = value
+        for key, first in rows[0].items():
+            if isinstance(first, dict) or first is None:
+                # Sub-group, e.g. hoverboard / bms
+                group = g_run[key]
+                group_rows = [row[key] or {} for row in rows]
+                for ds_name in group_rows[0]:
+                    if ds_name not in group:
+                        raise KeyError(f"{key.capitalize()} dataset '{ds_name}' not found in run '{run_name}'")
+                    _extend_dataset(group[ds_name], [r[ds_name] for r in group_rows])
             else:
-                ds.resize((ds.shape[0] + 1,))
-                ds[-1] = value
-
-        # Append BMS data
-        g_bms = g_run["bms"]
-        if bms_data is None:
-            bms_data = {}
-        for key, value in bms_data.items():
-            if key not in g_bms:
-                raise KeyError(f"BMS dataset '{key}' not found in run '{run_name}'")
-            ds = g_bms[key]
-
-            # Handle 2D arrays
-            if len(ds.shape) == 2:
-                value = np.array(value).reshape(1, ds.shape[1])
-                ds.resize((ds.shape[0] + 1, ds.shape[1]))
-                ds[-1, :] = value
+                # Top-level dataset, e.g. timestamp_ms / time_string
+                _extend_dataset(g_run[key], [row[key] for row in rows])
+
+def _extend_dataset(ds, values: list):
+    """Resize a dataset along its first axis and write ``values`` at the end."""
+    n = len(values)
+    start = ds.shape[0]
+    if h5py.check_string_dtype(ds.dtype) is not None:
+        data = np.array(values, dtype=object)
+    else:
+        data = np.asarray(values, dtype=ds.dtype).reshape((n,) + ds.shape[1:])
+    ds.resize((start + n,) + ds.shape[1:])
+    ds[start:] = data
+
+def set_run_attrs(hdf5_file: str, run_name: str, attrs: dict):
+    """
+    Add or overwrite attributes of an existing run (e.g. end-of-run diagnostics).
+
+    Args:
+        hdf5_file (str): Path to HDF5 file
+        run_name (str): Run name, e.g., 'run_001'
+        attrs (dict): Attribute name -> value
+    """
+    with h5py.File(hdf5_file, "a") as f:
+        if run_name not in f:
+            raise ValueError(f"Run '{run_name}' does not exist in {hdf5_file}")
+        for k, v in attrs.items():
+            f[run_name].attrs[k] = v
+
+def iter_row_slices(n_rows: int, chunk_rows: int):
+    """
+    Yield consecutive row slices covering ``n_rows`` rows, ``chunk_rows`` at a time.
+
+    Args:
+        n_rows (int): Number of rows (first dimension of the dataset).
+        chunk_rows (int): Maximum number of rows per slice.
+    """
+    for start in range(0, n_rows, chunk_rows):
+        yield slice(start, min(start + chunk_rows, n_rows))
+
+def dataset_layout(ds) -> dict:
+    """
+    Return the storage options of a dataset (chunking, compression, filters,
+    maxshape) as keyword arguments for ``create_dataset``, so derived files keep
+    the layout of their source.
+
+    Args:
+        ds (h5py.Dataset): Source dataset.
+
+    Returns:
+        dict: Keyword arguments for ``h5py.Group.create_dataset``.
+    """
+    layout = {"maxshape": ds.maxshape}
+    if ds.chunks is not None:
+        layout["chunks"] = ds.chunks
+    if ds.compression is not None:
+        layout["compression"] = ds.compression
+        layout["compression_opts"] = ds.compression_opts
+    if ds.shuffle:
+        layout["shuffle"] = True
+    if ds.fletcher32:
+        layout["fletcher32"] = True
+    return layout
+
+def run_content_hash(run_group, chunk_rows: int = 1_000_000) -> str:
+    """
+    Compute a SHA-256 hash of a run's content (attributes, dataset names, dtypes,
+    shapes and data), reading the data in chunks. The hash does not depend on the
+    run name, the file, or the storage layout, so it identifies duplicate runs
+    across files.
+
+    Args:
+        run_group (h5py.Group): Run group.
+        chunk_rows (int): Maximum number of rows read at once.
+
+    Returns:
+        str: Hex digest.
+    """
+    h = hashlib.sha256()
+    for k in sorted(run_group.attrs):
+        if k != "content_hash":
+            h.update(f"attr:{k}={run_group.attrs[k]!r};".encode("utf-8"))
+
+    names = []
+    run_group.visititems(lambda name, obj: names.append(name) if isinstance(obj, h5py.Dataset) else None)
+    for name in sorted(names):
+        ds = run_group[name]
+        h.update(f"ds:{name}:{ds.dtype.str}:{ds.shape};".encode("utf-8"))
+        if ds.ndim == 0:
+            h.update(np.asarray(ds[()]).tobytes())
+            continue
+        is_string = h5py.check_string_dtype(ds.dtype) is not None
+        for rows in iter_row_slices(ds.shape[0], chunk_rows):
+            if is_string:
+                h.update("\0".join(ds.asstr()[rows]).encode("utf-8"))
             else:
-                ds.resize((ds.shape[0] + 1,))
-                ds[-1] = value
+                h.update(np.ascontiguousarray(ds[rows]).tobytes())
+    return h.hexdigest()
 
 def get_timestamp():
     """
@@ -0,0 +1,149 @@
+"""
+Columnar feature store for the data analysis scripts.
+
+One Parquet file per run (``<root>/<run_name>.parquet``) with typed columns:
+floats stay floats, time_string stays a string, and columns are read lazily,
+so an analysis only reads the columns it uses. Derived features are added to a
+run as new columns with ``update()``.
+
+Column names follow the HDF5 exporters (dataset/all_data/h5_files/h5_export.py):
+"timestamp_ms", "time_string", "bms/voltage", "bms/cell_voltages_0", ...
+
+Usage:
+    from dataset.feature_store import FeatureStore
+    store = FeatureStore()
+    store.ingest_h5("dataset/all_data/h5_files/hoverboard_bms_dataset_combined2.h5")
+    df = store.read("file2_run_004_80pct_speed_15kg_load_discharge",
+                    columns=["timestamp_ms", "bms/voltage", "bms/current"])
+"""
+import fnmatch
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataset.all_data.h5_files.h5_export import export_h5
+
+DEFAULT_ROOT = "dataset/feature_store"
+
+
+class FeatureStore:
+    def __init__(self, root=DEFAULT_ROOT):
+        """
+        Args:
+            root (str): Directory holding one Parquet file per run (created if missing).
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, run_name):
+        return os.path.join(self.root, f"{run_name}.parquet")
+
+    def runs(self, pattern="*"):
+        """
+        List stored runs.
+
+        Args:
+            pattern (str): Shell-style pattern on the run name, e.g. "*80pct_speed_25kg*".
+
+        Returns:
+            list[str]: Sorted run names.
+        """
+        names = [f[:-len(".parquet")] for f in os.listdir(self.root) if f.endswith(".parquet")]
+        return sorted(n for n in names if fnmatch.fnmatchcase(n, pattern))
+
+    def __contains__(self, run_name):
+        return os.path.exists(self.path(run_name))
+
+    def columns(self, run_name):
+        """Column names of a run, from the Parquet schema (no data read)."""
+        return pq.read_schema(self.path(run_name)).names
+
+    def read(self, run_name, columns=None):
+        """
+        Read a run.
+
+        Args:
+            run_name (str): Run name.
+            columns (list[str] | None): Only read these columns (default: all).
+
+        Returns:
+            pd.DataFrame: Run data.
+        """
+        if run_name not in self:
+            raise KeyError(f"Run '{run_name}' is not in the feature store {self.root}")
+        return pq.read_table(self.path(run_name), columns=columns).to_pandas()
+
+    def write(self, run_name, df):
+        """Store ``df`` as run ``run_name``, replacing it if it exists."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = self.path(run_name) + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, self.path(run_name))  # readers never see a partial file
+
+    def update(self, run_name, features):
+        """
+        Add or replace columns of a stored run.
+
+        Args:
+            run_name (str): Run name.
+            features (pd.DataFrame | dict): New columns, one value per row of the run.
+        """
+        features = pd.DataFrame(features)
+        table = pq.read_table(self.path(run_name))
+        if len(features) != table.num_rows:
+            raise ValueError(f"Run '{run_name}' has {table.num_rows} rows, features have {len(features)}")
+        for name in features.columns:
+            column = pa.array(features[name].to_numpy())
+            if name in table.column_names:
+                table = table.set_column(table.column_names.index(name), name, column)
+            else:
+                table = table.append_column(name, column)
+        tmp_path = self.path(run_name) + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, self.path(run_name))
+
+    def ingest_h5(self, h5_path, runs=None, workers=None):
+        """
+        Add runs of an HDF5 file to the store (streamed in chunks, in parallel).
+
+        Args:
+            h5_path (str): HDF5 file path.
+            runs (list[str] | None): Run names, None = all runs.
+            workers (int | None): Worker processes.
+        """
+        return export_h5(h5_path, self.root, fmt="parquet", runs=runs, workers=workers)
+
+    def ingest_excel(self, excel_path, run_name=None):
+        """
+        Add a run exported to Excel by the old tools, restoring the dtypes Excel lost
+        (e.g. time_string written as "b'10:50:33.28017'").
+
+        Args:
+            excel_path (str): .xlsx file path.
+            run_name (str | None): Run name (default: file name without extension).
+        """
+        df = pd.read_excel(excel_path)
+        if "time_string" in df.columns:
+            df["time_string"] = df["time_string"].astype(str).str.replace(r"^b'(.*)'$", r"\1", regex=True)
+        run_name = run_name or os.path.splitext(os.path.basename(excel_path))[0]
+        self.write(run_name, df)
+        return run_name
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fill the feature store from HDF5 or Excel files.")
+    parser.add_argument("inputs", nargs="+", help="HDF5 (.h5) or Excel (.xlsx) files")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Feature store directory (default: {DEFAULT_ROOT})")
+    parser.add_argument("--runs", nargs="+", default=None, help="Runs to ingest from HDF5 files (default: all)")
+    args = parser.parse_args()
+
+    store = FeatureStore(args.root)
+    for path in args.inputs:
+        if path.endswith((".xlsx", ".xls")):
+            print(f"Ingested {store.ingest_excel(path)} from {path}")
+        else:
+            store.ingest_h5(path, runs=args.runs)
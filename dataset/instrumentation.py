@@ -0,0 +1,187 @@
+"""
+Lightweight per-stage latency instrumentation for the acquisition pipeline.
+
+Stages are timed with named spans:
+
+    from dataset.instrumentation import span
+    with span("hdf5.append_rows"):
+        ...
+
+Durations are aggregated per span into log-binned histograms (8 bins per
+decade from 1 us to 100 s), so memory per span is fixed however long the run
+lasts. ``profiler.drain()`` returns the statistics of the window since the
+last drain and starts a new one (rolling histograms) and ``totals()`` covers
+all drained windows. The run orchestrator writes each window to
+``<run>/diagnostics/latency/<span>/`` via ``write_latency_diagnostics``.
+
+Instrumentation is off by default: ``span()`` then returns one shared no-op
+context manager, so an instrumented stage costs a global lookup and an
+attribute check.
+"""
+import math
+import threading
+import time
+from contextlib import nullcontext
+
+import h5py
+import numpy as np
+
+BINS_PER_DECADE = 8
+MIN_EXP = -6    # 1 us
+MAX_EXP = 2     # 100 s
+N_BINS = (MAX_EXP - MIN_EXP) * BINS_PER_DECADE + 2  # + underflow / overflow bins
+
+# Upper edge of each bin in seconds (overflow bin -> inf)
+BIN_EDGES_S = np.append(
+    10.0 ** (MIN_EXP + np.arange(1, N_BINS) / BINS_PER_DECADE),
+    np.inf
+)
+
+STAT_FIELDS = ("count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+_NULL_SPAN = nullcontext()
+
+
+class LatencyHistogram:
+    """Fixed-size log-binned histogram of durations in seconds."""
+
+    def __init__(self):
+        self.counts = np.zeros(N_BINS, dtype=np.int64)
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, seconds: float):
+        if seconds > 0:
+            idx = int(math.floor((math.log10(seconds) - MIN_EXP) * BINS_PER_DECADE)) + 1
+            idx = min(max(idx, 0), N_BINS - 1)
+        else:
+            idx = 0
+        self.counts[idx] += 1
+        self.total_s += seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts += other.counts
+        self.total_s += other.total_s
+        self.max_s = max(self.max_s, other.max_s)
+
+    def quantile(self, q: float) -> float:
+        """Upper bin edge of quantile q (within one bin, i.e. ~33% relative resolution)."""
+        n = int(self.counts.sum())
+        if n == 0:
+            return float("nan")
+        idx = int(np.searchsorted(np.cumsum(self.counts), math.ceil(q * n)))
+        return min(float(BIN_EDGES_S[idx]), self.max_s)
+
+    def stats(self) -> dict:
+        n = int(self.counts.sum())
+        return {
+            "count": n,
+            "total_ms": self.total_s * 1000.0,
+            "mean_ms": self.total_s / n * 1000.0 if n else float("nan"),
+            "p50_ms": self.quantile(0.50) * 1000.0,
+            "p95_ms": self.quantile(0.95) * 1000.0,
+            "p99_ms": self.quantile(0.99) * 1000.0,
+            "max_ms": self.max_s * 1000.0,
+        }
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._window = {}   # span name -> LatencyHistogram since the last drain
+        self._totals = {}   # span name -> LatencyHistogram of all drained windows
+
+    def span(self, name: str):
+        """Context manager timing the enclosed block under ``name``."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        """Add one duration (seconds) to span ``name``."""
+        with self._lock:
+            hist = self._window.get(name)
+            if hist is None:
+                hist = self._window[name] = LatencyHistogram()
+            hist.add(seconds)
+
+    def drain(self) -> dict:
+        """
+        Return the statistics of the current window and start a new one.
+
+        Returns:
+            dict: span name -> dict of STAT_FIELDS
+        """
+        with self._lock:
+            window, self._window = self._window, {}
+            for name, hist in window.items():
+                self._totals.setdefault(name, LatencyHistogram()).merge(hist)
+        return {name: hist.stats() for name, hist in window.items()}
+
+    def totals(self) -> dict:
+        """Statistics over all windows drained so far (same format as ``drain()``)."""
+        with self._lock:
+            return {name: hist.stats() for name, hist in self._totals.items()}
+
+    def report(self, stats: dict):
+        """Print a table of drained statistics."""
+        print(f"{'span':<28}{'count':>8}{'mean ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, s in sorted(stats.items()):
+            print(f"{name:<28}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p95_ms']:>10.3f}"
+                  f"{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+
+
+# Process-wide profiler used by the drivers, dataset_utils and the run orchestrator
+profiler = Profiler()
+
+
+def span(name: str):
+    """Shortcut for ``profiler.span(name)``."""
+    return profiler.span(name)
+
+
+def write_latency_diagnostics(hdf5_file: str, run_name: str, stats: dict, elapsed_s: float):
+    """
+    Append one window of span statistics to ``<run>/diagnostics/latency/<span>/``.
+
+    Each span group holds resizable datasets ``elapsed_s`` (end of the window,
+    seconds since the start of the run) and one per STAT_FIELDS entry.
+
+    Args:
+        hdf5_file (str): Path to HDF5 file
+        run_name (str): Run name, e.g., 'run_001'
+        stats (dict): Output of ``Profiler.drain()``
+        elapsed_s (float): Seconds since the start of the run
+    """
+    if not stats:
+        return
+    with h5py.File(hdf5_file, "a") as f:
+        g_lat = f[run_name].require_group("diagnostics/latency")
+        for name, s in stats.items():
+            g_span = g_lat.require_group(name)
+            for field, value in (("elapsed_s", elapsed_s),) + tuple((k, s[k]) for k in STAT_FIELDS):
+                if field not in g_span:
+                    dtype = np.int64 if field == "count" else np.float64
+                    g_span.create_dataset(field, shape=(0,), maxshape=(None,), dtype=dtype)
+                ds = g_span[field]
+                ds.resize((ds.shape[0] + 1,))
+                ds[-1] = value
@@ -0,0 +1,265 @@
+"""
+Headless live monitor: serves a HistoryStore over a small local web dashboard.
+
+Endpoints:
+    /               HTML dashboard (no external scripts, works on an offline LAN)
+    /api/snapshot   whole multi-resolution history as JSON
+    /api/stream     Server-Sent Events stream of incremental (delta) updates,
+                    ?since=<seq> continues from a previous snapshot
+
+Only the Python standard library is used. Server-Sent Events are used for the
+incremental updates instead of WebSockets because they need no extra
+dependency and the data only flows server -> browser.
+
+The server runs on its own daemon threads. Each update is JSON-encoded once and
+shared by all viewers that are up to date, the history lock is only held while
+copying points, and the number of viewers is capped, so connecting viewers does
+not slow down the acquisition thread.
+"""
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from dataset.instrumentation import span
+
+
+class DashboardServer:
+    def __init__(self, history, host="0.0.0.0", port=8050, status=None,
+                 title="BMS & Hoverboard Live Monitor", push_interval=1.0, max_clients=8):
+        """
+        Args:
+            history (HistoryStore): Live history to serve (see dataset/live_history.py).
+            host (str): Interface to bind, "0.0.0.0" to accept viewers on the LAN.
+            port (int): TCP port.
+            status (callable | None): Returns a JSON-serializable dict of extra
+                                      live values (e.g. run name, stop SOC).
+            title (str): Page title.
+            push_interval (float): Seconds between updates pushed to each viewer.
+            max_clients (int): Maximum number of simultaneous stream viewers.
+        """
+        self.history = history
+        self.host = host
+        self.port = port
+        self.status = status
+        self.title = title
+        self.push_interval = push_interval
+
+        self._clients = threading.BoundedSemaphore(max_clients)
+        self._stop = threading.Event()
+        self._cache_lock = threading.Lock()
+        self._cache_seq = None
+        self._cache = {}
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._stop.clear()
+        self._server = ThreadingHTTPServer((self.host, self.port), _DashboardHandler)
+        self._server.daemon_threads = True
+        self._server.dashboard = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Live dashboard available on http://{self.host}:{self.port}/")
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    # ---- payloads (encoded once per new sample, shared between viewers) ----
+
+    def snapshot_payload(self):
+        seq, snap = self.history.versioned_snapshot()
+        return self._cached(seq, "snapshot", lambda: {
+            "seq": seq,
+            "points": _jsonable(snap),
+            "status": self._status(),
+        })
+
+    def delta_payload(self, since):
+        seq, points, complete = self.history.delta(since)
+        return seq, self._cached(seq, ("delta", since), lambda: {
+            "seq": seq,
+            "complete": complete,
+            "points": _jsonable(points),
+            "status": self._status(),
+        })
+
+    def _cached(self, seq, key, build):
+        with self._cache_lock:
+            if seq != self._cache_seq:
+                self._cache_seq = seq
+                self._cache = {}
+            payload = self._cache.get(key)
+        if payload is None:
+            with span("dashboard.encode"):
+                payload = json.dumps(build()).encode("utf-8")
+            with self._cache_lock:
+                if seq == self._cache_seq:
+                    self._cache[key] = payload
+        return payload
+
+    def _status(self):
+        return self.status() if self.status is not None else {}
+
+
+class _DashboardHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        dash = self.server.dashboard
+        url = urlparse(self.path)
+        if url.path == "/":
+            body = _PAGE.replace("__TITLE__", dash.title).encode("utf-8")
+            self._send(200, "text/html; charset=utf-8", body)
+        elif url.path == "/api/snapshot":
+            self._send(200, "application/json", dash.snapshot_payload())
+        elif url.path == "/api/stream":
+            try:
+                since = int(parse_qs(url.query).get("since", ["0"])[0])
+            except ValueError:
+                self._send(400, "text/plain", b"Bad 'since' parameter")
+                return
+            if not dash._clients.acquire(blocking=False):
+                self._send(503, "text/plain", b"Too many viewers")
+                return
+            try:
+                self._stream(dash, since)
+            finally:
+                dash._clients.release()
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, dash, since):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while not dash._stop.is_set():
+                seq, payload = dash.delta_payload(since)
+                if seq != since:
+                    self.wfile.write(b"data: " + payload + b"\n\n")
+                    since = seq
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                dash._stop.wait(dash.push_interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # viewer went away
+
+    def log_message(self, format, *args):
+        pass  # keep the acquisition console clean
+
+
+def _jsonable(points):
+    """Convert history arrays to lists, NaN -> None (JSON has no NaN)."""
+    return {
+        name: [None if math.isnan(v) else round(v, 4) for v in arr.tolist()]
+        for name, arr in points.items()
+    }
+
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 12px; background: #fff; }
+#grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 10px; }
+.chart { border: 1px solid #ccc; padding: 4px; }
+.chart h3 { margin: 2px 4px; font-size: 14px; }
+canvas { width: 100%; height: 220px; }
+#status { margin-bottom: 10px; font-size: 13px; color: #333; }
+</style></head>
+<body>
+<h2>__TITLE__</h2>
+<div id="status">Connecting...</div>
+<div id="grid"></div>
+<script>
+const COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#9467bd", "#ff7f0e", "#17becf"];
+let data = null, seq = 0, source = null;
+const charts = {};
+
+function layout(points) {
+  const grid = document.getElementById("grid");
+  grid.innerHTML = "";
+  for (const name of Object.keys(points)) {
+    if (name === "t" || name === "count" || name === "pred_soc") continue;
+    const lines = (name === "soc" && "pred_soc" in points) ? ["soc", "pred_soc"] : [name];
+    const div = document.createElement("div");
+    div.className = "chart";
+    div.innerHTML = "<h3>" + lines.join(" / ") + "</h3>";
+    const canvas = document.createElement("canvas");
+    div.appendChild(canvas);
+    grid.appendChild(div);
+    charts[name] = {canvas: canvas, lines: lines};
+  }
+}
+
+function draw() {
+  for (const chart of Object.values(charts)) {
+    const c = chart.canvas, ctx = c.getContext("2d");
+    c.width = c.clientWidth; c.height = c.clientHeight;
+    ctx.clearRect(0, 0, c.width, c.height);
+    const t = data.t;
+    if (t.length < 2) continue;
+    let lo = Infinity, hi = -Infinity;
+    for (const line of chart.lines)
+      for (const v of data[line]) if (v !== null) { lo = Math.min(lo, v); hi = Math.max(hi, v); }
+    if (hi === lo) { hi += 1; lo -= 1; }
+    const t0 = t[0], t1 = t[t.length - 1], pad = 30;
+    const x = v => pad + (v - t0) / (t1 - t0) * (c.width - pad - 4);
+    const y = v => 4 + (hi - v) / (hi - lo) * (c.height - 20);
+    ctx.fillStyle = "#555"; ctx.font = "10px sans-serif";
+    ctx.fillText(hi.toFixed(2), 0, 12); ctx.fillText(lo.toFixed(2), 0, c.height - 16);
+    ctx.fillText(((t1 - t0) / 60).toFixed(1) + " min", c.width - 50, c.height - 2);
+    chart.lines.forEach((line, i) => {
+      ctx.strokeStyle = COLORS[i % COLORS.length]; ctx.lineWidth = 1.5; ctx.beginPath();
+      let pen = false;
+      data[line].forEach((v, k) => {
+        if (v === null) { pen = false; return; }
+        if (pen) ctx.lineTo(x(t[k]), y(v)); else { ctx.moveTo(x(t[k]), y(v)); pen = true; }
+      });
+      ctx.stroke();
+    });
+  }
+}
+
+function showStatus(status) {
+  const parts = Object.entries(status || {}).map(([k, v]) => k + ": " + v);
+  parts.push("samples: " + seq);
+  document.getElementById("status").textContent = parts.join("  |  ");
+}
+
+async function loadSnapshot() {
+  const snap = await (await fetch("/api/snapshot")).json();
+  data = snap.points; seq = snap.seq;
+  if (Object.keys(charts).length === 0) layout(data);
+  showStatus(snap.status); draw();
+  if (source) source.close();
+  source = new EventSource("/api/stream?since=" + seq);
+  source.onmessage = ev => {
+    const delta = JSON.parse(ev.data);
+    if (!delta.complete) { loadSnapshot(); return; }
+    for (const name of Object.keys(delta.points)) data[name].push(...delta.points[name]);
+    seq = delta.seq; showStatus(delta.status); draw();
+  };
+}
+
+loadSnapshot();
+// Re-sync periodically: older tiers are merged server-side, this keeps the page bounded too
+setInterval(loadSnapshot, 60000);
+</script>
+</body></html>
+"""
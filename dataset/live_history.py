@@ -0,0 +1,143 @@
+"""
+Multi-resolution history store for the live monitors.
+
+Recent samples are kept at full rate; once the full-rate tier is full, the
+oldest samples are merged ``factor`` at a time into the next (coarser) tier,
+and so on. Memory is bounded by ``n_tiers * points_per_tier`` points no matter
+how long the run lasts, while the plots can still show the whole run.
+
+With the defaults (600 points, factor 10, 4 tiers) at 1 Hz the store covers:
+    tier 0:  last 10 min   @ 1 s
+    tier 1:  next 100 min  @ 10 s
+    tier 2:  next ~17 h    @ 100 s
+    tier 3:  next ~7 days  @ 1000 s
+"""
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+
+class HistoryStore:
+    def __init__(self, channels, points_per_tier=600, factor=10, n_tiers=4):
+        """
+        Args:
+            channels (list[str]): Names of the signals to store, e.g. ["soc", "voltage"].
+            points_per_tier (int): Number of points kept in each tier.
+            factor (int): Number of points of a tier merged into one point of the next tier.
+            n_tiers (int): Number of tiers (1 = plain rolling window).
+        """
+        if factor < 2:
+            raise ValueError("factor must be >= 2")
+        if n_tiers < 1:
+            raise ValueError("n_tiers must be >= 1")
+
+        self.channels = list(channels)
+        self.points_per_tier = points_per_tier
+        self.factor = factor
+        self.n_tiers = n_tiers
+        self.total_samples = 0
+
+        self._lock = Lock()
+        # Each point is a tuple (t, count, value_0, value_1, ...)
+        self._tiers = [deque(maxlen=points_per_tier) for _ in range(n_tiers)]
+        # Points evicted from tier i waiting to be merged into tier i + 1
+        self._pending = [[] for _ in range(n_tiers - 1)]
+
+    def append(self, t, **values):
+        """
+        Append one full-rate sample.
+
+        Args:
+            t (float): Sample time (e.g. seconds since the start of the run).
+            **values: Channel values; missing channels are stored as NaN.
+        """
+        point = (float(t), 1) + tuple(float(values.get(name, np.nan)) for name in self.channels)
+        with self._lock:
+            self._push(0, point)
+            self.total_samples += 1
+
+    def snapshot(self):
+        """
+        Return the whole retained history in chronological order.
+
+        Returns:
+            dict: "t" and "count" arrays plus one array per channel. "count" is
+                  the number of raw samples merged into each point.
+        """
+        return self.versioned_snapshot()[1]
+
+    def versioned_snapshot(self):
+        """
+        Same as ``snapshot()`` but also returns the sample count it corresponds
+        to, so a client can continue with ``delta(seq)`` without gaps.
+
+        Returns:
+            tuple: (seq, snapshot dict)
+        """
+        with self._lock:
+            seq = self.total_samples
+            points = list(self._tiers[-1])
+            for level in range(self.n_tiers - 2, -1, -1):
+                points.extend(self._pending[level])
+                points.extend(self._tiers[level])
+        return seq, self._to_dict(points)
+
+    def delta(self, since):
+        """
+        Return the full-rate samples appended after sample number ``since``.
+
+        Args:
+            since (int): Value of ``total_samples`` the caller has already seen.
+
+        Returns:
+            tuple: (seq, points, complete) where ``seq`` is the current sample
+                   count, ``points`` a dict like ``snapshot()`` and ``complete``
+                   is False when some of the requested samples already left the
+                   full-rate tier (the caller should take a new snapshot).
+        """
+        with self._lock:
+            seq = self.total_samples
+            n_new = max(seq - since, 0)
+            tier = self._tiers[0]
+            complete = n_new <= len(tier)
+            points = list(tier)[len(tier) - min(n_new, len(tier)):]
+        return seq, self._to_dict(points), complete
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(tier) for tier in self._tiers) + sum(len(p) for p in self._pending)
+
+    def _to_dict(self, points):
+        if points:
+            arr = np.asarray(points, dtype=np.float64)
+        else:
+            arr = np.empty((0, 2 + len(self.channels)), dtype=np.float64)
+        out = {"t": arr[:, 0], "count": arr[:, 1]}
+        for i, name in enumerate(self.channels):
+            out[name] = arr[:, 2 + i]
+        return out
+
+    # ---- internals (called with the lock held) ----
+
+    def _push(self, level, point):
+        tier = self._tiers[level]
+        if len(tier) == tier.maxlen and level + 1 < self.n_tiers:
+            self._demote(level, tier[0])
+        tier.append(point)
+
+    def _demote(self, level, point):
+        pending = self._pending[level]
+        pending.append(point)
+        if len(pending) == self.factor:
+            self._push(level + 1, self._merge(pending))
+            pending.clear()
+
+    @staticmethod
+    def _merge(points):
+        """Merge points into one, weighting each by its sample count."""
+        arr = np.asarray(points, dtype=np.float64)
+        counts = arr[:, 1]
+        total = counts.sum()
+        merged = counts @ np.delete(arr, 1, axis=1) / total  # weighted mean of t and channels
+        return (float(merged[0]), int(total)) + tuple(float(v) for v in merged[1:])
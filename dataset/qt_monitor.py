@@ -0,0 +1,122 @@
+"""
+PySide6 / pyqtgraph real-time monitor window for the live run scripts.
+
+Only imported when a run is started with a GUI; headless runs use
+dataset/live_dashboard.py instead.
+"""
+import sys
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+import pyqtgraph as pg
+
+from dataset.instrumentation import span
+
+
+def run_qt_monitor(history, stop_soc=None, on_quit=None, refresh_ms=200,
+                   title="BMS & Hoverboard Real-Time Monitor", status=None):
+    """
+    Open the monitor window and run the Qt event loop until it is closed.
+
+    Args:
+        history (HistoryStore): Live history to plot (see dataset/live_history.py).
+        stop_soc (float | None): Draws a dashed line at the stop SOC if given.
+        on_quit (callable | None): Called when the application is about to quit.
+        refresh_ms (int): Plot refresh period in milliseconds.
+        title (str): Window title.
+        status (callable | None): Returns a dict of values shown in the SOC plot title
+                                  (e.g. running prediction metrics).
+
+    Returns:
+        int: Qt application exit code.
+    """
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    pg.setConfigOption("background", "w")
+    pg.setConfigOption("foreground", "k")
+
+    win = pg.GraphicsLayoutWidget(title=title)
+    win.resize(1400, 700)
+
+    # ----- Row 1 -----
+    soc_plot = win.addPlot(title="SOC (%) vs Time")
+    soc_plot.setLabel("left", "SOC", units="%")
+    soc_plot.showGrid(x=True, y=True)
+    soc_plot.addLegend()
+    soc_curve = soc_plot.plot(pen=pg.mkPen("b", width=2), name="Actual SOC")
+    pred_soc_curve = None
+    if "pred_soc" in history.channels:
+        pred_soc_curve = soc_plot.plot(
+            pen=pg.mkPen("r", width=2, style=pg.QtCore.Qt.DashLine),
+            name="Predicted SOC"
+        )
+    if stop_soc is not None:
+        soc_plot.addLine(y=stop_soc, pen=pg.mkPen("r", style=pg.QtCore.Qt.DashLine))
+
+    volt_plot = win.addPlot(title="Voltage vs Time")
+    volt_plot.setLabel("left", "Voltage", units="V")
+    volt_plot.showGrid(x=True, y=True)
+    volt_curve = volt_plot.plot(pen=pg.mkPen("g", width=2))
+
+    curr_plot = win.addPlot(title="Current (A) vs Time")
+    curr_plot.setLabel("left", "Current", units="A")
+    curr_plot.showGrid(x=True, y=True)
+    curr_curve = curr_plot.plot(pen=pg.mkPen("m", width=2))
+
+    speed_plot = win.addPlot(title="Speed (vs Time)")
+    speed_plot.setLabel("left", "Speed")
+    speed_plot.setLabel("bottom", "Time", units="s")
+    speed_plot.showGrid(x=True, y=True)
+    speed_curve = speed_plot.plot(pen=pg.mkPen("k", width=2))
+
+    # ----- Next row -----
+    win.nextRow()
+
+    bms_temp1_plot = win.addPlot(title="BMS Temp 1")
+    bms_temp1_plot.setLabel("left", "BMS Temp 1 °C")
+    bms_temp1_plot.showGrid(x=True, y=True)
+    bms_temp1_curve = bms_temp1_plot.plot(pen=pg.mkPen("r", width=2))
+
+    bms_temp2_plot = win.addPlot(title="BMS Temp 2")
+    bms_temp2_plot.setLabel("left", "BMS Temp 2 °C")
+    bms_temp2_plot.showGrid(x=True, y=True)
+    bms_temp2_curve = bms_temp2_plot.plot(pen=pg.mkPen("g", width=2))
+
+    bms_temp3_plot = win.addPlot(title="BMS Temp 3")
+    bms_temp3_plot.setLabel("left", "BMS Temp 3 °C")
+    bms_temp3_plot.showGrid(x=True, y=True)
+    bms_temp3_curve = bms_temp3_plot.plot(pen=pg.mkPen("b", width=2))
+
+    hb_board_temp_plot = win.addPlot(title="HB Board Temp")
+    hb_board_temp_plot.setLabel("left", "HB Board Temp °C")
+    hb_board_temp_plot.showGrid(x=True, y=True)
+    hb_board_temp_curve = hb_board_temp_plot.plot(pen=pg.mkPen("k", width=2))
+
+    win.show()
+
+    def update_plot():
+        with span("monitor.plot_update"):
+            snap = history.snapshot()
+            t = snap["t"]
+            soc_curve.setData(t, snap["soc"])
+            if pred_soc_curve is not None:
+                pred_soc_curve.setData(t, snap["pred_soc"])
+            volt_curve.setData(t, snap["voltage"])
+            curr_curve.setData(t, snap["current"])
+            speed_curve.setData(t, snap["speed"])
+            bms_temp1_curve.setData(t, snap["bms_temp1"])
+            bms_temp2_curve.setData(t, snap["bms_temp2"])
+            bms_temp3_curve.setData(t, snap["bms_temp3"])
+            hb_board_temp_curve.setData(t, snap["hb_board_temp"])
+            if status is not None:
+                text = "   ".join(f"{k}: {v}" for k, v in status().items())
+                soc_plot.setTitle(f"SOC (%) vs Time<br><small>{text}</small>")
+
+    plot_timer = QTimer()
+    plot_timer.timeout.connect(update_plot)
+    plot_timer.start(refresh_ms)
+
+    if on_quit is not None:
+        app.aboutToQuit.connect(on_quit)
+
+    return app.exec()
@@ -0,0 +1,305 @@
+"""
+Persistent catalog of the runs in all HDF5 files (SQLite).
+
+Files are scanned once; a file is only re-indexed when its modification time
+or size changes. For each run the catalog stores the metadata attributes,
+sample count, start / end time, duration, SOC range, mean current and run
+type (charge / discharge / idle, from the sign of the mean current).
+
+Usage:
+    from dataset.run_catalog import RunCatalog
+    catalog = RunCatalog("dataset/run_catalog.sqlite")
+    catalog.scan(["dataset/all_data/h5_files"])
+    charge_runs = catalog.run_names(run_type="charge", min_duration_s=600)
+
+    # or, in one call, the matching runs of one file (indexed first if needed)
+    discharge_runs = select_runs("dataset/hoverboard_bms_dataset.h5", run_type="discharge")
+
+or from the command line:
+    python -m dataset.run_catalog scan dataset/all_data/h5_files
+    python -m dataset.run_catalog query --type discharge --name "%80pct%"
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+import h5py
+import numpy as np
+
+from dataset.dataset_utils import iter_row_slices
+
+DEFAULT_CATALOG = "dataset/run_catalog.sqlite"
+
+# Mean current (A) below which a run is classified as idle
+IDLE_CURRENT_A = 0.05
+
+CHUNK_ROWS = 1_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    mtime     REAL NOT NULL,
+    size      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    file          TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    run_name      TEXT NOT NULL,
+    n_samples     INTEGER,
+    start_ms      REAL,
+    end_ms        REAL,
+    duration_s    REAL,
+    soc_start     REAL,
+    soc_end       REAL,
+    soc_min       REAL,
+    soc_max       REAL,
+    mean_current  REAL,
+    run_type      TEXT,
+    date          TEXT,
+    description   TEXT,
+    attrs         TEXT,
+    PRIMARY KEY (file, run_name)
+);
+CREATE INDEX IF NOT EXISTS runs_by_name ON runs(run_name);
+CREATE INDEX IF NOT EXISTS runs_by_type ON runs(run_type);
+"""
+
+_COLUMNS = ("file", "run_name", "n_samples", "start_ms", "end_ms", "duration_s",
+            "soc_start", "soc_end", "soc_min", "soc_max", "mean_current", "run_type",
+            "date", "description", "attrs")
+
+
+def _attr_value(v):
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    if hasattr(v, "tolist"):
+        return v.tolist()
+    return v
+
+
+def index_run(path, run_name, chunk_rows=CHUNK_ROWS):
+    """
+    Compute the catalog record of one run (streams battery_level and current only).
+
+    Args:
+        path (str): HDF5 file path.
+        run_name (str): Run group name.
+        chunk_rows (int): Maximum number of rows read at once.
+
+    Returns:
+        dict: One value per catalog column.
+    """
+    with h5py.File(path, "r") as f:
+        g = f[run_name]
+        attrs = {k: _attr_value(v) for k, v in g.attrs.items()}
+        record = dict.fromkeys(_COLUMNS)
+        record.update(file=path, run_name=run_name, attrs=json.dumps(attrs, default=str),
+                      date=attrs.get("date"), description=attrs.get("description"), n_samples=0)
+
+        if "timestamp_ms" in g and g["timestamp_ms"].shape[0] > 0:
+            ts = g["timestamp_ms"]
+            n = ts.shape[0]
+            record.update(n_samples=n, start_ms=float(ts[0]), end_ms=float(ts[n - 1]))
+            record["duration_s"] = (record["end_ms"] - record["start_ms"]) / 1000.0
+
+        if "bms/battery_level" in g and g["bms/battery_level"].shape[0] > 0:
+            soc = g["bms/battery_level"]
+            n = soc.shape[0]
+            lo, hi = np.inf, -np.inf
+            for rows in iter_row_slices(n, chunk_rows):
+                block = soc[rows]
+                lo, hi = min(lo, float(block.min())), max(hi, float(block.max()))
+            record.update(soc_start=float(soc[0]), soc_end=float(soc[n - 1]), soc_min=lo, soc_max=hi)
+
+        if "bms/current" in g and g["bms/current"].shape[0] > 0:
+            current = g["bms/current"]
+            total = 0.0
+            for rows in iter_row_slices(current.shape[0], chunk_rows):
+                total += float(np.sum(current[rows], dtype=np.float64))
+            mean_current = total / current.shape[0]
+            record["mean_current"] = mean_current
+            # BMS current is negative while discharging
+            if abs(mean_current) < IDLE_CURRENT_A:
+                record["run_type"] = "idle"
+            else:
+                record["run_type"] = "charge" if mean_current > 0 else "discharge"
+    return record
+
+
+class RunCatalog:
+    def __init__(self, db_path=DEFAULT_CATALOG):
+        """
+        Args:
+            db_path (str): SQLite database path (created if missing).
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, paths, force=False):
+        """
+        Index HDF5 files, skipping files unchanged since the last scan.
+
+        Args:
+            paths (list[str]): HDF5 files and/or directories (searched recursively for *.h5 / *.hdf5).
+            force (bool): Re-index every file.
+
+        Returns:
+            int: Number of files (re-)indexed.
+        """
+        files = []
+        for p in paths:
+            if os.path.isdir(p):
+                for root, _, names in os.walk(p):
+                    files += [os.path.join(root, n) for n in sorted(names) if n.endswith((".h5", ".hdf5"))]
+            else:
+                files.append(p)
+
+        indexed = 0
+        for path in files:
+            path = os.path.abspath(path)
+            st = os.stat(path)
+            row = self.conn.execute("SELECT mtime, size FROM files WHERE path = ?", (path,)).fetchone()
+            if not force and row is not None and row["mtime"] == st.st_mtime and row["size"] == st.st_size:
+                continue
+
+            with h5py.File(path, "r") as f:
+                run_names = [name for name in f.keys() if isinstance(f.get(name), h5py.Group)]
+            records = [index_run(path, name) for name in run_names]
+
+            with self.conn:
+                self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                self.conn.execute("INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                                  (path, st.st_mtime, st.st_size))
+                self.conn.executemany(
+                    f"INSERT INTO runs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    [tuple(r[c] for c in _COLUMNS) for r in records]
+                )
+            print(f"Indexed {len(records)} runs from {path}")
+            indexed += 1
+        return indexed
+
+    def query(self, run_type=None, name=None, file=None, min_samples=None, min_duration_s=None,
+              soc_below=None, soc_above=None, date=None):
+        """
+        Select runs.
+
+        Args:
+            run_type (str | None): "charge", "discharge" or "idle".
+            name (str | None): SQL LIKE pattern on the run name, e.g. "%80pct%".
+            file (str | None): Only runs of this HDF5 file.
+            min_samples (int | None): Minimum number of samples.
+            min_duration_s (float | None): Minimum duration in seconds.
+            soc_below (float | None): Runs reaching an SOC at or below this value.
+            soc_above (float | None): Runs reaching an SOC at or above this value.
+            date (str | None): Run date (YYYY-MM-DD) from the run metadata.
+
+        Returns:
+            list[dict]: Catalog records ordered by file and run name; "attrs" is decoded.
+        """
+        conditions, params = [], []
+        for clause, value in (("run_type = ?", run_type), ("run_name LIKE ?", name),
+                              ("file = ?", os.path.abspath(file) if file else None),
+                              ("n_samples >= ?", min_samples), ("duration_s >= ?", min_duration_s),
+                              ("soc_min <= ?", soc_below), ("soc_max >= ?", soc_above),
+                              ("date = ?", date)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        sql = "SELECT * FROM runs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY file, run_name"
+
+        records = []
+        for row in self.conn.execute(sql, params):
+            record = dict(row)
+            record["attrs"] = json.loads(record["attrs"]) if record["attrs"] else {}
+            records.append(record)
+        return records
+
+    def run_names(self, **filters):
+        """Names of the runs matching ``query(**filters)``."""
+        return [r["run_name"] for r in self.query(**filters)]
+
+    def require(self, run_names, file=None):
+        """
+        Check that all ``run_names`` are in the catalog (optionally in ``file``).
+
+        Args:
+            run_names (list[str]): Run names.
+            file (str | None): HDF5 file the runs must belong to.
+
+        Returns:
+            list[dict]: Catalog records, in the order of ``run_names``.
+
+        Raises:
+            KeyError: If any run is missing (all missing names are listed).
+        """
+        known = {r["run_name"]: r for r in self.query(file=file)}
+        missing = [name for name in run_names if name not in known]
+        if missing:
+            raise KeyError(f"Runs not found in catalog{' for ' + file if file else ''}: {missing}")
+        return [known[name] for name in run_names]
+
+
+def select_runs(h5_path, db_path=DEFAULT_CATALOG, **filters):
+    """
+    Names of the runs of one HDF5 file matching the catalog filters.
+
+    The file is (re-)indexed first if it changed since the last scan.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        db_path (str): Catalog path.
+        **filters: Passed to RunCatalog.query() (run_type, name, min_duration_s, ...).
+
+    Returns:
+        list[str]: Run names, in catalog order.
+    """
+    with RunCatalog(db_path) as catalog:
+        catalog.scan([h5_path])
+        return catalog.run_names(file=h5_path, **filters)
+
+
+def print_runs(records):
+    print(f"{'run':<50}{'type':>10}{'samples':>9}{'duration min':>14}{'SOC range':>14}")
+    for r in records:
+        soc = f"{r['soc_min']:.0f}-{r['soc_max']:.0f}%" if r["soc_min"] is not None else "-"
+        duration = f"{r['duration_s'] / 60:.1f}" if r["duration_s"] is not None else "-"
+        print(f"{r['run_name']:<50}{r['run_type'] or '-':>10}{r['n_samples']:>9}{duration:>14}{soc:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the run catalog.")
+    parser.add_argument("--db", default=DEFAULT_CATALOG, help=f"Catalog path (default: {DEFAULT_CATALOG})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_scan = sub.add_parser("scan", help="Index HDF5 files / directories")
+    p_scan.add_argument("paths", nargs="+")
+    p_scan.add_argument("--force", action="store_true", help="Re-index unchanged files too")
+
+    p_query = sub.add_parser("query", help="List runs")
+    p_query.add_argument("--type", dest="run_type", choices=("charge", "discharge", "idle"))
+    p_query.add_argument("--name", help="SQL LIKE pattern on the run name")
+    p_query.add_argument("--file")
+    p_query.add_argument("--min-duration-s", type=float)
+    args = parser.parse_args()
+
+    with RunCatalog(args.db) as catalog:
+        if args.command == "scan":
+            print(f"{catalog.scan(args.paths, force=args.force)} files indexed")
+        else:
+            print_runs(catalog.query(run_type=args.run_type, name=args.name, file=args.file,
+                                     min_duration_s=args.min_duration_s))
@@ -0,0 +1,893 @@
+"""
+Unified run orchestrator for the hoverboard / BMS data acquisition runs.
+
+Every run (charge, discharge, speed profile, prediction, smoke test) is
+described by a declarative config dict merged over DEFAULT_CONFIG, and runs
+through the same pipeline:
+
+    speed    thread  drives the hoverboard (constant speed or speed profile)
+    sampler  thread  reads the latest hoverboard / BMS samples at log_hz on a
+                     drift-free schedule (dataset/scheduler.py), feeds the
+                     live history, hands rows to sinks and the predictor
+    predict  thread  SOC prediction off the sampler thread, fed by a bounded
+                     queue; results are joined back to rows by timestamp
+    sinks    thread  one per sink; "hdf5" writes rows in batches through
+             each    append_rows, "console" prints them
+    monitor          Qt window (main thread), web dashboard (own threads) or none
+
+Usage:
+    from dataset.run_orchestrator import run
+    run({"run_name": "run_020_charge", "run_type": "charge", ...})
+
+or from a JSON file:
+    python -m dataset.run_orchestrator my_run.json
+"""
+import copy
+import json
+import queue
+import signal
+import sys
+import threading
+import time
+
+import numpy as np
+
+from dataset.dataset_utils import (
+    init_run_dynamic, add_run_group, append_rows, set_run_attrs,
+    get_timestamp, get_time_string, get_date_string
+)
+from dataset.live_history import HistoryStore
+from dataset.instrumentation import LatencyHistogram, profiler, span, write_latency_diagnostics
+from dataset.scheduler import FixedRateScheduler
+from soc_estimation.coulomb_counter import CoulombCounter, LIVE_MAX_GAP_S
+from soc_estimation.features import flatten_sample
+from soc_estimation.predictor_pool import PredictorPool
+
+######################################## DEFAULT CONFIG ########################################
+
+DEFAULT_CONFIG = {
+    # ---- run ----
+    "hdf5_file": "dataset/hoverboard_bms_dataset.h5",
+    "run_name": None,
+    "run_metadata": {},
+    "run_type": "discharge",        # "discharge" (hoverboard + BMS) or "charge" (BMS only)
+    # ---- stop conditions ----
+    "stop_soc": None,               # discharge: stop at SOC <= stop_soc, charge: at SOC >= stop_soc
+    "duration_s": None,             # stop after this many seconds
+    # ---- hoverboard load (discharge runs) ----
+    "speed_profile": None,          # None, {"speed": 464} or {"speeds": [...], "hold_time": 5.0}
+    # ---- sampling ----
+    "log_hz": 1,                    # sampler ticks on absolute deadlines, any rate > 0
+    # ---- SOC prediction ----
+    "predictor": None,              # None, {"model": "mlp_soc" or "mlp_soc@2"} (model registry,
+                                    #          see soc_estimation/model_registry.py) or the old
+                                    #          {"weights": path, "scalers": path, "hidden_sizes": [32, 16],
+                                    #          "features": names in soc_estimation/features.py, "name": "mlp"};
+                                    #          or a list of these: the first model drives the run
+                                    #          (console, monitor), the others run in shadow on the
+                                    #          same samples; predictions are stored in the run as
+                                    #          prediction/<name>/soc and .../inference_us
+    "prediction_queue": 32,         # samples waiting for prediction; when full, samples are
+                                    #          logged without prediction (NaN) instead of delaying the sampler
+    # ---- coulomb counting ----
+    "nominal_capacity_Ah": None,    # rated capacity: adds SoH and coulomb-counted SOC
+    # ---- outputs ----
+    "sinks": ["hdf5", "console"],
+    "hdf5_flush_s": 5.0,            # max seconds of rows buffered before writing to HDF5
+    "monitor": None,                # None, "qt" or "web"
+    "dashboard_port": 8050,
+    "history": {"points_per_tier": 600, "factor": 10, "n_tiers": 4},
+    # ---- diagnostics ----
+    "profiling": False,             # time pipeline stages (see dataset/instrumentation.py)
+    "diagnostics_s": 30.0,          # seconds between latency dumps to <run>/diagnostics/latency
+    # ---- hardware ----
+    "hb_com_port": "COM5",
+    "hb_baud_rate": 115200,
+    "bms_name": "EGIKE_STATION_1",
+}
+
+# BMS and hoverboard samples for initialization (dummy values)
+HB_INIT_SAMPLE = {
+    "hb_speedR_meas": 0,
+    "hb_speedL_meas": 0,
+    "hb_measured_voltage": 0.0,
+    "hb_board_temp": 0.0
+}
+
+BMS_INIT_SAMPLE = {
+    "battery_charging": False,
+    "battery_level": 0.0,
+    "voltage": 0.0,
+    "current": 0.0,
+    "cycle_charge": 0,
+    "temp_sensors": 0,
+    "temp_values": [0, 0, 0],
+    "power": 0.0,
+    "cycle_capacity": 0.0,
+    "cycles": 0,
+    "delta_voltage": 0.0,
+    "temperature": 0.0,
+    "cell_count": 0,
+    "cell_voltages": [0.0] * 10
+}
+
+HISTORY_CHANNELS = [
+    "soc", "voltage", "current", "speed",
+    "bms_temp1", "bms_temp2", "bms_temp3", "hb_board_temp"
+]
+
+def load_config(config: dict) -> dict:
+    """
+    Merge a run config over DEFAULT_CONFIG and validate it.
+
+    Args:
+        config (dict): Run config; unspecified keys take their default value.
+
+    Returns:
+        dict: Complete config.
+    """
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise KeyError(f"Unknown config keys: {sorted(unknown)}")
+
+    cfg = copy.deepcopy(DEFAULT_CONFIG)
+    cfg.update(copy.deepcopy(config))
+    cfg["run_metadata"].setdefault("date", get_date_string())
+
+    if not cfg["run_name"]:
+        raise ValueError("Config must define 'run_name'")
+    if cfg["run_type"] not in ("discharge", "charge"):
+        raise ValueError(f"Unknown run_type '{cfg['run_type']}', expected 'discharge' or 'charge'")
+    for sink in cfg["sinks"]:
+        if sink not in SINK_TYPES:
+            raise ValueError(f"Unknown sink '{sink}', expected one of {sorted(SINK_TYPES)}")
+    if cfg["monitor"] not in (None, "qt", "web"):
+        raise ValueError(f"Unknown monitor '{cfg['monitor']}', expected None, 'qt' or 'web'")
+    return cfg
+
+# Model inputs of the predictors trained so far
+DEFAULT_PREDICTOR_FEATURES = ["Voltage [V]", "Current [A]", "Temperature [degC]", "Cycle Charge [Ah]"]
+
+def load_predictor(predictor_cfg: dict):
+    """
+    Load the MLP SOC model described by the 'predictor' config.
+
+    Returns:
+        tuple: (ModelManager, model name, feature names, artifact description)
+    """
+    if "model" in predictor_cfg:
+        from soc_estimation.model_registry import DEFAULT_ROOT, ModelRegistry, parse_ref
+
+        registry = ModelRegistry(predictor_cfg.get("registry", DEFAULT_ROOT))
+        manager = registry.load(predictor_cfg["model"])
+        name = predictor_cfg.get("name", parse_ref(predictor_cfg["model"])[0])
+        return manager, name, manager.features, f"{manager.info['name']}@{manager.info['version']}"
+
+    # Imported here so runs without prediction do not need torch
+    from soc_estimation.mlp.mlp import MLP_SOC, ModelManager
+
+    features = predictor_cfg.get("features", DEFAULT_PREDICTOR_FEATURES)
+    model = MLP_SOC(
+        input_size=predictor_cfg.get("input_size", len(features)),
+        hidden_sizes=predictor_cfg.get("hidden_sizes", [32, 16]),
+        output_size=1
+    )
+    manager = ModelManager(model, device="cpu")
+    manager.load_model_weights(predictor_cfg["weights"])
+    manager.load_scalers(predictor_cfg["scalers"])
+    manager.model.eval()
+    return manager, predictor_cfg.get("name", "mlp"), features, predictor_cfg["weights"]
+
+def run_speed_profile(hb, speed_vector, hold_time=5.0, stop_event=None):
+    """
+    Runs a speed profile using blocking ramp_speed.
+    Each speed is ramped and then held for the remaining time.
+    """
+    for target_speed in speed_vector:
+        if stop_event and stop_event.is_set():
+            break
+        start_time = time.time()
+        # Ramp to the target speed
+        print(f"Ramping to speed {target_speed}...")
+        hb.ramp_speed(target_speed)
+        elapsed_time = time.time() - start_time
+
+        # Hold the speed for the remaining time
+        if stop_event:
+            stop_event.wait(max(0, hold_time - elapsed_time))
+        else:
+            time.sleep(max(0, hold_time - elapsed_time))
+
+######################################## PREDICTION ########################################
+
+class PredictionStage:
+    """
+    Runs the predictor pool on its own thread so model time (first-call warmup,
+    GC pauses) never delays sampling or logging.
+
+    The sampler submits each row without blocking; results are kept by the
+    row's timestamp_ms until the HDF5 sink joins them back to the rows it writes
+    (only while a consumer is attached, see ``keep_results``). A failing model
+    call gives NaN for that row and is counted; it never stops the stage.
+    """
+    _CLOSE = object()
+
+    def __init__(self, pool: PredictorPool, maxsize: int):
+        self.pool = pool
+        self.queue = queue.Queue(maxsize)
+        self.latest = np.nan          # primary model SOC of the most recent prediction
+        self._results = {}            # timestamp_ms -> row["prediction"]
+        self.keep_results = False     # set when a sink joins the results to its rows
+        self._lock = threading.Lock()
+        self._thread = None
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0               # model calls that raised
+        self.expired = 0              # rows written without waiting longer for their prediction
+        self._depth_sum = 0
+        self._depth_max = 0
+        self.lag = LatencyHistogram()  # submit -> result available
+
+    def start(self, warmup_sample: dict, warmup_steps: int = 5):
+        # First calls are slow (allocation, lazy init); pay for them before the run starts
+        for _ in range(warmup_steps):
+            self.pool.step(flatten_sample(warmup_sample))
+        self.pool.reset()
+        self._thread = threading.Thread(target=self._run, name="predict", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: dict):
+        """Queue a row for prediction without blocking; the row is dropped from prediction if the queue is full."""
+        depth = self.queue.qsize()
+        self._depth_sum += depth
+        self._depth_max = max(self._depth_max, depth)
+        self.submitted += 1
+        item = (row["timestamp_ms"], flatten_sample(row), row["bms"].get("battery_level", np.nan),
+                time.perf_counter())
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            self._store(row["timestamp_ms"], self._missing())
+
+    def close(self, timeout: float = 5.0):
+        """Predict the queued rows and stop the thread, giving up after ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while self._thread is not None and self._thread.is_alive() and time.monotonic() < deadline:
+            try:
+                self.queue.put(self._CLOSE, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if self._thread is not None:
+            self._thread.join(max(deadline - time.monotonic(), 0.0))
+            if self._thread.is_alive():
+                print(f"Prediction stage did not stop within {timeout} s, remaining rows get no prediction.")
+
+    def join(self, rows: list, final: bool = False, max_wait_s: float = None):
+        """
+        Attach predictions to rows (oldest first) by timestamp.
+
+        Args:
+            rows (list[dict]): Rows in sampling order.
+            final (bool): Rows without a result get NaN instead of being held back.
+            max_wait_s (float | None): Rows older than this get NaN instead of being held back.
+
+        Returns:
+            tuple: (rows with "prediction" set, rows still waiting for their prediction)
+        """
+        now_ms = get_timestamp()
+        with self._lock:
+            for i, row in enumerate(rows):
+                if "prediction" in row:
+                    continue
+                prediction = self._results.pop(row["timestamp_ms"], None)
+                if prediction is None:
+                    expired = max_wait_s is not None and now_ms - row["timestamp_ms"] > max_wait_s * 1000.0
+                    if not (final or expired):
+                        return rows[:i], rows[i:]
+                    self.expired += 1
+                    prediction = self._missing()
+                row["prediction"] = prediction
+        return rows, []
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: submitted / dropped samples, queue depth mean / max (seen at
+                  submit) and lag from submit to result mean / p95 / max in ms.
+        """
+        lag = self.lag.stats()
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "expired": self.expired,
+            "queue_depth_mean": self._depth_sum / self.submitted if self.submitted else 0.0,
+            "queue_depth_max": self._depth_max,
+            "lag_mean_ms": lag["mean_ms"],
+            "lag_p95_ms": lag["p95_ms"],
+            "lag_max_ms": lag["max_ms"],
+        }
+
+    def _store(self, timestamp_ms, prediction: dict):
+        if self.keep_results:
+            with self._lock:
+                self._results[timestamp_ms] = prediction
+
+    def _missing(self) -> dict:
+        out = {}
+        for name in self.pool.names:
+            out[f"{name}/soc"] = np.nan
+            out[f"{name}/inference_us"] = np.nan
+        return out
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is self._CLOSE:
+                break
+            timestamp_ms, sample, true_soc, submitted = item
+            try:
+                with span("predict"):
+                    predictions = self.pool.step(sample, true_soc=true_soc)
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1 or self.errors % 100 == 0:
+                    print(f"Prediction failed ({self.errors} so far): {e!r}")
+                self._store(timestamp_ms, self._missing())
+                continue
+            prediction = {}
+            for name, (soc, inference_us) in predictions.items():
+                prediction[f"{name}/soc"] = soc
+                prediction[f"{name}/inference_us"] = inference_us
+            self._store(timestamp_ms, prediction)
+            self.latest = predictions[self.pool.primary][0]
+            lag_s = time.perf_counter() - submitted
+            self.lag.add(lag_s)
+            if profiler.enabled:
+                profiler.record("predict.lag", lag_s)
+
+######################################## SINKS ########################################
+
+class _SinkThread:
+    """Base class for a sink consuming rows from its own queue on its own thread."""
+    _CLOSE = object()
+    MAX_CONSECUTIVE_FAILURES = 3
+
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.queue = queue.Queue()
+        self._thread = None
+        self.failures = 0               # rows (or batches) the sink failed to handle
+        self.consecutive_failures = 0
+        # Optional callable(sink, exception), called once MAX_CONSECUTIVE_FAILURES
+        # failures in a row show the sink is not recovering
+        self.on_error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def put(self, row: dict):
+        self.queue.put(row)
+
+    def close(self):
+        """Process the remaining rows and stop the thread."""
+        self.queue.put(self._CLOSE)
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            row = self.queue.get()
+            if row is self._CLOSE:
+                break
+            try:
+                self.handle(row)
+                self.consecutive_failures = 0
+            except Exception as e:
+                self._failed(e)
+
+    def handle(self, row: dict):
+        raise NotImplementedError
+
+    def _failed(self, exc: Exception):
+        """Count and report a failure; the thread keeps running."""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.failures == 1 or self.failures % 100 == 0:
+            print(f"!!! {type(self).__name__} failed ({self.failures} so far): {exc!r}")
+        if self.on_error is not None and self.consecutive_failures == self.MAX_CONSECUTIVE_FAILURES:
+            self.on_error(self, exc)
+
+
+class HDF5Sink(_SinkThread):
+    """
+    Buffers rows and writes them with one append_rows call every hdf5_flush_s seconds.
+    A failed write keeps the rows in the buffer and is retried at the next flush.
+    """
+    ROW_KEYS = ("timestamp_ms", "time_string", "hoverboard", "bms", "prediction")
+
+    def __init__(self, cfg: dict):
+        super().__init__(cfg)
+        # Optional callable returning run attributes (e.g. running metrics), written
+        # with every flush so a crash loses at most hdf5_flush_s seconds of them
+        self.run_attrs = None
+        # Optional PredictionStage whose results are joined to the rows before writing
+        self.predictions = None
+
+    def _run(self):
+        flush_s = self.cfg["hdf5_flush_s"]
+        buffer = []
+        started = last_flush = last_diagnostics = time.monotonic()
+        while True:
+            try:
+                row = self.queue.get(timeout=max(flush_s - (time.monotonic() - last_flush), 0.01))
+            except queue.Empty:
+                row = None
+            if row is self._CLOSE:
+                break
+            if row is not None:
+                buffer.append(row)
+            if buffer and time.monotonic() - last_flush >= flush_s:
+                buffer = self._flush(buffer)
+                last_flush = time.monotonic()
+            if profiler.enabled and time.monotonic() - last_diagnostics >= self.cfg["diagnostics_s"]:
+                self._dump_diagnostics(time.monotonic() - started)
+                last_diagnostics = time.monotonic()
+        for _ in range(self.MAX_CONSECUTIVE_FAILURES):
+            buffer = self._flush(buffer, final=True)
+            if not buffer:
+                break
+            time.sleep(flush_s)
+        if buffer:
+            print(f"!!! {len(buffer)} rows could not be written to {self.cfg['hdf5_file']}")
+        if profiler.enabled:
+            self._dump_diagnostics(time.monotonic() - started)
+
+    def _dump_diagnostics(self, elapsed_s):
+        try:
+            write_latency_diagnostics(self.cfg["hdf5_file"], self.cfg["run_name"],
+                                      profiler.drain(), elapsed_s)
+        except Exception as e:
+            self._failed(e)
+
+    def _flush(self, rows, final=False):
+        """Write the rows whose predictions are available; returns the rows held back or not written."""
+        held = []
+        if self.predictions is not None:
+            # Rows wait at most two flush periods for their prediction
+            rows, held = self.predictions.join(rows, final, max_wait_s=2 * self.cfg["hdf5_flush_s"])
+        if rows:
+            try:
+                append_rows(self.cfg["hdf5_file"], self.cfg["run_name"],
+                            [{key: row[key] for key in self.ROW_KEYS if key in row} for row in rows])
+            except Exception as e:
+                self._failed(e)
+                return rows + held
+            self.consecutive_failures = 0
+            if self.run_attrs is not None:
+                try:
+                    set_run_attrs(self.cfg["hdf5_file"], self.cfg["run_name"], self.run_attrs())
+                except Exception as e:
+                    self._failed(e)
+        return held
+
+
+class ConsoleSink(_SinkThread):
+    """Prints each row, off the sampler thread."""
+
+    def handle(self, row: dict):
+        with span("console.print"):
+            if self.cfg["run_type"] == "discharge":
+                print(row["hoverboard"])
+            print(row["bms"])
+            if "predicted_soc" in row:
+                print(f"Predicted SOC (latest): {row['predicted_soc']:.2f}%")
+
+
+SINK_TYPES = {
+    "hdf5": HDF5Sink,
+    "console": ConsoleSink,
+}
+
+######################################## ORCHESTRATOR ########################################
+
+class RunOrchestrator:
+    def __init__(self, config: dict):
+        self.cfg = load_config(config)
+        self.scheduler = FixedRateScheduler(self.cfg["log_hz"])
+        profiler.enabled = self.cfg["profiling"]
+
+        self.stop_flag = threading.Event()
+        self.last_hb = HB_INIT_SAMPLE
+        self.last_bms = BMS_INIT_SAMPLE
+
+        self.predictors = None
+        if self.cfg["predictor"]:
+            predictor_cfgs = self.cfg["predictor"]
+            if isinstance(predictor_cfgs, dict):
+                predictor_cfgs = [predictor_cfgs]
+            models = [load_predictor(c) for c in predictor_cfgs]
+            self.model_info = {name: {"model": source, "features": list(features)}
+                               for _, name, features, source in models}
+            # Same feature definitions as training, computed incrementally each tick,
+            # all models evaluated together (see soc_estimation/predictor_pool.py)
+            self.predictors = PredictorPool([(name, manager, features)
+                                             for manager, name, features, _ in models])
+            self.prediction = PredictionStage(self.predictors, self.cfg["prediction_queue"])
+        channels = HISTORY_CHANNELS[:1] + (["pred_soc"] if self.predictors else []) + HISTORY_CHANNELS[1:]
+        self.history = HistoryStore(channels, **self.cfg["history"])
+        self.counter = None  # created at the first sample (initial SOC)
+        self.sinks = [SINK_TYPES[name](self.cfg) for name in self.cfg["sinks"]]
+        for sink in self.sinks:
+            if isinstance(sink, HDF5Sink):
+                sink.on_error = self._on_storage_error
+        if self.predictors is not None:
+            for sink in self.sinks:
+                if isinstance(sink, HDF5Sink):
+                    sink.run_attrs = self._metrics_attrs
+                    sink.predictions = self.prediction
+                    self.prediction.keep_results = True
+
+        self.hoverboard = None
+        self.bms_reader = None
+        self.dashboard = None
+        self._threads = []
+        self._start_time = None
+        self._shutdown_done = False
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Create the run, connect the hardware and start all pipeline stages."""
+        # Imported here so offline tools can use this module without the hardware drivers
+        from drivers.bms_reader import BMSReader
+
+        cfg = self.cfg
+        init_run_dynamic(cfg["hdf5_file"], cfg["run_name"], cfg["run_metadata"],
+                         HB_INIT_SAMPLE, BMS_INIT_SAMPLE)
+        if self.predictors is not None:
+            # Predictions are written with the measurements, one value per row and model
+            for name, info in self.model_info.items():
+                add_run_group(cfg["hdf5_file"], cfg["run_name"], f"prediction/{name}",
+                              {"soc": 0.0, "inference_us": 0.0}, attrs=info)
+        print("Starting run:", cfg["run_name"])
+        print("Run Description:", cfg["run_metadata"].get("description", ""))
+
+        if cfg["run_type"] == "discharge":
+            from drivers.hoverboard_controller import HoverboardController
+            self.hoverboard = HoverboardController(
+                serial_port=cfg["hb_com_port"],
+                baud_rate=cfg["hb_baud_rate"],
+                print_feedback=False,
+                span=span
+            )
+            self.hoverboard.start_threads()
+            print(f"Hoverboard started on {cfg['hb_com_port']} at {cfg['hb_baud_rate']} baud.")
+
+        self.bms_reader = BMSReader(device_name=cfg["bms_name"], span=span)
+        self.bms_reader.start()
+        print(f"BMS Reader started for device {cfg['bms_name']}.")
+
+        self._start_speed_control()
+
+        while self.bms_reader.get_latest() is None:
+            print("Waiting for BMS Bluetooth Connection...")
+            time.sleep(1)
+
+        if self.predictors is not None:
+            self.prediction.start({"hoverboard": HB_INIT_SAMPLE, "bms": BMS_INIT_SAMPLE, "timestamp_ms": 0.0})
+        for sink in self.sinks:
+            sink.start()
+        self._start_time = time.time()
+        self._spawn(self._sampler_loop, "sampler")
+        if cfg["stop_soc"] is not None:
+            print("Run will stop when BMS SOC reaches", cfg["stop_soc"], "%")
+
+    def wait(self):
+        """Block until the run stops, running the configured monitor meanwhile."""
+        cfg = self.cfg
+        if cfg["monitor"] == "qt":
+            from dataset.qt_monitor import run_qt_monitor
+            run_qt_monitor(self.history, stop_soc=cfg["stop_soc"], on_quit=self.shutdown,
+                           title=f"BMS & Hoverboard Real-Time Monitor - {cfg['run_name']}",
+                           status=self._prediction_status if self.predictors is not None else None)
+            return
+
+        if cfg["monitor"] == "web":
+            from dataset.live_dashboard import DashboardServer
+            self.dashboard = DashboardServer(
+                self.history, port=cfg["dashboard_port"], title=cfg["run_name"],
+                status=self._dashboard_status
+            )
+            self.dashboard.start()
+
+        while not self.stop_flag.wait(0.5):
+            pass
+
+    def _on_storage_error(self, sink, exc):
+        """A run that cannot be stored is stopped rather than continued unrecorded."""
+        if not self.stop_flag.is_set():
+            print(f"!!! Writing to {self.cfg['hdf5_file']} keeps failing, stopping run: {exc!r}")
+            self.stop_flag.set()
+
+    def shutdown(self):
+        """Stop every stage, bring the hoverboard to rest and flush the sinks. Idempotent."""
+        if self._shutdown_done:
+            return
+        self._shutdown_done = True
+        print("Shutting down...")
+
+        self.stop_flag.set()
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout=5.0)
+        if self.predictors is not None:
+            self.prediction.close()  # before the sinks, so every row gets its prediction
+
+        if self.hoverboard is not None:
+            self.hoverboard.ramp_speed(0)
+            self.hoverboard.close()
+        if self.bms_reader is not None:
+            self.bms_reader.stop()
+        for sink in self.sinks:
+            sink.close()
+            if sink.failures:
+                print(f"!!! {type(sink).__name__}: {sink.failures} failed writes")
+        if self.dashboard is not None:
+            self.dashboard.stop()
+
+        self._report_scheduler_stats()
+        if self.predictors is not None:
+            self._report_prediction_stats()
+        self._report_coulomb_count()
+        if profiler.enabled:
+            profiler.drain()  # windows not dumped by an hdf5 sink
+            print("\n========== Stage Latency ==========")
+            profiler.report(profiler.totals())
+            print("===================================\n")
+        if self.predictors is not None:
+            self._report_prediction_metrics()
+        print(f"Run {self.cfg['run_name']} finished.")
+
+    # ---- stages ----
+
+    def _spawn(self, target, name, *args):
+        t = threading.Thread(target=target, args=args, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+        return t
+
+    def _start_speed_control(self):
+        profile = self.cfg["speed_profile"]
+        if self.hoverboard is None or not profile:
+            return
+        if "speeds" in profile:
+            print("Starting hoverboard speed profile thread...")
+            self._spawn(run_speed_profile, "speed", self.hoverboard, profile["speeds"],
+                        profile.get("hold_time", 5.0), self.stop_flag)
+        else:
+            self.hoverboard.ramp_speed(profile["speed"])
+            print(f"Hoverboard ramped to speed {profile['speed']}.")
+
+    def _sampler_loop(self):
+        # Ticks on absolute deadlines so sampling / sink hand-off time does not add to the period
+        self.scheduler.start()
+        while not self.stop_flag.is_set():
+            with span("sampler.tick"):
+                row = self._sample()
+                if self.predictors is not None:
+                    self.prediction.submit(row)
+                self._count_charge(row)
+                for sink in self.sinks:
+                    sink.put(row)
+                self._update_history(row)
+
+            if self._should_stop(row):
+                self.stop_flag.set()
+                break
+
+            if not self.scheduler.wait(self.stop_flag):
+                break
+
+    def _sample(self) -> dict:
+        timestamp = get_timestamp()
+        time_string = get_time_string()
+
+        if self.hoverboard is not None:
+            hb_feedback = self.hoverboard.get_feedback()
+            if hb_feedback is not None:
+                self.last_hb = hb_feedback
+
+        bms_sample = self.bms_reader.get_latest()
+        if bms_sample is not None:
+            self.last_bms = bms_sample
+
+        row = {
+            "timestamp_ms": timestamp,
+            "time_string": time_string,
+            "hoverboard": self.last_hb,
+            "bms": self.last_bms,
+        }
+        if self.predictors is not None:
+            # Latest available prediction (previous ticks) for console / monitor;
+            # the row's own prediction is joined in by the hdf5 sink
+            row["predicted_soc"] = self.prediction.latest
+        return row
+
+    def _count_charge(self, row: dict):
+        bms = row["bms"]
+        if self.counter is None:
+            self.counter = CoulombCounter(self.cfg["nominal_capacity_Ah"],
+                                          initial_soc_pct=bms.get("battery_level"),
+                                          max_gap_s=max(LIVE_MAX_GAP_S, 2.0 / self.cfg["log_hz"]))
+        self.counter.update(row["timestamp_ms"] / 1000.0, bms.get("current", 0.0), bms.get("voltage", 0.0))
+
+    def _dashboard_status(self) -> dict:
+        status = {"run": self.cfg["run_name"], "stop SOC": self.cfg["stop_soc"]}
+        if self.counter is not None:
+            status["charge out [Ah]"] = round(self.counter.discharge_Ah, 4)
+            status["charge in [Ah]"] = round(self.counter.charge_Ah, 4)
+            status["energy [Wh]"] = round(abs(self.counter.net_Wh), 3)
+            if self.counter.soc_pct is not None:
+                status["coulomb SOC [%]"] = round(self.counter.soc_pct, 2)
+        if self.predictors is not None:
+            status.update(self._prediction_status())
+        return status
+
+    def _prediction_status(self) -> dict:
+        metrics = self.predictors.metrics
+        m = metrics[self.predictors.primary].result()
+        status = {"MAE [%]": round(m["mae"], 3), "RMSE [%]": round(m["rmse"], 3),
+                  "R²": round(m["r2"], 4), "bias [%]": round(m["mean_error"], 3),
+                  "max error [%]": round(m["max_abs_error"], 3)}
+        for name in self.predictors.names[1:]:
+            m = metrics[name].result()
+            status[f"{name} MAE / RMSE [%]"] = f"{m['mae']:.3f} / {m['rmse']:.3f}"
+        stats = self.prediction.stats()
+        status["prediction lag [ms]"] = round(stats["lag_mean_ms"], 2)
+        status["prediction queue"] = self.prediction.queue.qsize()
+        if stats["dropped"]:
+            status["predictions dropped"] = stats["dropped"]
+        if stats["errors"]:
+            status["prediction errors"] = stats["errors"]
+        return status
+
+    def _metrics_attrs(self) -> dict:
+        # soc_metrics_<key> for the primary model, soc_metrics_<name>_<key> for every model
+        metrics = self.predictors.metrics
+        attrs = {f"soc_metrics_{k}": v for k, v in metrics[self.predictors.primary].result().items()}
+        for name, m in metrics.items():
+            attrs.update({f"soc_metrics_{name}_{k}": v for k, v in m.result().items()})
+        return attrs
+
+    def _update_history(self, row: dict):
+        hb, bms = row["hoverboard"], row["bms"]
+        temp_values = bms.get("temp_values", [0, 0, 0])
+        self.history.append(
+            time.time() - self._start_time,
+            soc=bms.get("battery_level", 0.0),
+            pred_soc=row.get("predicted_soc", np.nan),
+            voltage=bms.get("voltage", 0.0),
+            current=bms.get("current", 0.0),
+            speed=(hb.get("hb_speedL_meas", 0) - hb.get("hb_speedR_meas", 0)) / 2,  # average L/R
+            bms_temp1=temp_values[0],
+            bms_temp2=temp_values[1],
+            bms_temp3=temp_values[2],
+            hb_board_temp=hb.get("hb_board_temp", 0)
+        )
+
+    def _should_stop(self, row: dict) -> bool:
+        cfg = self.cfg
+        soc = row["bms"].get("battery_level")
+        if cfg["stop_soc"] is not None and soc is not None:
+            reached = soc <= cfg["stop_soc"] if cfg["run_type"] == "discharge" else soc >= cfg["stop_soc"]
+            if reached:
+                print(f"Reached stop SOC ({cfg['stop_soc']}%), stopping run.")
+                return True
+        if cfg["duration_s"] is not None and time.time() - self._start_time >= cfg["duration_s"]:
+            print(f"Run duration ({cfg['duration_s']} s) reached, stopping run.")
+            return True
+        return False
+
+    # ---- end of run ----
+
+    def _report_scheduler_stats(self):
+        stats = self.scheduler.stats()
+        print("\n========== Sampler Timing ==========")
+        print(f"  Ticks             : {stats['ticks']}")
+        print(f"  Period            : {stats['period_ms']:.1f} ms")
+        print(f"  Jitter mean / max : {stats['jitter_mean_ms']:.2f} / {stats['jitter_max_ms']:.2f} ms")
+        print(f"  Overruns          : {stats['overruns']} ({stats['missed_ticks']} ticks skipped)")
+        print("====================================\n")
+        if "hdf5" in self.cfg["sinks"]:
+            # Sinks are closed at this point, so the file is no longer being written
+            set_run_attrs(self.cfg["hdf5_file"], self.cfg["run_name"],
+                          {f"sampler_{k}": v for k, v in stats.items()})
+
+    def _report_prediction_stats(self):
+        stats = self.prediction.stats()
+        print("\n========== Prediction Stage ==========")
+        print(f"  Samples           : {stats['submitted']} ({stats['dropped']} dropped, queue full)")
+        print(f"  Failed / expired  : {stats['errors']} / {stats['expired']}")
+        print(f"  Queue mean / max  : {stats['queue_depth_mean']:.2f} / {stats['queue_depth_max']}")
+        print(f"  Lag mean/p95/max  : {stats['lag_mean_ms']:.2f} / {stats['lag_p95_ms']:.2f} / "
+              f"{stats['lag_max_ms']:.2f} ms")
+        print("======================================\n")
+        if "hdf5" in self.cfg["sinks"]:
+            set_run_attrs(self.cfg["hdf5_file"], self.cfg["run_name"],
+                          {f"prediction_{k}": v for k, v in stats.items()})
+
+    def _report_coulomb_count(self):
+        if self.counter is None:
+            return
+        result = self.counter.result()
+        print("\n========== Coulomb Counting ==========")
+        print(f"  Duration          : {result['duration_h']:.3f} h")
+        print(f"  Charge out / in   : {result['discharge_Ah']:.4f} / {result['charge_Ah']:.4f} Ah")
+        print(f"  Energy            : {result['capacity_Wh']:.3f} Wh")
+        if result["n_gaps"]:
+            print(f"  Gaps skipped      : {result['n_gaps']} ({result['gap_h'] * 3600:.0f} s)")
+        if "soh_pct" in result:
+            print(f"  SoH               : {result['soh_pct']:.2f} %")
+        print("======================================\n")
+        if "hdf5" in self.cfg["sinks"]:
+            set_run_attrs(self.cfg["hdf5_file"], self.cfg["run_name"],
+                          {f"coulomb_{k}": v for k, v in result.items()})
+
+    def _report_prediction_metrics(self):
+        # Running metrics over every sample (also written to the run attrs by the hdf5 sink)
+        for name, metrics in self.predictors.metrics.items():
+            m = metrics.result()
+            if m["n_samples"] < 2:
+                print(f"Not enough data to compute metrics for {name}.")
+                continue
+
+            role = "" if name == self.predictors.primary else " (shadow)"
+            print(f"\n========== SOC Prediction Metrics: {name}{role} ==========")
+            print(f"  Samples evaluated : {m['n_samples']}")
+            print(f"  R²                : {m['r2']:.4f}")
+            print(f"  MSE               : {m['mse']:.4f}")
+            print(f"  RMSE              : {m['rmse']:.4f}")
+            print(f"  MAE               : {m['mae']:.4f}")
+            print(f"  Bias              : {m['mean_error']:+.4f}")
+            print(f"  Max abs error     : {m['max_abs_error']:.4f}")
+            print("=============================================\n")
+
+######################################## ENTRY POINT ########################################
+
+def run(config: dict):
+    """
+    Run a complete acquisition run described by ``config`` (see DEFAULT_CONFIG).
+
+    Args:
+        config (dict): Run config; unspecified keys take their default value.
+    """
+    orchestrator = RunOrchestrator(config)
+
+    def handle_signal(sig, frame):
+        orchestrator.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    orchestrator.start()
+    try:
+        orchestrator.wait()
+    finally:
+        orchestrator.shutdown()
+    return orchestrator
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a data acquisition run from a JSON config.")
+    parser.add_argument("config", help="Path to a JSON run config (keys of DEFAULT_CONFIG)")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        run(json.load(f))
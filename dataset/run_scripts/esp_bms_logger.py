@@ -13,6 +13,8 @@ Usage:
   python bms_logger.py --port COM5           # Windows
   python bms_logger.py --port /dev/ttyUSB0   # Linux
   python bms_logger.py --port /dev/cu.usbserial-0001 --baud 115200 --out my_log.csv
+  python -m dataset.run_scripts.esp_bms_logger --clean-esp-temp   # adds esp_temp_degC_clean
+  python -m dataset.run_scripts.esp_bms_logger --coulomb          # live coulomb count (Ah / Wh)
 """
 
 import argparse
@@ -36,6 +38,8 @@ DEFAULT_BAUD    = 115200
 DEFAULT_OUT     = "charge_run-002_esp.csv"
 CSV_MARKER      = "CSV"          # lines that start with this are data rows
 RECONNECT_DELAY = 5              # seconds to wait before retrying after disconnect
+ESP_TEMP_MIN_DELTA = 5.0         # °C, online outlier filter (--clean-esp-temp)
+ESP_TEMP_RESOLUTION = 0.1        # °C, MAD lower bound of the online filter
 
 CSV_HEADER = [
     "datetime_utc",
@@ -82,6 +86,22 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_OUT,
         help=f"Output CSV file path (default: {DEFAULT_OUT})",
     )
+    parser.add_argument(
+        "--clean-esp-temp",
+        action="store_true",
+        help="Add an esp_temp_degC_clean column with outliers rejected online",
+    )
+    parser.add_argument(
+        "--nominal-capacity",
+        type=float,
+        default=None,
+        help="Rated capacity in Ah: adds SoH and coulomb-counted SOC to the summary (implies --coulomb)",
+    )
+    parser.add_argument(
+        "--coulomb",
+        action="store_true",
+        help="Coulomb-count the charge live and print it with each row and in the summary",
+    )
     parser.add_argument(
         "--no-print",
         action="store_true",
@@ -90,11 +110,11 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def open_csv(path: str) -> tuple[csv.DictWriter, object]:
+def open_csv(path: str, fieldnames: list[str] = CSV_HEADER) -> tuple[csv.DictWriter, object]:
     """Open (or append to) the CSV file; write header if the file is new."""
     file_exists = Path(path).exists() and Path(path).stat().st_size > 0
     fh = open(path, "a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(fh, fieldnames=CSV_HEADER)
+    writer = csv.DictWriter(fh, fieldnames=fieldnames)
     if not file_exists:
         writer.writeheader()
         fh.flush()
@@ -131,8 +151,19 @@ def parse_csv_line(line: str) -> dict | None:
         return None
 
 
-def run(port: str, baud: int, out: str, silent: bool) -> None:
-    writer, fh = open_csv(out)
+def run(port: str, baud: int, out: str, silent: bool, clean_esp_temp: bool = False,
+        nominal_capacity_Ah: float | None = None, coulomb: bool = False) -> None:
+    counter = None  # created at the first row (initial SOC)
+    coulomb = coulomb or nominal_capacity_Ah is not None
+    if coulomb:
+        from soc_estimation.coulomb_counter import CoulombCounter, LIVE_MAX_GAP_S
+    temp_filter = None
+    fieldnames = CSV_HEADER
+    if clean_esp_temp:
+        from dataset.signal_cleaning import OnlineOutlierFilter
+        temp_filter = OnlineOutlierFilter(min_delta=ESP_TEMP_MIN_DELTA, mad_floor=ESP_TEMP_RESOLUTION)
+        fieldnames = CSV_HEADER + ["esp_temp_degC_clean"]
+    writer, fh = open_csv(out, fieldnames)
     row_count = 0
 
     print(f"[logger] Connecting to {port} @ {baud} baud …")
@@ -156,6 +187,14 @@ def run(port: str, baud: int, out: str, silent: bool) -> None:
                             print(f"[ESP32] {line.rstrip()}")
                         continue
 
+                    if temp_filter is not None:
+                        row["esp_temp_degC_clean"], _ = temp_filter.update(row["esp_temp_degC"])
+                    if coulomb and counter is None:
+                        counter = CoulombCounter(nominal_capacity_Ah, initial_soc_pct=row["bms_soc_pct"],
+                                                 max_gap_s=LIVE_MAX_GAP_S)
+                    if counter is not None:
+                        counter.update(row["esp_timestamp_ms"] / 1000.0, row["current_A"], row["voltage_V"])
+
                     writer.writerow(row)
                     fh.flush()
                     row_count += 1
@@ -172,7 +211,8 @@ def run(port: str, baud: int, out: str, silent: bool) -> None:
                             f"MLP={row['pred_soc_pct']:.2f}%  "
                             f"t={row['inference_us']}µs  "
                             f"T={row['esp_temp_degC']:.1f}°C  "
-                            f"(row #{row_count})"
+                            + (f"Q={counter.net_Ah:+.3f}Ah  " if counter is not None else "")
+                            + f"(row #{row_count})"
                         )
 
         except serial.SerialException as exc:
@@ -186,6 +226,14 @@ def run(port: str, baud: int, out: str, silent: bool) -> None:
 
         except KeyboardInterrupt:
             print(f"\n[logger] Stopped. {row_count} rows written to {out}")
+            if temp_filter is not None:
+                print(f"[logger] {temp_filter.n_outliers} ESP temperature outlier(s) rejected")
+            if counter is not None:
+                result = counter.result()
+                print(f"[logger] Coulomb count: {result['discharge_Ah']:.4f} Ah out, "
+                      f"{result['charge_Ah']:.4f} Ah in, {result['capacity_Wh']:.3f} Wh net"
+                      + (f", SoH {result['soh_pct']:.2f} %" if "soh_pct" in result else "")
+                      + (f", {result['n_gaps']} gap(s) skipped" if result["n_gaps"] else ""))
             fh.close()
             break
 
@@ -200,7 +248,9 @@ def main() -> None:
             sys.exit("[logger] No serial port found. Plug in the ESP32 or use --port.")
         print(f"[logger] Auto-detected port: {port}")
 
-    run(port=port, baud=args.baud, out=args.out, silent=args.no_print)
+    run(port=port, baud=args.baud, out=args.out, silent=args.no_print,
+        clean_esp_temp=args.clean_esp_temp, nominal_capacity_Ah=args.nominal_capacity,
+        coulomb=args.coulomb)
 
 
 if __name__ == "__main__":
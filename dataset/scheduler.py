@@ -0,0 +1,125 @@
+"""
+Drift-free fixed-rate scheduler for the acquisition loops.
+
+A loop that does its work and then sleeps for the sample interval runs at
+period = interval + work time, so timestamps drift over a multi-hour run.
+FixedRateScheduler instead targets absolute deadlines t0 + k * period on the
+monotonic clock: time spent in the loop body is absorbed as long as it stays
+below one period, and ticks that are overrun by more than a whole period are
+skipped (and counted) so the loop falls back onto the same grid.
+
+Usage:
+    scheduler = FixedRateScheduler(rate_hz=10)
+    scheduler.start()
+    while running:
+        do_work()
+        if not scheduler.wait(stop_event):
+            break
+    print(scheduler.stats())
+"""
+import math
+import time
+from collections import deque
+
+
+class FixedRateScheduler:
+    def __init__(self, rate_hz: float, history: int = 1000):
+        """
+        Args:
+            rate_hz (float): Tick rate in Hz (e.g. LOG_HZ).
+            history (int): Number of recent per-tick jitter values kept for percentiles.
+        """
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be > 0")
+        self.period = 1.0 / rate_hz
+
+        self.ticks = 0              # ticks completed
+        self.overruns = 0           # ticks whose work ran past the next deadline
+        self.missed_ticks = 0       # whole periods skipped after overruns
+        self.last_jitter_s = 0.0    # wake-up lateness of the last tick
+        self.recent_jitter_s = deque(maxlen=history)
+
+        self._t0 = None
+        self._k = 0
+        self._jitter_sum = 0.0
+        self._jitter_sq_sum = 0.0
+        self._jitter_max = 0.0
+
+    def start(self):
+        """Set the time of tick 0 (now); following deadlines are t0 + k * period."""
+        self._t0 = time.monotonic()
+        self._k = 0
+
+    @property
+    def deadline(self) -> float:
+        """Monotonic time of the tick currently being processed."""
+        return self._t0 + self._k * self.period
+
+    def wait(self, stop_event=None) -> bool:
+        """
+        Sleep until the next deadline.
+
+        Args:
+            stop_event (threading.Event | None): If given, waiting returns early when it is set.
+
+        Returns:
+            bool: False if ``stop_event`` was set while waiting, True otherwise.
+        """
+        if self._t0 is None:
+            self.start()
+
+        self._k += 1
+        now = time.monotonic()
+        late = now - self.deadline
+        if late > 0:
+            # The loop body ran past the deadline: run the next tick immediately,
+            # skipping whole periods so we stay on the t0 + k * period grid
+            self.overruns += 1
+            skipped = int(math.floor(late / self.period))
+            self._k += skipped
+            self.missed_ticks += skipped
+
+        delay = self.deadline - time.monotonic()
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        elif stop_event is not None and stop_event.is_set():
+            return False
+
+        self._record(max(time.monotonic() - self.deadline, 0.0))
+        return True
+
+    def _record(self, jitter_s: float):
+        self.ticks += 1
+        self.last_jitter_s = jitter_s
+        self.recent_jitter_s.append(jitter_s)
+        self._jitter_sum += jitter_s
+        self._jitter_sq_sum += jitter_s * jitter_s
+        self._jitter_max = max(self._jitter_max, jitter_s)
+
+    def stats(self) -> dict:
+        """
+        Return scheduling statistics.
+
+        Returns:
+            dict: ticks, overruns, missed_ticks, period_ms and jitter (wake-up
+                  lateness) mean / std / max / p95 in milliseconds.
+        """
+        n = self.ticks
+        mean = self._jitter_sum / n if n else 0.0
+        var = max(self._jitter_sq_sum / n - mean * mean, 0.0) if n else 0.0
+        recent = sorted(self.recent_jitter_s)
+        p95 = recent[min(int(0.95 * len(recent)), len(recent) - 1)] if recent else 0.0
+        return {
+            "ticks": n,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "period_ms": self.period * 1000.0,
+            "jitter_mean_ms": mean * 1000.0,
+            "jitter_std_ms": math.sqrt(var) * 1000.0,
+            "jitter_max_ms": self._jitter_max * 1000.0,
+            "jitter_p95_ms": p95 * 1000.0,
+        }
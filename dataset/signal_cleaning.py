@@ -0,0 +1,186 @@
+"""
+Outlier cleaning for noisy scalar signals (ESP temperature, BMS current, ...).
+
+Offline, a centred rolling median / MAD (median absolute deviation) is computed
+with sliding window views, in blocks so memory stays bounded on long logs.
+A sample is an outlier when its robust z-score
+
+    z = 0.6745 * |x - median| / MAD
+
+exceeds ``z_thresh``, or when it is more than ``min_delta`` away from the
+local median (isolated spikes in otherwise flat signals). For quantized
+signals the MAD of a flat stretch is 0, so ``mad_floor`` should be about the
+signal resolution.
+Only the flagged samples are replaced, by linear interpolation between their
+nearest valid neighbours.
+
+Online, OnlineOutlierFilter applies the same test to each new sample against
+the trailing window and holds the last valid value for outliers.
+
+Usage:
+    cleaned, outliers = clean_signal(df["esp_temp_degC"].to_numpy(), window=11)
+
+    filt = OnlineOutlierFilter(window=11)
+    value, is_outlier = filt.update(sample)
+"""
+import warnings
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MAD_SCALE = 0.6745  # makes the MAD z-score comparable to a normal z-score
+MAD_FLOOR = 1e-6    # default MAD lower bound: avoids division by zero on flat signals
+BLOCK_ROWS = 100_000
+
+
+def rolling_median_mad(x, window=11, block_rows=BLOCK_ROWS):
+    """
+    Centred rolling median and MAD (window shrinks to the valid samples at the
+    edges and around NaN).
+
+    Args:
+        x (np.ndarray): 1-D signal.
+        window (int): Window length in samples (odd).
+        block_rows (int): Output samples computed at once.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (median, MAD), same length as ``x``.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    half = window // 2
+    padded = np.concatenate([np.full(half, np.nan), x, np.full(window - 1 - half, np.nan)])
+    median = np.empty(len(x))
+    mad = np.empty(len(x))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+        for start in range(0, len(x), block_rows):
+            stop = min(start + block_rows, len(x))
+            windows = sliding_window_view(padded[start:stop + window - 1], window)
+            med = np.nanmedian(windows, axis=1)
+            median[start:stop] = med
+            mad[start:stop] = np.nanmedian(np.abs(windows - med[:, None]), axis=1)
+    return median, mad
+
+
+def detect_outliers(x, window=11, z_thresh=3.5, min_delta=None, mad_floor=MAD_FLOOR):
+    """
+    Flag outliers against the centred rolling median / MAD.
+
+    Args:
+        x (np.ndarray): 1-D signal.
+        window (int): Window length in samples.
+        z_thresh (float): Robust z-score threshold.
+        min_delta (float | None): Also flag samples further than this from the local median.
+        mad_floor (float): Lower bound of the MAD (signal resolution for quantized signals).
+
+    Returns:
+        np.ndarray: Boolean mask, True for outliers (NaN samples are flagged too).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    median, mad = rolling_median_mad(x, window)
+    deviation = np.abs(x - median)
+    mask = MAD_SCALE * deviation / np.maximum(mad, mad_floor) > z_thresh
+    if min_delta is not None:
+        mask |= deviation > min_delta
+    return mask | np.isnan(x)
+
+
+def interpolate_gaps(x, mask):
+    """
+    Replace the samples flagged in ``mask`` by linear interpolation between the
+    nearest valid samples (held constant before the first / after the last one).
+
+    Args:
+        x (np.ndarray): 1-D signal.
+        mask (np.ndarray): Boolean mask of samples to replace.
+
+    Returns:
+        np.ndarray: Copy of ``x`` with the flagged samples replaced (unchanged if
+                    fewer than two samples are valid).
+    """
+    x = np.array(x, dtype=np.float64)
+    mask = np.asarray(mask, dtype=bool)
+    valid = np.flatnonzero(~mask)
+    if len(valid) < 2 or not mask.any():
+        return x
+    gaps = np.flatnonzero(mask)
+    x[gaps] = np.interp(gaps, valid, x[valid])
+    return x
+
+
+def clean_signal(x, window=11, z_thresh=3.5, min_delta=None, mad_floor=MAD_FLOOR):
+    """
+    Detect outliers (see detect_outliers()) and interpolate over them.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (cleaned signal, outlier mask)
+    """
+    mask = detect_outliers(x, window, z_thresh, min_delta, mad_floor)
+    return interpolate_gaps(x, mask), mask
+
+
+class OnlineOutlierFilter:
+    """Causal version of detect_outliers() for live signals, O(window) per sample."""
+
+    def __init__(self, window=11, z_thresh=3.5, min_delta=None, mad_floor=MAD_FLOOR,
+                 min_samples=3, max_hold=None):
+        """
+        Args:
+            window (int): Number of past valid samples the new sample is compared to.
+            z_thresh (float): Robust z-score threshold.
+            min_delta (float | None): Also reject samples further than this from the median.
+            mad_floor (float): Lower bound of the MAD (signal resolution for quantized signals).
+            min_samples (int): Samples accepted unchecked at start-up.
+            max_hold (int | None): After this many consecutive rejections the signal is
+                                   taken to have changed level and the rejected samples
+                                   are accepted (default: window // 2 + 1).
+        """
+        self.z_thresh = z_thresh
+        self.min_delta = min_delta
+        self.mad_floor = mad_floor
+        self.min_samples = min_samples
+        self.max_hold = max_hold or window // 2 + 1
+        self._history = deque(maxlen=window)
+        self._rejected = []
+        self.n_outliers = 0
+
+    def reset(self):
+        self._history.clear()
+        self._rejected = []
+        self.n_outliers = 0
+
+    def update(self, x):
+        """
+        Args:
+            x (float): New sample.
+
+        Returns:
+            tuple[float, bool]: (cleaned value, True if ``x`` was rejected). Rejected
+                                samples are replaced by the last valid value.
+        """
+        x = float(x)
+        if len(self._history) < self.min_samples:
+            if np.isnan(x):
+                return (self._history[-1] if self._history else x), True
+            self._history.append(x)
+            return x, False
+
+        history = np.fromiter(self._history, dtype=np.float64)
+        median = np.median(history)
+        deviation = abs(x - median)
+        mad = max(np.median(np.abs(history - median)), self.mad_floor)
+        outlier = (np.isnan(x) or MAD_SCALE * deviation / mad > self.z_thresh
+                   or (self.min_delta is not None and deviation > self.min_delta))
+        if outlier and not np.isnan(x):
+            self._rejected.append(x)
+            if len(self._rejected) >= self.max_hold:  # level change, not a spike
+                self._history.extend(self._rejected)
+                self._rejected = []
+                return x, False
+        if outlier:
+            self.n_outliers += 1
+            return self._history[-1], True
+        self._rejected = []
+        self._history.append(x)
+        return x, False
@@ -0,0 +1,362 @@
+"""
+Run-wise and pooled statistics over every run of an HDF5 dataset.
+
+Each run is read once, in chunks, into mergeable accumulators:
+
+    Moments         count, mean, min, max and the co-moment matrix of all numeric
+                    columns (Welford / Chan parallel update), giving variances,
+                    covariance and Pearson correlation
+    QuantileSketch  per column, a compacting (KLL-style) sketch with bounded
+                    memory and rank error of roughly 1 / k
+
+Runs are processed in parallel worker processes and the per-run results are
+merged into pooled statistics without another pass over the data. Results are
+cached per run content hash (dataset_utils.run_content_hash, or the
+"content_hash" attribute written by combine_h5), so unchanged runs, and copies
+of a run in other files, are never read again.
+
+Usage:
+    python -m dataset.stats_engine dataset.h5 --workers 8
+"""
+import argparse
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from dataset.dataset_utils import iter_row_slices, run_content_hash
+from dataset.all_data.h5_files.h5_export import column_layout
+
+DEFAULT_CACHE_DIR = "dataset/stats_cache"
+CHUNK_ROWS = 200_000
+SKETCH_K = 1024
+
+######################################## ACCUMULATORS ########################################
+
+class Moments:
+    """Mergeable count / mean / co-moment accumulator over rows of a fixed set of columns."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))  # sum of outer products of deviations from the mean
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, block):
+        """
+        Add rows.
+
+        Args:
+            block (np.ndarray): (n_rows, n_columns); rows containing NaN are skipped.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        block = block[~np.isnan(block).any(axis=1)]
+        if len(block) == 0:
+            return
+        other = Moments(self.columns)
+        other.n = len(block)
+        other.mean = block.mean(axis=0)
+        dev = block - other.mean
+        other.comoment = dev.T @ dev
+        other.min = block.min(axis=0)
+        other.max = block.max(axis=0)
+        self.merge(other)
+
+    def merge(self, other):
+        """Combine with another accumulator over the same columns (Chan et al.)."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = other.n, other.mean.copy(), other.comoment.copy()
+            self.min, self.max = other.min.copy(), other.max.copy()
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.n * other.n / n
+        self.mean = self.mean + delta * other.n / n
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def cov(self):
+        """Sample covariance matrix (ddof=1) as a DataFrame."""
+        cov = self.comoment / (self.n - 1) if self.n > 1 else np.full_like(self.comoment, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def var(self):
+        return pd.Series(np.diag(self.cov().to_numpy()), index=self.columns)
+
+    def corr(self):
+        """Pearson correlation matrix as a DataFrame (NaN for constant columns)."""
+        d = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comoment / np.outer(d, d)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch for one column.
+
+    Level i holds values of weight 2**i. When a level exceeds k values it is
+    sorted and every other value (random offset) is promoted to the next level,
+    so memory stays around k * log2(n / k) values.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        for i, level in enumerate(other.levels):
+            if i == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[i] = np.concatenate([self.levels[i], level])
+        self._compress()
+        return self
+
+    def _compress(self):
+        i = 0
+        while i < len(self.levels):
+            level = self.levels[i]
+            if len(level) > self.k:
+                level = np.sort(level)
+                n_keep = len(level) - len(level) % 2  # an odd value stays at this level
+                promoted = level[self._rng.integers(2):n_keep:2]
+                self.levels[i] = level[n_keep:]
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+            i += 1
+
+    def quantiles(self, qs):
+        """
+        Args:
+            qs (list[float]): Quantiles in [0, 1].
+
+        Returns:
+            np.ndarray: Approximate quantile values (NaN if empty).
+        """
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return np.full(len(qs), np.nan)
+        weights = np.concatenate([np.full(len(l), 2.0 ** i) for i, l in enumerate(self.levels)])
+        order = np.argsort(values)
+        cum = np.cumsum(weights[order])
+        idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+        return values[order][np.minimum(idx, len(values) - 1)]
+
+
+class RunStats:
+    """Moments and quantile sketches of the numeric columns of one run (or pooled runs)."""
+
+    def __init__(self, columns, k=SKETCH_K):
+        self.columns = list(columns)
+        self.moments = Moments(self.columns)
+        self.sketches = [QuantileSketch(k, seed=i) for i in range(len(self.columns))]
+        self.runs = []
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        self.moments.update(block)
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(block[:, j])
+
+    def merge(self, other):
+        """Merge another RunStats, aligning columns (columns missing on one side are dropped)."""
+        if other.columns != self.columns:
+            common = [c for c in self.columns if c in other.columns]
+            self_sel, other_sel = self.select(common), other.select(common)
+            self.__dict__.update(self_sel.__dict__)
+            other = other_sel
+        self.moments.merge(other.moments)
+        for mine, theirs in zip(self.sketches, other.sketches):
+            mine.merge(theirs)
+        self.runs += other.runs
+        return self
+
+    def select(self, columns):
+        """Copy restricted to ``columns`` (moments are exact, sketches are shared)."""
+        idx = [self.columns.index(c) for c in columns]
+        out = RunStats(columns)
+        out.moments.n = self.moments.n
+        out.moments.mean = self.moments.mean[idx]
+        out.moments.comoment = self.moments.comoment[np.ix_(idx, idx)]
+        out.moments.min, out.moments.max = self.moments.min[idx], self.moments.max[idx]
+        out.sketches = [self.sketches[i] for i in idx]
+        out.runs = list(self.runs)
+        return out
+
+    def corr(self):
+        return self.moments.corr()
+
+    def summary(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """Per-column count, mean, std, min, quantiles and max as a DataFrame."""
+        m = self.moments
+        df = pd.DataFrame({"count": m.n, "mean": m.mean, "std": np.sqrt(m.var().to_numpy()),
+                           "min": m.min}, index=self.columns)
+        q = np.array([s.quantiles(qs) for s in self.sketches]).reshape(len(self.columns), len(qs))
+        for i, qv in enumerate(qs):
+            df[f"q{int(round(qv * 100)):02d}"] = q[:, i]
+        df["max"] = m.max
+        return df
+
+######################################## DATASET ########################################
+
+def compute_run_stats(h5_path, run_name, chunk_rows=CHUNK_ROWS):
+    """
+    Statistics of the numeric per-sample columns of one run, in one chunked pass.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        run_name (str): Run group name.
+        chunk_rows (int): Rows read at once.
+
+    Returns:
+        RunStats: Column names as in h5_export ("bms/current", "bms/cell_voltages_0", ...).
+    """
+    with h5py.File(h5_path, "r") as f:
+        g = f[run_name]
+        layout = [(name, path, i) for name, path, i in column_layout(g)
+                  if h5py.check_string_dtype(g[path].dtype) is None]
+        stats = RunStats([name for name, _, _ in layout])
+        stats.runs = [run_name]
+        if not layout:
+            return stats
+        paths = list(dict.fromkeys(path for _, path, _ in layout))
+        n_rows = g[paths[0]].shape[0]
+        for rows in iter_row_slices(n_rows, chunk_rows):
+            blocks = {}
+            for path in paths:
+                block = g[path][rows]
+                blocks[path] = block.reshape(block.shape[0], -1) if block.ndim > 1 else block
+            stats.update(np.column_stack([blocks[path] if i is None else blocks[path][:, i]
+                                          for _, path, i in layout]))
+    return stats
+
+
+class _Cache:
+    """Per-run results keyed by content hash, with a (file, mtime, size, run) -> hash index."""
+
+    def __init__(self, cache_dir):
+        self.dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index = json.load(open(self.index_path)) if os.path.exists(self.index_path) else {}
+
+    @staticmethod
+    def file_key(h5_path, run_name):
+        st = os.stat(h5_path)
+        return f"{os.path.abspath(h5_path)}|{st.st_mtime_ns}|{st.st_size}|{run_name}"
+
+    def content_hash(self, h5_path, run_name):
+        key = self.file_key(h5_path, run_name)
+        if key not in self.index:
+            with h5py.File(h5_path, "r") as f:
+                g = f[run_name]
+                self.index[key] = g.attrs["content_hash"] if "content_hash" in g.attrs else run_content_hash(g)
+        return self.index[key]
+
+    def load(self, content_hash):
+        path = os.path.join(self.dir, f"{content_hash}.pkl")
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                return pickle.load(fh)
+        return None
+
+    def save(self, content_hash, stats):
+        with open(os.path.join(self.dir, f"{content_hash}.pkl"), "wb") as fh:
+            pickle.dump(stats, fh)
+        with open(self.index_path, "w") as fh:
+            json.dump(self.index, fh)
+
+
+def dataset_stats(h5_path, runs=None, workers=None, cache_dir=DEFAULT_CACHE_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Per-run and pooled statistics of an HDF5 dataset.
+
+    Args:
+        h5_path (str): HDF5 file path.
+        runs (list[str] | None): Run names, None = all runs.
+        workers (int | None): Worker processes (None = CPU count, 1 = in-process).
+        cache_dir (str | None): Result cache directory, None disables caching.
+        chunk_rows (int): Rows read at once.
+
+    Returns:
+        tuple: (dict run name -> RunStats, pooled RunStats over the columns common to all runs)
+    """
+    with h5py.File(h5_path, "r") as f:
+        run_names = [name for name in f.keys() if isinstance(f.get(name), h5py.Group)]
+    if runs is not None:
+        run_names = [name for name in run_names if name in runs]
+
+    cache = _Cache(cache_dir) if cache_dir else None
+    results, todo, hashes = {}, [], {}
+    for name in run_names:
+        if cache is not None:
+            hashes[name] = cache.content_hash(h5_path, name)
+            cached = cache.load(hashes[name])
+            if cached is not None:
+                cached.runs = [name]
+                results[name] = cached
+                continue
+        todo.append(name)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(todo) <= 1:
+        computed = [compute_run_stats(h5_path, name, chunk_rows) for name in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            computed = list(pool.map(compute_run_stats, [h5_path] * len(todo), todo, [chunk_rows] * len(todo)))
+    for name, stats in zip(todo, computed):
+        results[name] = stats
+        if cache is not None:
+            cache.save(hashes[name], stats)
+
+    pooled = None
+    for name in run_names:
+        if pooled is None:
+            pooled = pickle.loads(pickle.dumps(results[name]))  # deep copy, results stay per run
+        else:
+            pooled.merge(results[name])
+    return {name: results[name] for name in run_names}, pooled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-run and pooled statistics of an HDF5 dataset.")
+    parser.add_argument("input", help="Path to H5 file")
+    parser.add_argument("--runs", nargs="+", default=None, help="Runs to include (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Result cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the cache")
+    parser.add_argument("--output", default=None, help="Directory for summary / correlation CSV files")
+    args = parser.parse_args()
+
+    per_run, pooled = dataset_stats(args.input, runs=args.runs, workers=args.workers,
+                                    cache_dir=None if args.no_cache else args.cache_dir)
+    pd.set_option("display.width", 200)
+    print(f"Pooled statistics over {len(per_run)} runs:")
+    print(pooled.summary().round(4))
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        pooled.summary().to_csv(os.path.join(args.output, "pooled_summary.csv"))
+        pooled.corr().to_csv(os.path.join(args.output, "pooled_correlation.csv"))
+        for name, stats in per_run.items():
+            stats.summary().to_csv(os.path.join(args.output, f"{name}_summary.csv"))
+            stats.corr().to_csv(os.path.join(args.output, f"{name}_correlation.csv"))
+        print(f"Saved summaries and correlation matrices to {args.output}")
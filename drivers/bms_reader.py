@@ -2,6 +2,7 @@ import asyncio
 import logging
 from typing import Final
 from threading import Thread, Lock
+from contextlib import nullcontext
 
 from bleak import BleakScanner
 from bleak.backends.device import BLEDevice
@@ -11,8 +12,14 @@ from aiobmsble import BMSSample
 from aiobmsble.bms.daly_bms import BMS
 
 class BMSReader:
-    def __init__(self, device_name: str):
+    def __init__(self, device_name: str, span=nullcontext):
+        """
+        Args:
+            device_name (str): BLE name of the BMS.
+            span (callable): span(name) -> context manager timing a stage (e.g. a profiler's span).
+        """
         self.device_name = device_name
+        self.span = span
         self.latest_sample: BMSSample | None = None
         self._lock = Lock()
         self._stop_flag = False
@@ -32,7 +39,8 @@ class BMSReader:
             async with BMS(ble_device=device) as bms:
                 self.logger.info("Connected to BMS: %s", device.address)
                 while not self._stop_flag:
-                    data: BMSSample = await bms.async_update()
+                    with self.span("bms.async_update"):
+                        data: BMSSample = await bms.async_update()
                     with self._lock:
                         self.latest_sample = data
                     await asyncio.sleep(0.5) # Polling interval
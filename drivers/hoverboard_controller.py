@@ -4,12 +4,16 @@ import time
 import sys
 import threading
 import math
+from contextlib import nullcontext
 
 """Hoverboard serial controller.
 """
 
 class HoverboardController:
-    def __init__(self, serial_port="COM5", baud_rate=115200, start_frame=0xABCD, print_feedback=True):
+    def __init__(self, serial_port="COM5", baud_rate=115200, start_frame=0xABCD, print_feedback=True,
+                 span=nullcontext):
+        # span(name) -> context manager timing a stage (e.g. a profiler's span)
+        self.span = span
         # Start frame and feedback size from the hoverboard firmware
         self.start_frame = start_frame
         self.feedback_size = 18
@@ -95,6 +99,9 @@ class HoverboardController:
             self.incomingBytesPrev=incomingByte
             return
         else:
+            # Time from start frame to checksum (the frame payload)
+            frame_span = self.span("hoverboard.read_feedback")
+            frame_span.__enter__()
             feedback = {"cmd1":0, "cmd2":0, "speedR_meas":0, "speedL_meas":0, "batVoltage":0, "boardTemp":0, "cmdLed":0}
             checksumBytesCalculate=bufStartFrame
     
@@ -111,6 +118,7 @@ class HoverboardController:
                 
             # Control checksumBytes Read is checksumBytes Calculate
             checksumBytesRead=self.ser_port.read(2)
+            frame_span.__exit__(None, None, None)
             if checksumBytesCalculate == checksumBytesRead:
                 #print("checksumBytes True")
                 return feedback
@@ -0,0 +1,160 @@
+"""
+Batch Analysis of ESP CSV Logs
+==============================
+Runs the esp_csv_analysis metrics over many ESP logs in parallel worker
+processes and writes one summary table (one row per log):
+
+    average_inference_time     inference_* columns
+    calculate_actual_capacity  duration_h, capacity_Ah, capacity_Wh, ...
+    soc_metrics                r2, mae, rmse, mean_error, max_abs_error
+
+Plotting is headless (Agg backend): figures are only rendered and saved when
+``--figures`` is given, never shown. A log that fails to load or analyse is
+reported in the ``error`` column instead of stopping the batch.
+
+Usage (from the repository root):
+    python -m plotting_scripts.esp_batch_analysis logs/ --output summary.csv
+    python -m plotting_scripts.esp_batch_analysis logs/*.csv --nominal-capacity 10 --figures figures/
+"""
+import matplotlib
+matplotlib.use("Agg")  # before pyplot is imported (also in the worker processes)
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import plotting_scripts.esp_csv_analysis as ba
+
+
+def find_logs(paths: list[str]) -> list[str]:
+    """
+    Expand files, directories (all *.csv inside) and glob patterns.
+
+    Returns
+    -------
+    list[str]
+        Sorted unique CSV paths.
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, "*.csv")))
+        elif any(ch in path for ch in "*?["):
+            files.update(glob.glob(path))
+        elif os.path.isfile(path):
+            files.add(path)
+        else:
+            print(f"[esp_batch_analysis] Not found: {path}")
+    return sorted(files)
+
+
+def analyse_file(filepath: str,
+                 nominal_capacity_Ah: float | None = None,
+                 figure_dir: str | None = None) -> dict:
+    """
+    Compute the summary metrics of one log.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the CSV file.
+    nominal_capacity_Ah : float, optional
+        Rated battery capacity for the SoH column.
+    figure_dir : str, optional
+        If provided, save the overview and SoC figures to
+        ``<figure_dir>/<log name>_overview.pdf`` / ``_soc_metrics.pdf``.
+
+    Returns
+    -------
+    dict
+        One summary row; ``error`` is set if the log could not be analysed.
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    row = {"file": filepath, "error": None}
+    try:
+        df = ba.load_csv(filepath)
+        row["n_rows"] = len(df)
+
+        inference = ba.average_inference_time(df, print_result=False)
+        row.update({f"inference_{k}": v for k, v in inference.items() if k != "n_samples"})
+
+        row.update(ba.calculate_actual_capacity(df, nominal_capacity_Ah=nominal_capacity_Ah,
+                                                print_result=False))
+
+        save_path = os.path.join(figure_dir, f"{name}_soc_metrics.pdf") if figure_dir else None
+        metrics = ba.soc_metrics(df, print_result=False, save_path=save_path,
+                                 plot=figure_dir is not None, show=False)
+        row.update({k: v for k, v in metrics.items() if k != "n_samples"})
+        row["n_soc_samples"] = metrics["n_samples"]
+
+        if figure_dir:
+            ba.plot_overview(df, save_path=os.path.join(figure_dir, f"{name}_overview.pdf"), show=False)
+    except Exception as exc:  # keep the batch going, report the failing log
+        row["error"] = f"{type(exc).__name__}: {exc}"
+    return row
+
+
+def analyse_batch(files: list[str],
+                  nominal_capacity_Ah: float | None = None,
+                  figure_dir: str | None = None,
+                  workers: int | None = None) -> pd.DataFrame:
+    """
+    Analyse many logs in parallel.
+
+    Parameters
+    ----------
+    files : list[str]
+        CSV paths.
+    nominal_capacity_Ah : float, optional
+        Rated battery capacity for the SoH column.
+    figure_dir : str, optional
+        Directory for the figures (none rendered if omitted).
+    workers : int, optional
+        Worker processes (default CPU count, 1 = in-process).
+
+    Returns
+    -------
+    pd.DataFrame
+        Summary table, one row per log, in ``files`` order.
+    """
+    if figure_dir:
+        os.makedirs(figure_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    args = ([nominal_capacity_Ah] * len(files), [figure_dir] * len(files))
+    if workers <= 1 or len(files) <= 1:
+        rows = list(map(analyse_file, files, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            rows = list(pool.map(analyse_file, files, *args))
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse many ESP CSV logs into one summary table.")
+    parser.add_argument("inputs", nargs="+", help="CSV files, directories or glob patterns")
+    parser.add_argument("--output", "-o", default="esp_batch_summary.csv",
+                        help="Summary CSV path (default: esp_batch_summary.csv)")
+    parser.add_argument("--nominal-capacity", type=float, default=None,
+                        help="Rated capacity in Ah, adds a soh_pct column")
+    parser.add_argument("--figures", default=None, help="Save figures to this directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    files = [f for f in find_logs(args.inputs)
+             if os.path.abspath(f) != os.path.abspath(args.output)]  # a previous summary
+    if not files:
+        raise SystemExit("[esp_batch_analysis] No CSV logs found.")
+    print(f"[esp_batch_analysis] Analysing {len(files)} log(s) …")
+
+    summary = analyse_batch(files, nominal_capacity_Ah=args.nominal_capacity,
+                            figure_dir=args.figures, workers=args.workers)
+    summary.to_csv(args.output, index=False)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.drop(columns=["file"]).set_index(summary["file"].map(os.path.basename)).round(4))
+    n_failed = int(summary["error"].notna().sum())
+    print(f"\n[esp_batch_analysis] Summary saved to '{args.output}'"
+          + (f" ({n_failed} log(s) failed)" if n_failed else ""))
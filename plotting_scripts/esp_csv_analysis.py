@@ -6,8 +6,8 @@ Reusable functions for analysing battery CSV data with the following columns:
     cycle_charge_Ah, cycle_capacity_Wh, bms_soc_pct, pred_soc_pct,
     inference_us, esp_temp_degC
 
-Usage:
-    import battery_analysis as ba
+Usage (from the repository root):
+    import plotting_scripts.esp_csv_analysis as ba
     df = ba.load_csv("your_file.csv")
     ba.plot_overview(df)
     ba.average_inference_time(df)
@@ -20,7 +20,9 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-from scipy.interpolate import interp1d
+
+from dataset.signal_cleaning import clean_signal
+from soc_estimation.coulomb_counter import LIVE_MAX_GAP_S, integrate
 
 # ---------------------------------------------------------------------------
 # Publication-ready style defaults
@@ -64,6 +66,14 @@ C = {
 }
 
 
+def _show_or_close(fig: plt.Figure, show: bool) -> None:
+    """Show a figure (blocking) or release it (batch / headless use)."""
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+
 # ---------------------------------------------------------------------------
 # 1. DATA LOADER
 # ---------------------------------------------------------------------------
@@ -92,7 +102,8 @@ def load_csv(filepath: str) -> pd.DataFrame:
 # ---------------------------------------------------------------------------
 
 def plot_overview(df: pd.DataFrame,
-                  save_path: str | None = None) -> plt.Figure:
+                  save_path: str | None = None,
+                  show: bool = True) -> plt.Figure:
     """
     Plot a 2×2 grid: Voltage | Current | Temperature | SOC (BMS + Predicted).
 
@@ -102,6 +113,9 @@ def plot_overview(df: pd.DataFrame,
         Battery data loaded with ``load_csv``.
     save_path : str, optional
         If provided, save the figure to this path (e.g. "overview.pdf").
+    show : bool
+        If True, open the figure window (blocks); otherwise the figure is
+        closed after saving.
 
     Returns
     -------
@@ -163,7 +177,7 @@ def plot_overview(df: pd.DataFrame,
         fig.savefig(save_path)
         print(f"[plot_overview] Figure saved to '{save_path}'")
 
-    plt.show()
+    _show_or_close(fig, show)
     return fig
 
 
@@ -222,72 +236,61 @@ def average_inference_time(df: pd.DataFrame,
 # ---------------------------------------------------------------------------
 
 def clean_esp_temp(df: pd.DataFrame,
-                   z_thresh: float = 2.5,
+                   z_thresh: float = 3.5,
                    window: int = 11,
                    min_delta: float = 5.0,
+                   mad_floor: float = 0.1,
+                   column: str = "esp_temp_degC",
                    save_path: str | None = None,
-                   plot: bool = True) -> pd.Series:
+                   plot: bool = True,
+                   show: bool = True) -> pd.Series:
     """
-    Remove outliers from ``esp_temp_degC`` and interpolate the cleaned signal.
+    Remove outliers from ``esp_temp_degC`` (or any signal ``column``) and
+    interpolate over them.
 
-    Detection strategy (two-stage):
-      1. Rolling Z-score – flag points whose deviation from the local rolling
-         mean exceeds ``z_thresh`` standard deviations.
-      2. Absolute delta threshold – also flag points where the sample-to-sample
-         jump exceeds ``min_delta`` degrees (catches isolated spikes that are
-         too short for the Z-score window).
+    Detection strategy (single pass, see ``dataset.signal_cleaning``):
+      1. Robust Z-score – flag points whose deviation from the centred rolling
+         median exceeds ``z_thresh`` scaled MADs (median absolute deviations).
+      2. Absolute deviation – also flag points further than ``min_delta``
+         from the rolling median (isolated spikes in flat stretches).
 
-    After flagging, outliers are replaced by cubic-spline interpolation over
-    the remaining valid samples.
+    Only the flagged samples are replaced, by linear interpolation between
+    their nearest valid neighbours.
 
     Parameters
     ----------
     df : pd.DataFrame
         Battery data loaded with ``load_csv``.
     z_thresh : float
-        Z-score threshold for outlier detection (default 2.5).
+        Robust Z-score threshold for outlier detection (default 3.5).
     window : int
-        Rolling window length for Z-score computation (default 11 samples).
+        Rolling window length for the median / MAD (default 11 samples).
     min_delta : float
-        Absolute jump threshold in °C (default 5.0 °C).
+        Absolute deviation threshold in °C (default 5.0 °C).
+    mad_floor : float
+        Lower bound of the MAD, about the sensor resolution (default 0.1 °C).
+    column : str
+        Signal column to clean (default ``esp_temp_degC``).
     save_path : str, optional
         If provided, save the diagnostic figure to this path.
     plot : bool
         If True, render a diagnostic plot.
+    show : bool
+        If True, open the plot window (blocks).
 
     Returns
     -------
     pd.Series
-        Cleaned ``esp_temp_degC`` series (same index as ``df``).
+        Cleaned series named ``<column>_clean`` (same index as ``df``).
     """
-    raw = df["esp_temp_degC"].copy().astype(float)
-    idx = np.arange(len(raw))
+    raw = df[column].astype(float)
+    cleaned, outlier_mask = clean_signal(raw.to_numpy(), window=window, z_thresh=z_thresh,
+                                         min_delta=min_delta, mad_floor=mad_floor)
+    cleaned = pd.Series(cleaned, index=raw.index, name=f"{column}_clean")
 
-    # ── Stage 1: rolling Z-score ──────────────────────────────────────────
-    roll_mean = raw.rolling(window, center=True, min_periods=1).mean()
-    roll_std  = raw.rolling(window, center=True, min_periods=1).std().fillna(1e-6)
-    z_score   = (raw - roll_mean).abs() / roll_std
-
-    # ── Stage 2: absolute delta ───────────────────────────────────────────
-    delta = raw.diff().abs()
-
-    outlier_mask = (z_score > z_thresh) | (delta > min_delta)
-
-    n_out = outlier_mask.sum()
+    n_out = int(outlier_mask.sum())
     print(f"[clean_esp_temp] {n_out} outlier(s) detected and removed.")
 
-    # ── Interpolation on valid samples ────────────────────────────────────
-    valid_idx = idx[~outlier_mask]
-    valid_val = raw.values[~outlier_mask]
-
-    if len(valid_idx) < 2:
-        print("[clean_esp_temp] Too few valid samples – returning raw signal.")
-        return raw
-
-    interp_fn  = interp1d(valid_idx, valid_val, kind="cubic",
-                          fill_value="extrapolate")
-    cleaned    = pd.Series(interp_fn(idx), index=raw.index, name="esp_temp_degC_clean")
-
     # ── Diagnostic plot ───────────────────────────────────────────────────
     if plot:
         time = df["datetime_utc"]
@@ -310,7 +313,7 @@ def clean_esp_temp(df: pd.DataFrame,
         ax.plot(time, cleaned, color=C["cleaned"], linewidth=1.2,
                 label="Cleaned & interpolated")
         ax.set_ylabel("ESP Temp (°C)")
-        ax.set_title("Cleaned Signal (Cubic Interpolation)")
+        ax.set_title("Cleaned Signal (Linear Interpolation over Outliers)")
         ax.set_xlabel("Time (UTC)")
         ax.legend()
         ax.yaxis.set_minor_locator(ticker.AutoMinorLocator())
@@ -323,7 +326,7 @@ def clean_esp_temp(df: pd.DataFrame,
         if save_path:
             fig.savefig(save_path)
             print(f"[clean_esp_temp] Figure saved to '{save_path}'")
-        plt.show()
+        _show_or_close(fig, show)
 
     return cleaned
 
@@ -334,13 +337,16 @@ def clean_esp_temp(df: pd.DataFrame,
 
 def calculate_actual_capacity(df: pd.DataFrame,
                                nominal_capacity_Ah: float | None = None,
-                               print_result: bool = True) -> dict:
+                               print_result: bool = True,
+                               max_gap_s: float | None = LIVE_MAX_GAP_S) -> dict:
     """
     Calculate the actual discharged capacity of the battery from the
     measured current and elapsed time (coulomb counting).
 
     The function integrates ``current_A`` over time using the trapezoidal
-    rule with the real sample timestamps.
+    rule over the ESP sample timestamps (``esp_timestamp_ms``) with
+    ``soc_estimation.coulomb_counter``, the same integration, time base and
+    gap threshold the ESP logger runs sample by sample.
 
     Parameters
     ----------
@@ -351,6 +357,11 @@ def calculate_actual_capacity(df: pd.DataFrame,
         State-of-Health (SoH) estimate is also returned.
     print_result : bool
         If True, print a formatted results table.
+    max_gap_s : float, optional
+        Sample intervals longer than this (logger disconnects) are not
+        integrated, nor are intervals where the ESP clock restarted.
+        Defaults to the live logger's threshold; None integrates every
+        interval that moves forward.
 
     Returns
     -------
@@ -358,33 +369,22 @@ def calculate_actual_capacity(df: pd.DataFrame,
         Keys:
           'duration_h'         – total test duration in hours
           'capacity_Ah'        – integrated discharged capacity (Ah)
-          'capacity_Wh'        – energy (Wh), using mean voltage
+          'capacity_Wh'        – energy (Wh), ∫ I·V dt
           'mean_current_A'     – average current during the test
           'mean_voltage_V'     – average voltage during the test
+          'net_Ah'             – signed ∫ I dt (negative on discharge)
+          'charge_Ah'          – charge put in (positive current)
+          'discharge_Ah'       – charge taken out (negative current)
+          'gap_h', 'n_gaps'    – time not integrated (see ``max_gap_s``)
           'soh_pct'            – SoH % (only if nominal_capacity_Ah given)
     """
-    # Elapsed time in hours for each sample
-    t_s  = (df["datetime_utc"] - df["datetime_utc"].iloc[0]).dt.total_seconds().values
-    t_h  = t_s / 3600.0
-    I    = df["current_A"].values
-    V    = df["voltage_V"].values
-
-    duration_h   = t_h[-1] - t_h[0]
-    capacity_Ah  = float(np.trapz(I, t_h))          # ∫ I dt  [Ah]
-    capacity_Wh  = float(np.trapz(I * V, t_h))      # ∫ I·V dt  [Wh]
-    mean_I       = float(np.mean(I))
-    mean_V       = float(np.mean(V))
-
-    result = {
-        "duration_h":     duration_h,
-        "capacity_Ah":    abs(capacity_Ah),
-        "capacity_Wh":    abs(capacity_Wh),
-        "mean_current_A": mean_I,
-        "mean_voltage_V": mean_V,
-    }
-
-    if nominal_capacity_Ah is not None:
-        result["soh_pct"] = 100.0 * abs(capacity_Ah) / nominal_capacity_Ah
+    # ESP time in seconds for each sample (millisecond resolution, like the live counter)
+    t_s = df["esp_timestamp_ms"].to_numpy(dtype=np.float64) / 1000.0
+    result = integrate(t_s, df["current_A"].values, df["voltage_V"].values,
+                       nominal_capacity_Ah=nominal_capacity_Ah, max_gap_s=max_gap_s)
+    duration_h = result["duration_h"]
+    mean_I = result["mean_current_A"]
+    mean_V = result["mean_voltage_V"]
 
     if print_result:
         sep = "─" * 44
@@ -397,6 +397,9 @@ def calculate_actual_capacity(df: pd.DataFrame,
         print(f"  Mean voltage             : {mean_V:.3f} V")
         print(f"  Discharged capacity      : {result['capacity_Ah']:.4f} Ah")
         print(f"  Discharged energy        : {result['capacity_Wh']:.4f} Wh")
+        if result["n_gaps"]:
+            print(f"  Gaps not integrated      : {result['n_gaps']} "
+                  f"({result['gap_h']*60:.1f} min)")
         if "soh_pct" in result:
             print(f"  State of Health (SoH)    : {result['soh_pct']:.2f} %")
         print(sep)
@@ -410,7 +413,9 @@ def calculate_actual_capacity(df: pd.DataFrame,
 
 def soc_metrics(df: pd.DataFrame,
                 print_result: bool = True,
-                save_path: str | None = None) -> dict:
+                save_path: str | None = None,
+                plot: bool = True,
+                show: bool = True) -> dict:
     """
     Compute regression metrics between predicted SoC and BMS SoC, and
     produce a two-panel diagnostic figure (time-series overlay + scatter plot).
@@ -429,6 +434,10 @@ def soc_metrics(df: pd.DataFrame,
         If True, print a formatted metrics table to stdout.
     save_path : str, optional
         If provided, save the diagnostic figure to this path.
+    plot : bool
+        If True, render the diagnostic figure.
+    show : bool
+        If True, open the figure window (blocks).
 
     Returns
     -------
@@ -471,6 +480,9 @@ def soc_metrics(df: pd.DataFrame,
         print(f"  Max absolute error   : {max_abs_err:.4f} pp")
         print(sep)
 
+    if not plot:
+        return metrics
+
     # ── Diagnostic figure ─────────────────────────────────────────────────
     time = df["datetime_utc"].iloc[valid.index]
 
@@ -532,7 +544,7 @@ def soc_metrics(df: pd.DataFrame,
     if save_path:
         fig.savefig(save_path)
         print(f"[soc_metrics] Figure saved to '{save_path}'")
-    plt.show()
+    _show_or_close(fig, show)
 
     return metrics
 
@@ -599,7 +611,7 @@ if __name__ == "__main__":
 
     if len(sys.argv) < 2:
         print(__doc__)
-        print("\nUsage: python battery_analysis.py <path_to_csv> [nominal_capacity_Ah]")
+        print("\nUsage: python -m plotting_scripts.esp_csv_analysis <path_to_csv> [nominal_capacity_Ah]")
         sys.exit(0)
 
     csv_file = sys.argv[1]
@@ -0,0 +1,156 @@
+"""
+Coulomb counting: charge / energy throughput, capacity and SoH of a run.
+
+The same trapezoidal integration runs in two modes:
+
+    CoulombCounter.update()   live, O(1) per BMS sample (run orchestrator, ESP logger)
+    integrate()               vectorized over a recorded run (esp_csv_analysis)
+
+and both give the same result for the same samples. Current is signed
+(BMS convention: negative on discharge); the net integral and the charged /
+discharged amounts are kept separately. Intervals longer than ``max_gap_s``
+(lost connection) and intervals where the time does not advance (logger or
+ESP restart resetting its clock) are not integrated and are reported as gaps.
+
+Usage:
+    counter = CoulombCounter(nominal_capacity_Ah=10.0)
+    counter.update(t_s, current_A, voltage_V)      # each sample
+    counter.result()                               # {"capacity_Ah": ..., "soh_pct": ...}
+"""
+import numpy as np
+
+LIVE_MAX_GAP_S = 10.0  # default gap threshold of the live scripts
+
+
+def _result(net_Ah, net_Wh, charge_Ah, discharge_Ah, duration_s, gap_s, n_gaps,
+            sum_I, sum_V, n, nominal_capacity_Ah, initial_soc_pct):
+    result = {
+        "duration_h":     duration_s / 3600.0,
+        "capacity_Ah":    abs(net_Ah),
+        "capacity_Wh":    abs(net_Wh),
+        "mean_current_A": sum_I / n if n else float("nan"),
+        "mean_voltage_V": sum_V / n if n else float("nan"),
+        "net_Ah":         net_Ah,
+        "charge_Ah":      charge_Ah,
+        "discharge_Ah":   discharge_Ah,
+        "gap_h":          gap_s / 3600.0,
+        "n_gaps":         n_gaps,
+    }
+    if nominal_capacity_Ah is not None:
+        result["soh_pct"] = 100.0 * abs(net_Ah) / nominal_capacity_Ah
+        if initial_soc_pct is not None:
+            result["soc_pct"] = initial_soc_pct + 100.0 * net_Ah / nominal_capacity_Ah
+    return result
+
+
+def integrate(t_s, current_A, voltage_V=None, nominal_capacity_Ah=None, initial_soc_pct=None,
+              max_gap_s=None):
+    """
+    Coulomb counting over a whole recorded run.
+
+    Args:
+        t_s (np.ndarray): Sample times in seconds (a backwards jump is a gap).
+        current_A (np.ndarray): Current, negative on discharge.
+        voltage_V (np.ndarray | None): Voltage, for the energy (NaN if omitted).
+        nominal_capacity_Ah (float | None): Rated capacity; adds "soh_pct" (and "soc_pct").
+        initial_soc_pct (float | None): SOC of the first sample; with the nominal
+                                        capacity, adds the coulomb-counted final "soc_pct".
+        max_gap_s (float | None): Intervals longer than this are not integrated.
+
+    Returns:
+        dict: See CoulombCounter.result().
+    """
+    t = np.asarray(t_s, dtype=np.float64)
+    I = np.asarray(current_A, dtype=np.float64)
+    V = np.full(len(I), np.nan) if voltage_V is None else np.asarray(voltage_V, dtype=np.float64)
+
+    dt = np.diff(t)
+    gaps = dt <= 0
+    if max_gap_s is not None:
+        gaps |= dt > max_gap_s
+    dt_h = np.where(gaps, 0.0, dt) / 3600.0
+    P = I * V
+    net_Ah = float(np.sum((I[1:] + I[:-1]) / 2 * dt_h))
+    net_Wh = float(np.sum((P[1:] + P[:-1]) / 2 * dt_h))
+    charge_Ah = float(np.sum((np.maximum(I[1:], 0) + np.maximum(I[:-1], 0)) / 2 * dt_h))
+    discharge_Ah = float(np.sum((np.maximum(-I[1:], 0) + np.maximum(-I[:-1], 0)) / 2 * dt_h))
+    duration_s = float(np.sum(np.maximum(dt, 0.0)))
+    gap_s = float(np.sum(np.maximum(dt[gaps], 0.0)))
+
+    return _result(net_Ah, net_Wh, charge_Ah, discharge_Ah, duration_s, gap_s, int(gaps.sum()),
+                   float(np.sum(I)), float(np.sum(V)), len(I), nominal_capacity_Ah, initial_soc_pct)
+
+
+class CoulombCounter:
+    """Incremental version of integrate(), O(1) per sample."""
+
+    def __init__(self, nominal_capacity_Ah=None, initial_soc_pct=None, max_gap_s=None):
+        """
+        Args:
+            nominal_capacity_Ah (float | None): Rated capacity; adds "soh_pct" (and "soc_pct").
+            initial_soc_pct (float | None): SOC at the first sample (None = no SOC estimate).
+            max_gap_s (float | None): Intervals longer than this are not integrated.
+        """
+        self.nominal_capacity_Ah = nominal_capacity_Ah
+        self.initial_soc_pct = initial_soc_pct
+        self.max_gap_s = max_gap_s
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.net_Ah = self.net_Wh = 0.0
+        self.charge_Ah = self.discharge_Ah = 0.0
+        self.gap_s = 0.0
+        self.n_gaps = 0
+        self.duration_s = 0.0
+        self._sum_I = self._sum_V = 0.0
+        self._prev = None  # (t, I, P)
+
+    def update(self, t_s, current_A, voltage_V=None):
+        """
+        Add a sample.
+
+        Args:
+            t_s (float): Sample time in seconds (e.g. timestamp_ms / 1000).
+            current_A (float): Current, negative on discharge.
+            voltage_V (float | None): Voltage, for the energy.
+        """
+        t, I = float(t_s), float(current_A)
+        V = float("nan") if voltage_V is None else float(voltage_V)
+        P = I * V
+        if self._prev is not None:
+            t_prev, I_prev, P_prev = self._prev
+            dt = t - t_prev
+            self.duration_s += max(dt, 0.0)
+            if dt <= 0 or (self.max_gap_s is not None and dt > self.max_gap_s):
+                self.gap_s += max(dt, 0.0)
+                self.n_gaps += 1
+            else:
+                dt_h = dt / 3600.0
+                self.net_Ah += (I + I_prev) / 2 * dt_h
+                self.net_Wh += (P + P_prev) / 2 * dt_h
+                self.charge_Ah += (max(I, 0.0) + max(I_prev, 0.0)) / 2 * dt_h
+                self.discharge_Ah += (max(-I, 0.0) + max(-I_prev, 0.0)) / 2 * dt_h
+        self._prev = (t, I, P)
+        self.n += 1
+        self._sum_I += I
+        self._sum_V += V
+
+    @property
+    def soc_pct(self):
+        """Coulomb-counted SOC, or None without initial SOC and nominal capacity."""
+        if self.initial_soc_pct is None or self.nominal_capacity_Ah is None:
+            return None
+        return self.initial_soc_pct + 100.0 * self.net_Ah / self.nominal_capacity_Ah
+
+    def result(self):
+        """
+        Returns:
+            dict: duration_h, capacity_Ah / capacity_Wh (absolute net throughput),
+                  mean_current_A, mean_voltage_V, net_Ah (signed), charge_Ah,
+                  discharge_Ah, gap_h, n_gaps, and soh_pct / soc_pct when the
+                  nominal capacity (and initial SOC) are known.
+        """
+        return _result(self.net_Ah, self.net_Wh, self.charge_Ah, self.discharge_Ah, self.duration_s,
+                       self.gap_s, self.n_gaps, self._sum_I, self._sum_V, self.n,
+                       self.nominal_capacity_Ah, self.initial_soc_pct)
@@ -0,0 +1,525 @@
+"""
+Extended Kalman filter SOC estimator on a first-order equivalent circuit model
+(ECM), a physics-based baseline for the MLP.
+
+Pack-level model, SOC as a fraction, current negative on discharge (BMS
+convention), current held constant between samples:
+
+    SOC[k] = SOC[k-1] + I[k-1] * dt / (3600 * Q)
+    Vrc[k] = a * Vrc[k-1] + R1 * (1 - a) * I[k-1]        a = exp(-dt / tau)
+    V[k]   = OCV(SOC[k]) + Vrc[k] + R0 * I[k]
+
+OCV(SOC) is piecewise linear on a uniform SOC grid. fit_ecm() fits the OCV
+points, R0, R1 and tau to recorded runs by linear least squares, with a grid
+search over tau and the BMS SOC as reference. The capacity Q is fitted by
+coulomb counting.
+
+The same filter runs in two modes:
+
+    SOCEKF.step()   live, O(1) per sample on plain floats
+    ekf_filter()    offline, NumPy: the time loop runs once for a whole batch of
+                    runs (2-D arrays, one run per row) and everything that does
+                    not depend on the state is precomputed over the whole run
+
+Usage:
+    python -m soc_estimation.ekf fit dataset/hoverboard_bms_dataset.h5 --output soc_estimation/ecm_params.json
+    python -m soc_estimation.ekf eval dataset/hoverboard_bms_dataset.h5 --params soc_estimation/ecm_params.json
+
+    ekf = SOCEKF(ECMParams.load("soc_estimation/ecm_params.json"), initial_soc_pct=bms_soc)
+    soc_pct = ekf.step(t_s, current_A, voltage_V)      # each sample
+"""
+import argparse
+import json
+import math
+
+import h5py
+import numpy as np
+
+from soc_estimation.coulomb_counter import integrate
+from soc_estimation.metrics import StreamingErrorMetrics
+
+DEFAULT_PARAMS = "soc_estimation/ecm_params.json"
+MAX_GAP_S = 10.0                    # intervals longer than this: no charge integrated, RC relaxes
+TAU_GRID_S = np.geomspace(2.0, 2000.0, 16)
+OCV_POINTS = 21                     # fitted OCV grid points (without an OCV table)
+
+# Filter tuning: process noise per second, measurement noise (V²) and initial covariance
+Q_SOC = 1e-9                        # SOC random walk (current sensor offset / capacity error)
+Q_RC = 1e-6                         # RC voltage [V²/s]
+P0_SOC = 0.05 ** 2                  # initial SOC variance when the initial SOC is given
+P0_SOC_UNKNOWN = 0.2 ** 2           # ... when it is read off the OCV curve
+P0_RC = 0.1 ** 2
+
+
+######################################## MODEL ########################################
+
+class ECMParams:
+    """First-order ECM parameters of a pack."""
+
+    def __init__(self, ocv_V, capacity_Ah, r0_ohm, r1_ohm, tau_s, fit_rmse_V=None, info=None):
+        """
+        Args:
+            ocv_V (array-like): OCV at SOC = 0, 1 / (n - 1), ..., 1.
+            capacity_Ah (float): Capacity Q.
+            r0_ohm (float): Series resistance.
+            r1_ohm (float): RC branch resistance.
+            tau_s (float): RC time constant (R1 * C1).
+            fit_rmse_V (float | None): Voltage RMSE of the fit (default measurement noise).
+            info (dict | None): Fit metadata (runs, sample count, ...).
+        """
+        self.ocv_V = np.asarray(ocv_V, dtype=np.float64)
+        self.capacity_Ah = float(capacity_Ah)
+        self.r0_ohm = float(r0_ohm)
+        self.r1_ohm = float(r1_ohm)
+        self.tau_s = float(tau_s)
+        self.fit_rmse_V = fit_rmse_V
+        self.info = info or {}
+        self._slope = np.diff(self.ocv_V) * (len(self.ocv_V) - 1)  # dOCV / dSOC per segment
+
+    def ocv(self, soc):
+        """
+        OCV and its slope at ``soc`` (fraction, clipped to [0, 1]).
+
+        Returns:
+            tuple: (OCV [V], dOCV/dSOC [V]), scalars or arrays like ``soc``.
+        """
+        n = len(self.ocv_V) - 1
+        pos = np.clip(soc, 0.0, 1.0) * n
+        idx = np.minimum(np.floor(pos).astype(np.int64), n - 1)
+        return self.ocv_V[idx] + self._slope[idx] * (pos - idx) / n, self._slope[idx]
+
+    def soc_from_ocv(self, ocv_V):
+        """SOC (fraction) whose OCV is ``ocv_V``; the OCV curve is made monotonic first."""
+        curve = np.maximum.accumulate(self.ocv_V)
+        return np.interp(ocv_V, curve, np.linspace(0.0, 1.0, len(curve)))
+
+    def to_dict(self):
+        return {"ocv_V": self.ocv_V.tolist(), "capacity_Ah": self.capacity_Ah, "r0_ohm": self.r0_ohm,
+                "r1_ohm": self.r1_ohm, "tau_s": self.tau_s, "fit_rmse_V": self.fit_rmse_V, "info": self.info}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _steps(t_s, current_A, max_gap_s):
+    """dt and the current held over each interval (0 over gaps), per sample (first = 0)."""
+    t = np.asarray(t_s, dtype=np.float64)
+    I = np.asarray(current_A, dtype=np.float64)
+    dt = np.zeros_like(t)
+    dt[..., 1:] = np.diff(t, axis=-1)
+    u = np.zeros_like(I)
+    u[..., 1:] = I[..., :-1]
+    if max_gap_s is not None:
+        u[dt > max_gap_s] = 0.0
+    return dt, u
+
+
+def rc_response(t_s, current_A, tau_s, max_gap_s=MAX_GAP_S):
+    """
+    Voltage of an RC branch with R1 = 1 Ohm over a whole run, starting at rest.
+
+    The recursion x[k] = a[k] x[k-1] + (1 - a[k]) u[k] is evaluated in closed
+    form (cumulative decay and cumsum) in blocks short enough for exp() not to
+    overflow, so a run costs a few vectorized passes.
+
+    Args:
+        t_s (np.ndarray): Sample times in seconds.
+        current_A (np.ndarray): Current.
+        tau_s (float): Time constant.
+        max_gap_s (float | None): No current is applied over longer intervals.
+
+    Returns:
+        np.ndarray: RC voltage per sample for R1 = 1 (multiply by R1).
+    """
+    dt, u = _steps(t_s, current_A, max_gap_s)
+    decay = dt / tau_s
+    b = -np.expm1(-decay) * u
+    c = np.cumsum(decay)
+    out = np.empty_like(b)
+    x_prev, start, n = 0.0, 0, len(b)
+    while start < n:
+        # c[k] - c[start] <= 600 inside a block, so exp(+-(c - c[start])) stays finite
+        stop = max(int(np.searchsorted(c, c[start] + 600.0, side="right")), start + 1)
+        d = c[start:stop] - c[start]
+        out[start:stop] = np.exp(-d) * (x_prev * math.exp(-decay[start]) + np.cumsum(b[start:stop] * np.exp(d)))
+        x_prev, start = out[stop - 1], stop
+    return out
+
+
+######################################## FIT ########################################
+
+def read_run(h5_file, run_name):
+    """
+    Signals of a recorded run needed by the ECM.
+
+    Returns:
+        dict: t_s, current_A, voltage_V, soc_pct (BMS) as float64 arrays.
+    """
+    with h5py.File(h5_file, "r") as f:
+        g = f[run_name]
+        return {
+            "t_s": g["timestamp_ms"][:].astype(np.float64) / 1000.0,
+            "current_A": g["bms/current"][:].astype(np.float64),
+            "voltage_V": g["bms/voltage"][:].astype(np.float64),
+            "soc_pct": g["bms/battery_level"][:].astype(np.float64),
+        }
+
+
+def _hat_basis(soc, n_points):
+    """Piecewise-linear interpolation weights of ``soc`` on the uniform OCV grid, shape (len(soc), n_points)."""
+    n = n_points - 1
+    pos = np.clip(soc, 0.0, 1.0) * n
+    idx = np.minimum(np.floor(pos).astype(np.int64), n - 1)
+    frac = pos - idx
+    basis = np.zeros((len(soc), n_points))
+    rows = np.arange(len(soc))
+    basis[rows, idx] = 1.0 - frac
+    basis[rows, idx + 1] = frac
+    return basis
+
+
+def fit_capacity(runs, max_gap_s=MAX_GAP_S):
+    """Capacity in Ah: coulomb-counted charge over the BMS SOC change, pooled over runs."""
+    net_Ah = d_soc = 0.0
+    for run in runs:
+        result = integrate(run["t_s"], run["current_A"], max_gap_s=max_gap_s)
+        net_Ah += abs(result["net_Ah"])
+        d_soc += abs(run["soc_pct"][-1] - run["soc_pct"][0]) / 100.0
+    if d_soc == 0:
+        raise ValueError("SOC does not change over the runs, cannot fit the capacity")
+    return net_Ah / d_soc
+
+
+def fit_ecm(runs, capacity_Ah=None, n_points=None, taus=TAU_GRID_S, smoothing=1e-3, max_gap_s=MAX_GAP_S,
+            ocv_table=None):
+    """
+    Fit ECM parameters to recorded runs.
+
+    For each tau of the grid, V = OCV(SOC_bms) + R0 * I + R1 * rc_response(I, tau)
+    is linear in the OCV points, R0 and R1 and is solved by least squares over
+    all runs (with a second-difference penalty so that SOC ranges without data
+    are interpolated); the tau with the lowest residual is kept. With an OCV
+    table (soc_estimation/ocv_table.py) the OCV points are taken from it and
+    only R0, R1 and tau are fitted.
+
+    Args:
+        runs (list[dict]): Runs as returned by read_run().
+        capacity_Ah (float | None): Capacity; fitted by coulomb counting if None.
+        n_points (int | None): OCV grid points over SOC 0..1 (default: the points of
+                               ocv_table, so the filter uses the OCV the resistances
+                               were fitted with; OCV_POINTS without a table).
+        taus (array-like): Time constants to try, in seconds.
+        smoothing (float): Weight of the OCV curvature penalty (relative to the sample count).
+        max_gap_s (float | None): Gap threshold, see MAX_GAP_S.
+        ocv_table (OCVTable | None): Measured OCV curve to use instead of fitting one.
+
+    Returns:
+        ECMParams: Fitted parameters.
+    """
+    if capacity_Ah is None:
+        capacity_Ah = fit_capacity(runs, max_gap_s)
+    if n_points is None:
+        n_points = len(ocv_table.pack_V) if ocv_table is not None else OCV_POINTS
+
+    soc = np.concatenate([r["soc_pct"] for r in runs]) / 100.0
+    I = np.concatenate([r["current_A"] for r in runs])
+    V = np.concatenate([r["voltage_V"] for r in runs])
+    rows = slice(None)
+    if ocv_table is not None:
+        # Fixed OCV: fit the overpotential V - OCV(SOC) only, where the table was measured
+        lo, hi = ocv_table.info.get("soc_range_pct", (0.0, 100.0))
+        rows = (soc * 100.0 >= lo) & (soc * 100.0 <= hi)
+        soc, I, V = soc[rows], I[rows], V[rows]
+        ocv_V = ocv_table.pack(np.linspace(0.0, 100.0, n_points))
+        basis = np.zeros((len(V), 0))
+        y = V - ocv_table.pack(soc * 100.0)
+        penalty = np.zeros((0, 2))
+    else:
+        basis = _hat_basis(soc, n_points)
+        y = V
+        # Curvature penalty on the OCV points (no penalty on R0 / R1)
+        d2 = np.diff(np.eye(n_points), n=2, axis=0)
+        penalty = np.hstack([d2, np.zeros((n_points - 2, 2))]) * math.sqrt(smoothing * len(V))
+    y_penalized = np.concatenate([y, np.zeros(len(penalty))])
+
+    best = None
+    for tau in taus:
+        rc = np.concatenate([rc_response(r["t_s"], r["current_A"], tau, max_gap_s) for r in runs])[rows]
+        A = np.vstack([np.column_stack([basis, I, rc]), penalty])
+        coef = np.linalg.lstsq(A, y_penalized, rcond=None)[0]
+        rmse = float(np.sqrt(np.mean((A[:len(V)] @ coef - y) ** 2)))
+        if best is None or rmse < best[0]:
+            best = (rmse, tau, coef)
+
+    rmse, tau, coef = best
+    if ocv_table is None:
+        ocv_V, coef = coef[:n_points], coef[n_points:]
+    return ECMParams(ocv_V=ocv_V, capacity_Ah=capacity_Ah, r0_ohm=coef[0], r1_ohm=coef[1], tau_s=tau,
+                     fit_rmse_V=rmse, info={"n_runs": len(runs), "n_samples": int(len(V)),
+                                            "ocv": "table" if ocv_table is not None else "fitted"})
+
+
+######################################## FILTER ########################################
+
+class SOCEKF:
+    """Live EKF, O(1) per sample."""
+
+    def __init__(self, params, initial_soc_pct=None, q_soc=Q_SOC, q_rc=Q_RC, r=None, max_gap_s=MAX_GAP_S):
+        """
+        Args:
+            params (ECMParams): Model parameters.
+            initial_soc_pct (float | None): Initial SOC (e.g. BMS); read off the OCV
+                                            curve at the first sample if None.
+            q_soc (float): SOC process noise per second.
+            q_rc (float): RC voltage process noise per second [V²/s].
+            r (float | None): Voltage measurement noise [V²] (default: fit RMSE²).
+            max_gap_s (float | None): No charge is integrated over longer intervals.
+        """
+        self.params = params
+        self.initial_soc_pct = initial_soc_pct
+        self.q_soc, self.q_rc = q_soc, q_rc
+        self.r = r if r is not None else max(params.fit_rmse_V or 0.0, 1e-3) ** 2
+        self.max_gap_s = max_gap_s
+        self.reset()
+
+    def reset(self):
+        self.soc = None           # fraction
+        self.v_rc = 0.0
+        self.P = None             # [P00, P01, P11]
+        self._prev = None         # (t, I)
+
+    @property
+    def soc_pct(self):
+        return None if self.soc is None else self.soc * 100.0
+
+    @property
+    def soc_std_pct(self):
+        return None if self.P is None else math.sqrt(max(self.P[0], 0.0)) * 100.0
+
+    def step(self, t_s, current_A, voltage_V):
+        """
+        Add a sample.
+
+        Args:
+            t_s (float): Sample time in seconds.
+            current_A (float): Current, negative on discharge.
+            voltage_V (float): Pack voltage.
+
+        Returns:
+            float: Estimated SOC in %.
+        """
+        p = self.params
+        t, I, V = float(t_s), float(current_A), float(voltage_V)
+        if self._prev is None:
+            if self.initial_soc_pct is not None:
+                self.soc, p00 = self.initial_soc_pct / 100.0, P0_SOC
+            else:
+                self.soc, p00 = float(p.soc_from_ocv(V - p.r0_ohm * I)), P0_SOC_UNKNOWN
+            self.P = [p00, 0.0, P0_RC]
+        else:
+            # Predict over the interval with the previous current
+            t_prev, I_prev = self._prev
+            dt = t - t_prev
+            u = 0.0 if self.max_gap_s is not None and dt > self.max_gap_s else I_prev
+            a = math.exp(-dt / p.tau_s)
+            self.soc += u * dt / (3600.0 * p.capacity_Ah)
+            self.v_rc = a * self.v_rc + p.r1_ohm * (1.0 - a) * u
+            P00, P01, P11 = self.P
+            self.P = [P00 + self.q_soc * dt, a * P01, a * a * P11 + self.q_rc * dt]
+        self._prev = (t, I)
+
+        # Update with the measured voltage
+        ocv, slope = p.ocv(self.soc)
+        residual = V - (float(ocv) + self.v_rc + p.r0_ohm * I)
+        H0 = float(slope)
+        P00, P01, P11 = self.P
+        S = H0 * H0 * P00 + 2.0 * H0 * P01 + P11 + self.r
+        K0 = (H0 * P00 + P01) / S
+        K1 = (H0 * P01 + P11) / S
+        self.soc += K0 * residual
+        self.v_rc += K1 * residual
+        self.P = [P00 - K0 * K0 * S, P01 - K0 * K1 * S, P11 - K1 * K1 * S]
+        return self.soc * 100.0
+
+
+def ekf_filter(t_s, current_A, voltage_V, params, initial_soc_pct=None, q_soc=Q_SOC, q_rc=Q_RC,
+               r=None, max_gap_s=MAX_GAP_S):
+    """
+    Run the EKF over whole runs; same results as SOCEKF.step() sample by sample.
+
+    Args:
+        t_s (np.ndarray): Sample times in seconds, shape (n,) or (n_runs, n);
+                          shorter runs are padded with NaN at the end.
+        current_A (np.ndarray): Current, same shape.
+        voltage_V (np.ndarray): Voltage, same shape.
+        params (ECMParams): Model parameters.
+        initial_soc_pct (float | np.ndarray | None): Initial SOC per run, or None
+                                                     to read it off the OCV curve.
+        q_soc, q_rc, r, max_gap_s: See SOCEKF.
+
+    Returns:
+        dict: "soc_pct", "soc_std_pct" and "residual_V" (measured - model voltage)
+              with the shape of the inputs, NaN on padding.
+    """
+    t = np.atleast_2d(np.asarray(t_s, dtype=np.float64))
+    I = np.atleast_2d(np.asarray(current_A, dtype=np.float64))
+    V = np.atleast_2d(np.asarray(voltage_V, dtype=np.float64))
+    valid = ~(np.isnan(t) | np.isnan(I) | np.isnan(V))
+    r = r if r is not None else max(params.fit_rmse_V or 0.0, 1e-3) ** 2
+
+    # State-independent terms for every step at once. Padding steps become no-ops:
+    # no decay or charge in the prediction, zero gain in the update.
+    dt, u = _steps(np.nan_to_num(t), np.nan_to_num(I), max_gap_s)
+    dt[~valid] = 0.0
+    a = np.exp(-dt / params.tau_s)
+    a2 = a * a
+    d_soc = u * dt / (3600.0 * params.capacity_Ah)
+    d_rc = params.r1_ohm * (1.0 - a) * u
+    q00, q11 = q_soc * dt, q_rc * dt
+    v_r0 = np.where(valid, V - params.r0_ohm * I, 0.0)   # measured voltage minus the R0 drop
+    gain = valid.astype(np.float64)
+
+    if initial_soc_pct is None:
+        soc = params.soc_from_ocv(v_r0[:, 0])
+        P00 = np.full(len(t), P0_SOC_UNKNOWN)
+    else:
+        soc = np.broadcast_to(np.asarray(initial_soc_pct, dtype=np.float64) / 100.0, (len(t),)).copy()
+        P00 = np.full(len(t), P0_SOC)
+    v_rc = np.zeros(len(t))
+    P01 = np.zeros(len(t))
+    P11 = np.full(len(t), P0_RC)
+
+    # Time-major copies so each step reads contiguous rows
+    a, a2, d_soc, d_rc, q00, q11, v_r0, gain = (np.ascontiguousarray(x.T) for x in
+                                                 (a, a2, d_soc, d_rc, q00, q11, v_r0, gain))
+    ocv_V, slope, n_seg = params.ocv_V, params._slope, len(params.ocv_V) - 1
+    out_soc = np.empty(t.shape[::-1])
+    out_P00 = np.empty(t.shape[::-1])
+    out_res = np.empty(t.shape[::-1])
+    for k in range(t.shape[1]):
+        if k > 0:
+            soc += d_soc[k]
+            v_rc = a[k] * v_rc + d_rc[k]
+            P00 = P00 + q00[k]
+            P01 = a[k] * P01
+            P11 = a2[k] * P11 + q11[k]
+
+        # OCV lookup (ECMParams.ocv inlined)
+        pos = np.clip(soc, 0.0, 1.0) * n_seg
+        idx = np.minimum(pos.astype(np.int64), n_seg - 1)
+        H0 = slope[idx]
+        residual = v_r0[k] - (ocv_V[idx] + H0 * (pos - idx) / n_seg) - v_rc
+        S = H0 * H0 * P00 + 2.0 * H0 * P01 + P11 + r
+        K0 = gain[k] * (H0 * P00 + P01) / S
+        K1 = gain[k] * (H0 * P01 + P11) / S
+        soc += K0 * residual
+        v_rc += K1 * residual
+        P00, P01, P11 = P00 - K0 * K0 * S, P01 - K0 * K1 * S, P11 - K1 * K1 * S
+
+        out_soc[k] = soc
+        out_P00[k] = P00
+        out_res[k] = residual
+
+    out_soc, out_P00, out_res = out_soc.T, out_P00.T, out_res.T
+    out_soc = np.where(valid, out_soc * 100.0, np.nan)
+    out_std = np.where(valid, np.sqrt(np.maximum(out_P00, 0.0)) * 100.0, np.nan)
+    out_res = np.where(valid, out_res, np.nan)
+    shape = np.shape(t_s)
+    return {"soc_pct": out_soc.reshape(shape), "soc_std_pct": out_std.reshape(shape),
+            "residual_V": out_res.reshape(shape)}
+
+
+def filter_runs(runs, params, use_initial_soc=True, **kwargs):
+    """
+    Run the EKF over several runs in one batch.
+
+    Args:
+        runs (list[dict]): Runs as returned by read_run().
+        params (ECMParams): Model parameters.
+        use_initial_soc (bool): Start from the first BMS SOC of each run
+                                (otherwise from the OCV curve).
+        **kwargs: Filter tuning, see ekf_filter().
+
+    Returns:
+        list[dict]: Per run, ekf_filter() outputs as 1-D arrays.
+    """
+    n = max(len(r["t_s"]) for r in runs)
+
+    def pad(key):
+        out = np.full((len(runs), n), np.nan)
+        for i, r in enumerate(runs):
+            out[i, :len(r[key])] = r[key]
+        return out
+
+    soc0 = np.array([r["soc_pct"][0] for r in runs]) if use_initial_soc else None
+    result = ekf_filter(pad("t_s"), pad("current_A"), pad("voltage_V"), params, soc0, **kwargs)
+    return [{key: values[i, :len(r["t_s"])] for key, values in result.items()} for i, r in enumerate(runs)]
+
+
+def evaluate(runs, params, **kwargs):
+    """
+    EKF SOC against the BMS SOC, per run and pooled.
+
+    Returns:
+        dict: run index -> StreamingErrorMetrics result, plus "pooled".
+    """
+    pooled = StreamingErrorMetrics()
+    results = {}
+    for i, (run, out) in enumerate(zip(runs, filter_runs(runs, params, **kwargs))):
+        metrics = StreamingErrorMetrics()
+        metrics.update(run["soc_pct"], out["soc_pct"])
+        results[i] = metrics.result()
+        pooled.merge(metrics)
+    results["pooled"] = pooled.result()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and evaluate the ECM / EKF SOC estimator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_fit = sub.add_parser("fit", help="Fit ECM parameters to recorded runs")
+    p_eval = sub.add_parser("eval", help="Compare the EKF SOC with the BMS SOC")
+    for p in (p_fit, p_eval):
+        p.add_argument("input", help="Path to H5 file")
+        p.add_argument("--runs", nargs="+", default=None, help="Runs to use (default: all)")
+    p_fit.add_argument("--output", default=DEFAULT_PARAMS, help=f"Parameter file (default: {DEFAULT_PARAMS})")
+    p_fit.add_argument("--capacity", type=float, default=None, help="Capacity in Ah (default: fitted)")
+    p_fit.add_argument("--points", type=int, default=None,
+                       help=f"OCV grid points (default: those of --ocv-table, else {OCV_POINTS})")
+    p_fit.add_argument("--ocv-table", default=None, help="OCV table (soc_estimation/ocv_table.py) instead of a fitted OCV")
+    p_eval.add_argument("--params", default=DEFAULT_PARAMS, help=f"Parameter file (default: {DEFAULT_PARAMS})")
+    p_eval.add_argument("--from-ocv", action="store_true", help="Initial SOC from the OCV curve, not the BMS")
+    args = parser.parse_args()
+
+    if args.runs is None:
+        with h5py.File(args.input, "r") as f:
+            args.runs = [name for name in f if "bms" in f[name] and "timestamp_ms" in f[name]]
+    data = [read_run(args.input, name) for name in args.runs]
+
+    if args.command == "fit":
+        table = None
+        if args.ocv_table:
+            from soc_estimation.ocv_table import OCVTable
+            table = OCVTable.load(args.ocv_table)
+        ecm = fit_ecm(data, capacity_Ah=args.capacity, n_points=args.points, ocv_table=table)
+        ecm.info["runs"] = args.runs
+        ecm.save(args.output)
+        print(f"Capacity {ecm.capacity_Ah:.3f} Ah, R0 {ecm.r0_ohm * 1000:.1f} mOhm, "
+              f"R1 {ecm.r1_ohm * 1000:.1f} mOhm, tau {ecm.tau_s:.1f} s, fit RMSE {ecm.fit_rmse_V * 1000:.1f} mV")
+        print(f"Saved ECM parameters to {args.output}")
+    else:
+        ecm = ECMParams.load(args.params)
+        results = evaluate(data, ecm, use_initial_soc=not args.from_ocv)
+        for key, m in results.items():
+            label = "pooled" if key == "pooled" else args.runs[key]
+            print(f"{label:40s} MAE {m['mae']:.3f} %  RMSE {m['rmse']:.3f} %  max {m['max_abs_error']:.3f} %")
@@ -0,0 +1,249 @@
+"""
+Feature definitions shared by offline analysis / training and the live predictor.
+
+Each feature is defined once and runs in two modes:
+
+    batch(data)    vectorized over a whole run (dict or DataFrame of columns)
+    step(sample)   one new sample at a time, O(1) with rolling state
+
+so a model trained on engineered features can be served live with the same
+definitions. Input column names follow the HDF5 exporters ("timestamp_ms",
+"bms/voltage", "bms/cell_voltages", ...). 2-D signals can be given either as
+an (N, k) array or as exported columns "bms/cell_voltages_0", ... .
+
+Usage:
+    pipeline = FeaturePipeline.from_names(["Voltage [V]", "Current [A]", "dV_pack_dt"])
+    X = pipeline.transform(df)                 # offline, DataFrame of features
+    x = pipeline.step(flatten_sample(row))     # live, one value per feature
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+TIME_COLUMN = "timestamp_ms"
+
+
+def flatten_sample(row):
+    """
+    Flatten an acquisition row {"timestamp_ms": ..., "bms": {...}, "hoverboard": {...}}
+    into {"timestamp_ms": ..., "bms/voltage": ..., ...}.
+    """
+    sample = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            for name, v in value.items():
+                sample[f"{key}/{name}"] = v
+        else:
+            sample[key] = value
+    return sample
+
+
+def get_column(data, name):
+    """Return column ``name`` of ``data`` as an array, stacking "<name>_<i>" columns for 2-D signals."""
+    if name in data:
+        return np.asarray(data[name], dtype=np.float64)
+    parts = []
+    while f"{name}_{len(parts)}" in data:
+        parts.append(np.asarray(data[f"{name}_{len(parts)}"], dtype=np.float64))
+    if not parts:
+        raise KeyError(f"Column '{name}' not found")
+    return np.column_stack(parts)
+
+
+######################################## FEATURES ########################################
+
+class Feature:
+    """Base class: ``batch`` and ``step`` must give the same values for the same samples."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def batch(self, data) -> np.ndarray:
+        raise NotImplementedError
+
+    def step(self, sample) -> float:
+        raise NotImplementedError
+
+    def reset(self):
+        """Clear rolling state (new run)."""
+
+
+class Raw(Feature):
+    """A signal, optionally scaled (e.g. battery_level / 100)."""
+
+    def __init__(self, name, column, scale=1.0):
+        super().__init__(name)
+        self.column = column
+        self.scale = scale
+
+    def batch(self, data):
+        return get_column(data, self.column) * self.scale
+
+    def step(self, sample):
+        return float(sample[self.column]) * self.scale
+
+
+class RowStat(Feature):
+    """Statistic across the columns of a 2-D signal (e.g. mean cell voltage)."""
+    FUNCS = {
+        "mean": lambda a: np.mean(a, axis=-1),
+        "min": lambda a: np.min(a, axis=-1),
+        "max": lambda a: np.max(a, axis=-1),
+        "std": lambda a: np.std(a, axis=-1, ddof=1),  # same as pandas .std(axis=1)
+        "spread": lambda a: np.max(a, axis=-1) - np.min(a, axis=-1),
+    }
+
+    def __init__(self, name, column, stat):
+        super().__init__(name)
+        self.column = column
+        self.func = self.FUNCS[stat]
+
+    def batch(self, data):
+        return self.func(get_column(data, self.column))
+
+    def step(self, sample):
+        return float(self.func(np.asarray(sample[self.column], dtype=np.float64)))
+
+
+class Derivative(Feature):
+    """Rate of change per second, d(column)/dt, NaN for the first sample."""
+
+    def __init__(self, name, column):
+        super().__init__(name)
+        self.column = column
+        self.reset()
+
+    def reset(self):
+        self._prev = None
+
+    def batch(self, data):
+        x = get_column(data, self.column)
+        t = get_column(data, TIME_COLUMN) / 1000.0
+        out = np.full(len(x), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[1:] = np.diff(x) / np.diff(t)
+        return out
+
+    def step(self, sample):
+        x, t = float(sample[self.column]), float(sample[TIME_COLUMN]) / 1000.0
+        prev, self._prev = self._prev, (x, t)
+        if prev is None:
+            return np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(np.float64(x - prev[0]) / np.float64(t - prev[1]))
+
+
+class RollingMean(Feature):
+    """Mean of the last ``window`` samples (fewer at the start of a run)."""
+
+    def __init__(self, name, column, window):
+        super().__init__(name)
+        self.column = column
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._values = deque(maxlen=self.window)
+        self._sum = 0.0
+
+    def batch(self, data):
+        x = get_column(data, self.column)
+        return pd.Series(x).rolling(self.window, min_periods=1).mean().to_numpy()
+
+    def step(self, sample):
+        x = float(sample[self.column])
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(x)
+        self._sum += x
+        return self._sum / len(self._values)
+
+
+class Elapsed(Feature):
+    """Seconds since the first sample of the run."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.reset()
+
+    def reset(self):
+        self._t0 = None
+
+    def batch(self, data):
+        t = get_column(data, TIME_COLUMN) / 1000.0
+        return t - t[0] if len(t) else t
+
+    def step(self, sample):
+        t = float(sample[TIME_COLUMN]) / 1000.0
+        if self._t0 is None:
+            self._t0 = t
+        return t - self._t0
+
+
+# Named features available to models and analysis scripts
+FEATURES = {
+    "Voltage [V]":          lambda: Raw("Voltage [V]", "bms/voltage"),
+    "Current [A]":          lambda: Raw("Current [A]", "bms/current"),
+    "Power [W]":            lambda: Raw("Power [W]", "bms/power"),
+    "Temperature [degC]":   lambda: RowStat("Temperature [degC]", "bms/temp_values", "mean"),
+    "Cycle Charge [Ah]":    lambda: Raw("Cycle Charge [Ah]", "bms/cycle_charge"),
+    "Cycle Capacity [Wh]":  lambda: Raw("Cycle Capacity [Wh]", "bms/cycle_capacity"),
+    "SOC [-]":              lambda: Raw("SOC [-]", "bms/battery_level", scale=0.01),
+    "V_cell_mean":          lambda: RowStat("V_cell_mean", "bms/cell_voltages", "mean"),
+    "V_cell_min":           lambda: RowStat("V_cell_min", "bms/cell_voltages", "min"),
+    "V_cell_max":           lambda: RowStat("V_cell_max", "bms/cell_voltages", "max"),
+    "V_cell_std":           lambda: RowStat("V_cell_std", "bms/cell_voltages", "std"),
+    "V_cell_spread":        lambda: RowStat("V_cell_spread", "bms/cell_voltages", "spread"),
+    "time_s":               lambda: Elapsed("time_s"),
+    "dV_pack_dt":           lambda: Derivative("dV_pack_dt", "bms/voltage"),
+    "dI_pack_dt":           lambda: Derivative("dI_pack_dt", "bms/current"),
+    "dSOC_dt":              lambda: Derivative("dSOC_dt", "bms/battery_level"),
+    "I_mean_10":            lambda: RollingMean("I_mean_10", "bms/current", 10),
+    "V_mean_10":            lambda: RollingMean("V_mean_10", "bms/voltage", 10),
+}
+
+######################################## PIPELINE ########################################
+
+class FeaturePipeline:
+    def __init__(self, features):
+        """
+        Args:
+            features (list[Feature]): Features, in model input order.
+        """
+        self.features = list(features)
+        self.names = [f.name for f in self.features]
+
+    @classmethod
+    def from_names(cls, names):
+        """Build a pipeline from names of FEATURES."""
+        unknown = [n for n in names if n not in FEATURES]
+        if unknown:
+            raise KeyError(f"Unknown features {unknown}, available: {sorted(FEATURES)}")
+        return cls([FEATURES[n]() for n in names])
+
+    def transform(self, data) -> pd.DataFrame:
+        """
+        Compute all features over a whole run.
+
+        Args:
+            data (pd.DataFrame | dict): Run columns.
+
+        Returns:
+            pd.DataFrame: One column per feature (index of ``data`` if it is a DataFrame).
+        """
+        index = data.index if isinstance(data, pd.DataFrame) else None
+        return pd.DataFrame({f.name: f.batch(data) for f in self.features}, index=index)
+
+    def step(self, sample) -> np.ndarray:
+        """
+        Compute all features for one new sample (see flatten_sample()).
+
+        Returns:
+            np.ndarray: Feature values, in pipeline order.
+        """
+        return np.array([f.step(sample) for f in self.features], dtype=np.float64)
+
+    def reset(self):
+        for f in self.features:
+            f.reset()
@@ -0,0 +1,86 @@
+"""
+Streaming SOC error metrics.
+
+StreamingErrorMetrics keeps running sums (and a Welford mean / M2 of the true
+values for R²), so MAE, RMSE, R², bias and max error are available at any time
+in O(1) memory, and accumulators of different runs or workers can be merged.
+
+Usage:
+    metrics = StreamingErrorMetrics()
+    metrics.update(bms_soc, predicted_soc)     # scalars or arrays
+    metrics.result()                           # {"r2": ..., "mae": ..., "rmse": ...}
+"""
+import numpy as np
+
+# Keys of result(), same names as plotting_scripts/esp_csv_analysis.soc_metrics
+METRIC_KEYS = ("n_samples", "r2", "mae", "mse", "rmse", "mean_error", "max_abs_error")
+
+
+class StreamingErrorMetrics:
+    def __init__(self):
+        self.n = 0
+        self.sum_error = 0.0      # sum of (pred - true)
+        self.sum_abs_error = 0.0
+        self.sum_sq_error = 0.0
+        self.max_abs_error = 0.0
+        self.mean_true = 0.0      # Welford mean / M2 of the true values (total sum of squares)
+        self.m2_true = 0.0
+
+    def update(self, y_true, y_pred):
+        """
+        Add samples; pairs with a NaN on either side are skipped.
+
+        Args:
+            y_true (float | np.ndarray): Reference SOC (e.g. BMS).
+            y_pred (float | np.ndarray): Predicted SOC.
+        """
+        y_true = np.atleast_1d(np.asarray(y_true, dtype=np.float64))
+        y_pred = np.atleast_1d(np.asarray(y_pred, dtype=np.float64))
+        valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+        y_true, y_pred = y_true[valid], y_pred[valid]
+        if len(y_true) == 0:
+            return
+        other = StreamingErrorMetrics()
+        error = y_pred - y_true
+        other.n = len(error)
+        other.sum_error = float(error.sum())
+        other.sum_abs_error = float(np.abs(error).sum())
+        other.sum_sq_error = float((error ** 2).sum())
+        other.max_abs_error = float(np.abs(error).max())
+        other.mean_true = float(y_true.mean())
+        other.m2_true = float(((y_true - other.mean_true) ** 2).sum())
+        self.merge(other)
+
+    def merge(self, other):
+        """Combine with another accumulator (e.g. from another run)."""
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean_true - self.mean_true
+        self.m2_true += other.m2_true + delta ** 2 * self.n * other.n / n
+        self.mean_true += delta * other.n / n
+        self.n = n
+        self.sum_error += other.sum_error
+        self.sum_abs_error += other.sum_abs_error
+        self.sum_sq_error += other.sum_sq_error
+        self.max_abs_error = max(self.max_abs_error, other.max_abs_error)
+        return self
+
+    def result(self):
+        """
+        Returns:
+            dict: METRIC_KEYS; NaN while there are no samples (R² also NaN
+                  while the true values are constant).
+        """
+        if self.n == 0:
+            return {key: (0 if key == "n_samples" else float("nan")) for key in METRIC_KEYS}
+        mse = self.sum_sq_error / self.n
+        return {
+            "n_samples":     self.n,
+            "r2":            1.0 - self.sum_sq_error / self.m2_true if self.m2_true > 0 else float("nan"),
+            "mae":           self.sum_abs_error / self.n,
+            "mse":           mse,
+            "rmse":          float(np.sqrt(mse)),
+            "mean_error":    self.sum_error / self.n,
+            "max_abs_error": self.max_abs_error,
+        }
@@ -68,7 +68,9 @@ class ModelManager:
             self.model.load_state_dict(torch.load(path, map_location=self.device))
             print(f"Model weights loaded successfully from {path}")
         except Exception as e:
+            # A model left with random weights must not be used for predictions
             print(f"Error loading model weights from {path}: {e}")
+            raise
 
     def train(self, loader):
         self.model.train()
@@ -1,6 +1,8 @@
 import torch
 from soc_estimation.mlp.mlp import MLP_SOC, ModelManager
+from soc_estimation.model_registry import ModelRegistry
 from soc_estimation.dataset_manager import DatasetManager
+from dataset.run_catalog import RunCatalog
 from sklearn.preprocessing import StandardScaler
 import h5py
 import pandas as pd
@@ -22,19 +24,48 @@ class TensorPairDataset(Dataset):
 data_path = r'C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\all_data\h5_files\hoverboard_bms_dataset_combined2.h5'
 # Output model and scalar save path
 save_path = r'C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\soc_estimation\mlp\outputs'
+# Run catalog (built / updated from data_path)
+catalog_path = r'C:\Users\assas\Desktop\NU\Experimental Setup\ev-bms-data-acquisition\dataset\run_catalog.sqlite'
 
-try:
-    with h5py.File(data_path, 'r') as f:
-        # List all groups
-        print("Keys in the h5 file:", list(f.keys()))
-except Exception as e:
-    print(f"Error loading file: {e}")
+train_runs = [
+    'file1_run_001',
+    'file1_run_002',
+    'file1_run_003',
+    'file1_run_004',
+    'file1_run_005',
+    'file2_run_001_40pct_speed_15kg_load_discharge',
+    'file2_run_002_40pct_speed_15kg_load_discharge',
+    'file2_run_003_charge',
+    'file2_run_009_40pct_speed_25kg_load_discharge',
+    'file2_run_010_80pct_speed_25kg_load_discharge',
+    'file2_run_011_80pct_speed_25kg_load_discharge',
+    'file2_run_012_80pct_speed_25kg_load_discharge',
+    'file2_run_013_80pct_speed_25kg_load_discharge',
+    'file2_run_014_charge',
+]
+
+val_runs = [
+    'file2_run_004_80pct_speed_15kg_load_discharge',
+    'file2_run_005_charge',
+    'file2_run_006_60pct_speed_15kg_load_discharge',
+    'file2_run_007_60pct_speed_15kg_load_discharge',
+    'file2_run_008_charge',
+    'file3_run_003_speed_profile_1'
+]
+
+# Check the run lists against the run catalog (re-indexes the file only if it changed)
+with RunCatalog(catalog_path) as catalog:
+    catalog.scan([data_path])
+    run_records = catalog.require(train_runs + val_runs, file=data_path)
+print(f"Selected {len(run_records)} runs: "
+      f"{sum(r['n_samples'] for r in run_records)} samples, "
+      f"{sum(r['duration_s'] for r in run_records) / 3600:.1f} h")
 
 raw_data_list = []
 
-# Open the HDF5 file
+# Open the HDF5 file, reading only the selected runs
 with h5py.File(data_path, 'r') as f:
-    for run_name in f.keys():
+    for run_name in train_runs + val_runs:
         run_group = f[run_name]
 
         # Access bms group and extract specific datasets as numpy arrays
@@ -101,32 +132,6 @@ bms_df['Temperature [degC]'] = bms_df[['temp_1', 'temp_2', 'temp_3']].mean(axis=
 # Check head of the DataFrame
 print(bms_df.head())
 
-train_runs = [
-    'file1_run_001',
-    'file1_run_002',
-    'file1_run_003',
-    'file1_run_004',
-    'file1_run_005',
-    'file2_run_001_40pct_speed_15kg_load_discharge',
-    'file2_run_002_40pct_speed_15kg_load_discharge',
-    'file2_run_003_charge',
-    'file2_run_009_40pct_speed_25kg_load_discharge',
-    'file2_run_010_80pct_speed_25kg_load_discharge',
-    'file2_run_011_80pct_speed_25kg_load_discharge',
-    'file2_run_012_80pct_speed_25kg_load_discharge',
-    'file2_run_013_80pct_speed_25kg_load_discharge',
-    'file2_run_014_charge',
-]
-
-val_runs = [
-    'file2_run_004_80pct_speed_15kg_load_discharge',
-    'file2_run_005_charge'
-    'file2_run_006_60pct_speed_15kg_load_discharge',
-    'file2_run_007_60pct_speed_15kg_load_discharge',
-    'file2_run_008_charge',
-    'file3_run_003_speed_profile_1'
-]
-
 train_df = bms_df[bms_df.run_name.isin(train_runs)].copy()
 val_df   = bms_df[bms_df.run_name.isin(val_runs)].copy()
 
@@ -181,6 +186,16 @@ val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
 
 history = mlp_manager.start_training(train_loader=train_loader, val_loader=val_loader, epochs=100, patience=20, save_path=f"{save_path}\\mlp_model2.pth", verbose=True)
 
+# Register the best model with its features, scalers and validation metrics (one artifact)
+mlp_manager.scaler_X = scaler_X
+mlp_manager.scaler_y = scaler_y
+best_epoch = int(np.argmin(history["val_loss"]))
+ModelRegistry().register(
+    "mlp_soc", mlp_manager, features=feature_cols,
+    metrics={k: history[k][best_epoch] for k in ("val_loss", "val_mae", "val_rmse", "val_r2")},
+    train_runs=train_runs, val_runs=val_runs, data_path=data_path,
+)
+
 # plot training history
 import matplotlib.pyplot as plt
 plt.figure(figsize=(10, 5))
@@ -0,0 +1,262 @@
+"""
+Registry of trained SOC models with versioned, self-describing artifacts.
+
+Each registered model version is one artifact holding everything needed to
+serve it: architecture, input feature names (soc_estimation/features.py),
+scaler parameters, weights, and training metrics / notes.
+
+    <root>/<name>/v001.pt     torch.save'd dict, loaded with weights_only=True
+    <root>/<name>/v001.json   the same metadata without weights (listing needs no torch)
+
+Models are referenced as "name" (latest version) or "name@3". load() builds the
+model only when asked for and caches it per artifact, so a run loads exactly
+the models it selects, once. Artifacts whose architecture, features and
+scalers disagree are refused instead of being silently mis-loaded.
+
+Usage:
+    registry = ModelRegistry()
+    registry.register("mlp_soc", manager, features=feature_cols, metrics={"val_rmse": 0.01})
+    manager = registry.load("mlp_soc")           # ModelManager ready for predict()
+
+    python -m soc_estimation.model_registry list
+    python -m soc_estimation.model_registry import mlp_soc --weights mlp_model.pth --scalers scalers.pkl \\
+        --features "Voltage [V]" "Current [A]" "Temperature [degC]" "Cycle Charge [Ah]" --hidden-sizes 32 16
+"""
+import argparse
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_ROOT = "soc_estimation/models"
+ARTIFACT_FORMAT = 1
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def parse_ref(ref):
+    """Split "name" / "name@3" into (name, version or None)."""
+    name, _, version = str(ref).partition("@")
+    return name, int(version) if version else None
+
+
+def _scaler_params(scaler):
+    if scaler is None or not hasattr(scaler, "mean_"):
+        return None
+    return {"mean": np.asarray(scaler.mean_, dtype=np.float64).tolist(),
+            "scale": np.asarray(scaler.scale_, dtype=np.float64).tolist()}
+
+
+def _scaler_from_params(params):
+    if params is None:
+        return None
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(params["mean"], dtype=np.float64)
+    scaler.scale_ = np.asarray(params["scale"], dtype=np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(scaler.mean_)
+    scaler.n_samples_seen_ = 0
+    return scaler
+
+
+def _validate(meta, path):
+    arch = meta["architecture"]
+    n_features = len(meta["features"])
+    if arch["input_size"] != n_features:
+        raise ValueError(f"{path}: input_size {arch['input_size']} does not match "
+                         f"{n_features} features {meta['features']}")
+    if meta["scaler_X"] is None:
+        raise ValueError(f"{path}: no scaler_X, the model would get unscaled inputs")
+    if len(meta["scaler_X"]["mean"]) != n_features:
+        raise ValueError(f"{path}: scaler_X has {len(meta['scaler_X']['mean'])} features, "
+                         f"model has {n_features}")
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_ROOT):
+        """
+        Args:
+            root (str): Registry directory (created when a model is registered).
+        """
+        self.root = root
+
+    # ---- listing ----
+
+    def names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if self.versions(d))
+
+    def versions(self, name):
+        """Registered versions of ``name``, ascending."""
+        folder = os.path.join(self.root, name)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(int(m.group(1)) for f in os.listdir(folder)
+                      if (m := re.fullmatch(r"v(\d+)\.pt", f)))
+
+    def resolve(self, ref):
+        """
+        Args:
+            ref (str): "name" (latest version) or "name@version".
+
+        Returns:
+            tuple: (name, version, artifact path)
+        """
+        name, version = parse_ref(ref)
+        versions = self.versions(name)
+        if not versions:
+            raise KeyError(f"No model '{name}' in registry {self.root} (available: {self.names()})")
+        if version is None:
+            version = versions[-1]
+        elif version not in versions:
+            raise KeyError(f"Model '{name}' has no version {version} (available: {versions})")
+        return name, version, os.path.join(self.root, name, f"v{version:03d}.pt")
+
+    def info(self, ref):
+        """Metadata of a model version (architecture, features, metrics, ...), without loading weights."""
+        _, _, path = self.resolve(ref)
+        with open(path[:-len(".pt")] + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ---- writing ----
+
+    def register(self, name, manager, features, metrics=None, notes="", **extra):
+        """
+        Store a trained model as the next version of ``name``.
+
+        Args:
+            name (str): Model name, e.g. "mlp_soc".
+            manager (ModelManager): Trained model with its scalers.
+            features (list[str]): Input feature names, in model input order.
+            metrics (dict | None): Validation metrics.
+            notes (str): Free text.
+            **extra: Additional JSON-serializable metadata (e.g. train / val run lists).
+
+        Returns:
+            str: Reference "name@version" of the new version.
+        """
+        import torch
+
+        model = manager.model
+        linears = [m for m in model.network if isinstance(m, torch.nn.Linear)]
+        meta = {
+            "format": ARTIFACT_FORMAT,
+            "name": name,
+            "architecture": {
+                "type": type(model).__name__,
+                "input_size": linears[0].in_features,
+                "hidden_sizes": [m.out_features for m in linears[:-1]],
+                "output_size": linears[-1].out_features,
+            },
+            "features": list(features),
+            "scaler_X": _scaler_params(manager.scaler_X),
+            "metrics": {k: float(v) for k, v in (metrics or {}).items()},
+            "notes": notes,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            **extra,
+        }
+        _validate(meta, name)
+
+        folder = os.path.join(self.root, name)
+        os.makedirs(folder, exist_ok=True)
+        version = (self.versions(name) or [0])[-1] + 1
+        meta["version"] = version
+        path = os.path.join(folder, f"v{version:03d}.pt")
+        state = {k: v.detach().cpu() for k, v in model.state_dict().items()}
+        torch.save({**meta, "state_dict": state}, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        with open(path[:-len(".pt")] + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        print(f"Registered model {name}@{version} -> {path}")
+        return f"{name}@{version}"
+
+    def import_files(self, name, weights, scalers, features, hidden_sizes, metrics=None, notes=""):
+        """Register a model saved the old way (state dict .pth + joblib scalers .pkl)."""
+        import joblib
+        from soc_estimation.mlp.mlp import MLP_SOC, ModelManager
+
+        manager = ModelManager(MLP_SOC(input_size=len(features), hidden_sizes=list(hidden_sizes),
+                                       output_size=1), device="cpu")
+        manager.load_model_weights(weights)
+        manager.scaler_X = joblib.load(scalers)["scaler_X"]
+        notes = notes or f"Imported from {weights} and {scalers}"
+        return self.register(name, manager, features, metrics=metrics, notes=notes)
+
+    # ---- loading ----
+
+    def load(self, ref, device="cpu"):
+        """
+        Load a model version, once per process (later calls return the cached instance).
+
+        Args:
+            ref (str): "name" (latest version) or "name@version".
+            device (str): Torch device.
+
+        Returns:
+            ModelManager: Model in eval mode with scaler_X set; ``manager.features``
+                          and ``manager.info`` hold the artifact metadata.
+        """
+        name, version, path = self.resolve(ref)
+        key = (os.path.abspath(path), os.path.getmtime(path), device)
+        with _cache_lock:
+            if key not in _cache:
+                _cache[key] = self._build(path, device)
+            return _cache[key]
+
+    @staticmethod
+    def _build(path, device):
+        import torch
+        from soc_estimation.mlp.mlp import MLP_SOC, ModelManager
+
+        artifact = torch.load(path, map_location=device, weights_only=True)
+        if artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"{path}: unsupported artifact format {artifact.get('format')}")
+        _validate(artifact, path)
+        arch = artifact["architecture"]
+        if arch["type"] != MLP_SOC.__name__:
+            raise ValueError(f"{path}: unknown architecture {arch['type']}")
+
+        model = MLP_SOC(input_size=arch["input_size"], hidden_sizes=arch["hidden_sizes"],
+                        output_size=arch["output_size"])
+        model.load_state_dict(artifact["state_dict"])
+        manager = ModelManager(model, device=device)
+        manager.scaler_X = _scaler_from_params(artifact["scaler_X"])
+        manager.model.eval()
+        manager.features = list(artifact["features"])
+        manager.info = {k: v for k, v in artifact.items() if k != "state_dict"}
+        return manager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, inspect and import registered SOC models.")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Registry directory (default: {DEFAULT_ROOT})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List models and versions")
+    p_info = sub.add_parser("info", help="Show the metadata of a model version")
+    p_info.add_argument("ref", help='"name" or "name@version"')
+    p_import = sub.add_parser("import", help="Register a .pth / scalers .pkl pair")
+    p_import.add_argument("name")
+    p_import.add_argument("--weights", required=True)
+    p_import.add_argument("--scalers", required=True)
+    p_import.add_argument("--features", nargs="+", required=True, help="Feature names, in input order")
+    p_import.add_argument("--hidden-sizes", nargs="+", type=int, default=[32, 16])
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        for model_name in registry.names():
+            for v in registry.versions(model_name):
+                meta = registry.info(f"{model_name}@{v}")
+                metrics = ", ".join(f"{k}={val:.4g}" for k, val in meta["metrics"].items())
+                print(f"{model_name}@{v}  {meta['created']}  {len(meta['features'])} features  {metrics}")
+    elif args.command == "info":
+        print(json.dumps(registry.info(args.ref), indent=2))
+    else:
+        registry.import_files(args.name, args.weights, args.scalers, args.features, args.hidden_sizes)
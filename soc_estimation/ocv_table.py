@@ -0,0 +1,257 @@
+"""
+Open-circuit-voltage (OCV) vs SOC lookup tables built from recorded runs.
+
+Samples taken at low current, after the current has stayed low for a settling
+time (e.g. the tail of the charge runs), are close to the open-circuit voltage.
+They are binned by SOC on a uniform grid, and the median voltage of each bin
+gives the OCV of the pack and of every cell. Bins without enough samples are
+interpolated from their neighbours, and the curves are made monotonic.
+
+Tables are stored as one compressed .npz (float32 curves, sample counts per
+bin, JSON metadata). OCVTable interpolates on the uniform grid with precomputed
+slopes. The inverse (SOC from OCV) uses a precomputed uniform voltage grid. Both
+are O(1) per value and vectorized over arrays, for batch evaluation and per-tick
+estimation alike.
+
+Usage:
+    python -m soc_estimation.ocv_table dataset/hoverboard_bms_dataset.h5 \\
+        --runs run_016_charge run_017_charge run_018_charge run_019_charge
+
+    table = OCVTable.load("soc_estimation/ocv_table.npz")
+    table.pack(soc_pct)              # pack OCV [V]
+    table.cells(soc_pct)             # OCV per cell [V], shape (..., n_cells)
+    table.soc_from_pack(voltage_V)   # SOC [%]
+"""
+import argparse
+import json
+
+import h5py
+import numpy as np
+
+DEFAULT_TABLE = "soc_estimation/ocv_table.npz"
+INVERSE_OVERSAMPLING = 8        # voltage grid points per SOC grid point for the inverse lookup
+
+
+class _UniformCurve:
+    """Piecewise-linear y(x) on a uniform x grid, with a precomputed slope per segment."""
+
+    def __init__(self, x0, x1, y):
+        self.x0, self.x1 = float(x0), float(x1)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.n_seg = self.y.shape[0] - 1
+        self.step = (self.x1 - self.x0) / self.n_seg if self.n_seg and self.x1 > self.x0 else 1.0
+        self.dy = np.diff(self.y, axis=0)
+
+    def __call__(self, x):
+        """y at x (clipped to the grid range); the first axis of y is the grid."""
+        pos = (np.clip(x, self.x0, self.x1) - self.x0) / self.step
+        idx = np.minimum(np.asarray(pos, dtype=np.int64), self.n_seg - 1)
+        frac = pos - idx
+        if self.y.ndim > 1:
+            frac = np.expand_dims(frac, -1)
+        return self.y[idx] + self.dy[idx] * frac
+
+    def slope(self, x):
+        """dy/dx of the segment holding x."""
+        pos = (np.clip(x, self.x0, self.x1) - self.x0) / self.step
+        return self.dy[np.minimum(np.asarray(pos, dtype=np.int64), self.n_seg - 1)] / self.step
+
+
+class OCVTable:
+    def __init__(self, pack_V, cell_V=None, counts=None, info=None):
+        """
+        Args:
+            pack_V (array-like): Pack OCV at SOC = 0, 100 / (n - 1), ..., 100 %.
+            cell_V (array-like | None): Cell OCVs on the same grid, shape (n, n_cells).
+            counts (array-like | None): Samples behind each grid point (0 = interpolated).
+            info (dict | None): Build metadata (runs, thresholds, ...).
+        """
+        self.pack_V = np.asarray(pack_V, dtype=np.float64)
+        self.cell_V = None if cell_V is None else np.asarray(cell_V, dtype=np.float64)
+        self.counts = np.zeros(len(self.pack_V), dtype=np.int64) if counts is None else np.asarray(counts)
+        self.info = info or {}
+        self.soc_grid = np.linspace(0.0, 100.0, len(self.pack_V))
+
+        self._pack = _UniformCurve(0.0, 100.0, self.pack_V)
+        self._cells = None if self.cell_V is None else _UniformCurve(0.0, 100.0, self.cell_V)
+        self._pack_inv = self._inverse(self.pack_V)
+        self._cell_inv = None if self.cell_V is None else self._inverse(self.cell_V.mean(axis=1))
+
+    def _inverse(self, curve):
+        # SOC on a uniform voltage grid, so the inverse lookup is O(1) as well
+        curve = np.maximum.accumulate(curve)
+        v = np.linspace(curve[0], curve[-1], INVERSE_OVERSAMPLING * (len(curve) - 1) + 1)
+        return _UniformCurve(v[0], v[-1], np.interp(v, curve, self.soc_grid))
+
+    @property
+    def n_cells(self):
+        return 0 if self.cell_V is None else self.cell_V.shape[1]
+
+    def pack(self, soc_pct):
+        """Pack OCV [V] at SOC [%] (scalar or array)."""
+        return self._pack(soc_pct)
+
+    def pack_slope(self, soc_pct):
+        """dOCV/dSOC of the pack [V / %]."""
+        return self._pack.slope(soc_pct)
+
+    def cells(self, soc_pct):
+        """Cell OCVs [V] at SOC [%], shape (..., n_cells)."""
+        if self._cells is None:
+            raise ValueError("Table has no cell curves")
+        return self._cells(soc_pct)
+
+    def soc_from_pack(self, voltage_V):
+        """SOC [%] whose pack OCV is ``voltage_V`` (clipped to the table range)."""
+        return self._pack_inv(voltage_V)
+
+    def soc_from_cell(self, voltage_V):
+        """SOC [%] whose mean cell OCV is ``voltage_V``."""
+        if self._cell_inv is None:
+            raise ValueError("Table has no cell curves")
+        return self._cell_inv(voltage_V)
+
+    def save(self, path=DEFAULT_TABLE):
+        arrays = {"pack_V": self.pack_V.astype(np.float32), "counts": self.counts.astype(np.uint32),
+                  "info": np.array(json.dumps(self.info))}
+        if self.cell_V is not None:
+            arrays["cell_V"] = self.cell_V.astype(np.float32)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path=DEFAULT_TABLE):
+        with np.load(path) as data:
+            return cls(pack_V=data["pack_V"], cell_V=data["cell_V"] if "cell_V" in data else None,
+                       counts=data["counts"], info=json.loads(str(data["info"])))
+
+
+######################################## BUILD ########################################
+
+def rest_mask(t_s, current_A, max_current_A, settle_s):
+    """
+    Samples at low current that has stayed low for at least ``settle_s`` seconds.
+    The pack's history before the first sample is unknown, so the first
+    ``settle_s`` seconds of a run never count as settled.
+
+    Args:
+        t_s (np.ndarray): Sample times in seconds.
+        current_A (np.ndarray): Current.
+        max_current_A (float): |current| threshold.
+        settle_s (float): Time since the last sample above the threshold.
+
+    Returns:
+        np.ndarray: Boolean mask.
+    """
+    t_s = np.asarray(t_s, dtype=np.float64)
+    low = np.abs(current_A) <= max_current_A
+    if len(t_s) == 0:
+        return low
+    last_high = np.maximum.accumulate(np.where(low, t_s[0], t_s))
+    return low & (t_s - last_high >= settle_s)
+
+
+def read_rest_samples(h5_file, run_name, max_current_A, settle_s, r0_ohm=0.0):
+    """
+    Rest samples of a run.
+
+    Returns:
+        dict: soc_pct (BMS), pack_V and cell_V (n, n_cells) of the rest samples,
+              corrected by R0 * I.
+    """
+    with h5py.File(h5_file, "r") as f:
+        g = f[run_name]
+        t = g["timestamp_ms"][:].astype(np.float64) / 1000.0
+        I = g["bms/current"][:].astype(np.float64)
+        mask = rest_mask(t, I, max_current_A, settle_s)
+        idx = np.flatnonzero(mask)
+        out = {"soc_pct": g["bms/battery_level"][:][idx].astype(np.float64),
+               "pack_V": g["bms/voltage"][:][idx] - r0_ohm * I[idx]}
+        if "cell_voltages" in g["bms"]:
+            n_cells = int(g["bms/cell_count"][:].max()) if "cell_count" in g["bms"] else 0
+            n_cells = n_cells or None  # all columns if the count is unknown
+            cells = g["bms/cell_voltages"][:][idx][:, :n_cells].astype(np.float64)
+            # Per-cell share of the pack IR drop
+            out["cell_V"] = cells - (r0_ohm * I[idx] / cells.shape[1])[:, None]
+        return out
+
+
+def _bin_curve(soc_pct, values, n_points, min_count):
+    """Median of ``values`` per SOC bin; bins with fewer than min_count samples are interpolated."""
+    bins = np.clip(np.rint(soc_pct / 100.0 * (n_points - 1)).astype(np.int64), 0, n_points - 1)
+    order = np.argsort(bins, kind="stable")
+    bins, values = bins[order], values[order]
+    starts = np.searchsorted(bins, np.arange(n_points))
+    ends = np.searchsorted(bins, np.arange(n_points), side="right")
+    counts = ends - starts
+    filled = counts >= min_count
+    if filled.sum() < 2:
+        raise ValueError(f"Rest samples cover fewer than 2 SOC bins with >= {min_count} samples")
+
+    width = values.shape[1] if values.ndim > 1 else 1
+    values = values.reshape(len(values), width)
+    curve = np.full((n_points, width), np.nan)
+    for b in np.flatnonzero(filled):
+        curve[b] = np.median(values[starts[b]:ends[b]], axis=0)
+    grid = np.arange(n_points)
+    for j in range(width):
+        curve[:, j] = np.maximum.accumulate(np.interp(grid, grid[filled], curve[filled, j]))
+    return curve, np.where(filled, counts, 0)
+
+
+def build_ocv_table(h5_file, runs, n_points=101, max_current_A=0.5, settle_s=60.0, r0_ohm=0.0,
+                    min_count=3):
+    """
+    Build an OCV table from the rest samples of recorded runs.
+
+    Args:
+        h5_file (str): HDF5 dataset.
+        runs (list[str]): Runs to use (charge runs with a low-current tail, rests, ...).
+        n_points (int): SOC grid points over 0..100 %.
+        max_current_A (float): |current| threshold of a rest sample.
+        settle_s (float): Minimum time at low current before a sample counts.
+        r0_ohm (float): Pack series resistance for the IR-drop correction
+                        (e.g. from soc_estimation/ekf.py); 0 = none.
+        min_count (int): Minimum samples for a SOC bin to be measured.
+
+    Returns:
+        OCVTable: Pack (and cell) OCV curves.
+    """
+    samples = [read_rest_samples(h5_file, run, max_current_A, settle_s, r0_ohm) for run in runs]
+    soc = np.concatenate([s["soc_pct"] for s in samples])
+    if len(soc) == 0:
+        raise ValueError(f"No samples with |I| <= {max_current_A} A for {settle_s} s in {runs}")
+
+    pack, counts = _bin_curve(soc, np.concatenate([s["pack_V"] for s in samples]), n_points, min_count)
+    cell = None
+    if all("cell_V" in s for s in samples) and len({s["cell_V"].shape[1] for s in samples}) == 1:
+        cell, _ = _bin_curve(soc, np.concatenate([s["cell_V"] for s in samples]), n_points, min_count)
+
+    measured = np.flatnonzero(counts)
+    info = {"runs": list(runs), "n_samples": int(len(soc)), "max_current_A": max_current_A,
+            "settle_s": settle_s, "r0_ohm": r0_ohm, "min_count": min_count,
+            "soc_range_pct": [float(measured[0] * 100.0 / (n_points - 1)),
+                              float(measured[-1] * 100.0 / (n_points - 1))]}
+    return OCVTable(pack[:, 0], cell, counts, info)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an OCV-SOC lookup table from recorded runs.")
+    parser.add_argument("input", help="Path to H5 file")
+    parser.add_argument("--runs", nargs="+", default=None, help="Runs to use (default: all *charge runs)")
+    parser.add_argument("--output", default=DEFAULT_TABLE, help=f"Table file (default: {DEFAULT_TABLE})")
+    parser.add_argument("--points", type=int, default=101, help="SOC grid points (default: 101)")
+    parser.add_argument("--max-current", type=float, default=0.5, help="Rest current threshold in A (default: 0.5)")
+    parser.add_argument("--settle", type=float, default=60.0, help="Settling time in s (default: 60)")
+    parser.add_argument("--r0", type=float, default=0.0, help="Series resistance for IR correction in Ohm")
+    args = parser.parse_args()
+
+    if args.runs is None:
+        with h5py.File(args.input, "r") as f:
+            args.runs = [name for name in f if name.endswith("charge") and not name.endswith("discharge")]
+    table = build_ocv_table(args.input, args.runs, n_points=args.points, max_current_A=args.max_current,
+                            settle_s=args.settle, r0_ohm=args.r0)
+    table.save(args.output)
+    lo, hi = table.info["soc_range_pct"]
+    print(f"{table.info['n_samples']} rest samples from {len(args.runs)} runs, measured SOC {lo:.0f}..{hi:.0f} %")
+    print(f"Pack OCV {table.pack_V[0]:.3f} .. {table.pack_V[-1]:.3f} V, {table.n_cells} cell curves")
+    print(f"Saved OCV table to {args.output}")
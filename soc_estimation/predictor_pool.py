@@ -0,0 +1,139 @@
+"""
+Several SOC models evaluated side by side on the same live samples ("shadow"
+prediction), e.g. a new model next to the one in use during one discharge.
+
+Each tick:
+    1. every feature any model needs is computed once (one FeaturePipeline)
+    2. each model's inputs are picked from it and standardized with its scaler
+    3. models with the same layer sizes are run together: their weights are
+       stacked into (n_models, out, in) arrays and each layer is one einsum,
+       in NumPy (no torch call overhead per tick for these tiny MLPs)
+
+Per model, the predicted SOC, the inference latency (its group's forward pass)
+and streaming error metrics against the BMS SOC are kept.
+
+Usage:
+    pool = PredictorPool([("mlp_soc", manager, features), ("mlp_soc_v1", manager1, features1)])
+    out = pool.step(flatten_sample(row), true_soc=bms_soc)   # {"mlp_soc": (soc %, inference_us), ...}
+    pool.metrics["mlp_soc"].result()
+"""
+import time
+
+import numpy as np
+
+from soc_estimation.features import FeaturePipeline
+from soc_estimation.metrics import StreamingErrorMetrics
+
+
+def mlp_layers(model):
+    """
+    Weights of an MLP_SOC (Linear / ReLU / Dropout blocks, Linear, Sigmoid) as NumPy arrays.
+
+    Returns:
+        list[tuple[np.ndarray, np.ndarray]]: (W of shape (out, in), b of shape (out,)) per Linear layer.
+    """
+    import torch
+
+    return [(m.weight.detach().cpu().numpy().astype(np.float32),
+             m.bias.detach().cpu().numpy().astype(np.float32))
+            for m in model.network if isinstance(m, torch.nn.Linear)]
+
+
+class _Group:
+    """Models with identical layer sizes, evaluated in one stacked forward pass."""
+
+    def __init__(self, members):
+        self.names = [m["name"] for m in members]
+        self.inputs = np.array([m["input_idx"] for m in members])        # (M, n_in) feature indices
+        self.mean = np.stack([m["mean"] for m in members]).astype(np.float32)
+        self.scale = np.stack([m["scale"] for m in members]).astype(np.float32)
+        n_layers = len(members[0]["layers"])
+        self.W = [np.stack([m["layers"][i][0] for m in members]) for i in range(n_layers)]
+        self.b = [np.stack([m["layers"][i][1] for m in members]) for i in range(n_layers)]
+
+    def forward(self, x_all):
+        """
+        Args:
+            x_all (np.ndarray): Values of all pool features.
+
+        Returns:
+            np.ndarray: SOC in [0, 1], one per model.
+        """
+        h = ((x_all[self.inputs] - self.mean) / self.scale).astype(np.float32)  # (M, n_in)
+        for i, (W, b) in enumerate(zip(self.W, self.b)):
+            h = np.einsum("moi,mi->mo", W, h) + b
+            if i < len(self.W) - 1:
+                np.maximum(h, 0, out=h)                                           # ReLU (dropout off)
+        return 1.0 / (1.0 + np.exp(-h[:, 0]))                                     # Sigmoid
+
+
+class PredictorPool:
+    def __init__(self, models):
+        """
+        Args:
+            models (list[tuple]): (name, ModelManager, feature names) per model; the
+                                  first one is the primary model of the run.
+        """
+        names = [name for name, _, _ in models]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Model names must be unique, got {names}")
+        self.names = names
+        self.primary = names[0]
+
+        # One pipeline for the union of all features, in first-use order
+        all_features = list(dict.fromkeys(f for _, _, features in models for f in features))
+        self.features = FeaturePipeline.from_names(all_features)
+
+        members = []
+        for name, manager, features in models:
+            layers = mlp_layers(manager.model)
+            if layers[0][0].shape[1] != len(features):
+                raise ValueError(f"Model '{name}' takes {layers[0][0].shape[1]} inputs, "
+                                 f"got {len(features)} features")
+            scaler = manager.scaler_X
+            if scaler is None:
+                raise ValueError(f"Model '{name}' has no scaler_X")
+            members.append({
+                "name": name,
+                "layers": layers,
+                "input_idx": [all_features.index(f) for f in features],
+                "mean": scaler.mean_,
+                "scale": scaler.scale_,
+            })
+
+        by_shape = {}
+        for m in members:
+            by_shape.setdefault(tuple(W.shape for W, _ in m["layers"]), []).append(m)
+        self.groups = [_Group(group) for group in by_shape.values()]
+        self.metrics = {name: StreamingErrorMetrics() for name in names}
+
+    def step(self, sample, true_soc=None):
+        """
+        Predict with every model for one new sample.
+
+        Args:
+            sample (dict): Flattened acquisition row (see features.flatten_sample()).
+            true_soc (float | None): Reference SOC in % for the error metrics.
+
+        Returns:
+            dict: name -> (predicted SOC in %, inference time in µs), in pool order.
+        """
+        start = time.perf_counter()
+        x_all = self.features.step(sample)
+        features_us = (time.perf_counter() - start) * 1e6
+
+        out = {}
+        for group in self.groups:
+            start = time.perf_counter()
+            soc = group.forward(x_all) * 100.0  # scale back to percentage
+            inference_us = features_us + (time.perf_counter() - start) * 1e6
+            for name, value in zip(group.names, soc):
+                out[name] = (float(value), inference_us)
+
+        if true_soc is not None:
+            for name, (value, _) in out.items():
+                self.metrics[name].update(true_soc, value)
+        return {name: out[name] for name in self.names}
+
+    def reset(self):
+        self.features.reset()